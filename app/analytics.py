@@ -0,0 +1,594 @@
+"""
+Analítica financiera precalculada a partir de las transacciones del dashboard.
+Totales por categoría, variación mes a mes, ritmo de gasto, velocidad de ahorro
+y fecha estimada de cada meta se calculan en una pasada vectorizada con NumPy,
+de modo que el prompt lleva las cifras ya hechas y Gemini no tiene que sumar.
+Para las organizaciones se resumen todos los miembros (percentiles, atípicos y
+totales por rol) en lugar de listar solo los primeros.
+"""
+
+import weakref
+from datetime import date
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from loguru import logger
+
+from app.data_handler import FinancialData, Organizacion
+from app.utils import calculate_savings_rate, get_top_expense_categories
+
+
+class CategoryTotal(NamedTuple):
+    """Gasto acumulado de una categoría."""
+    categoria: str
+    total: float
+    transacciones: int
+    porcentaje: float  # Sobre el gasto total
+
+
+class MonthTotals(NamedTuple):
+    """Movimientos de un mes (YYYY-MM)."""
+    mes: str
+    ingresos: float  # Incluye ingresos extra
+    gastos: float
+    neto: float
+
+
+class GoalEta(NamedTuple):
+    """Estimación de cuándo se alcanza una meta al ritmo de ahorro actual."""
+    objetivo: str
+    faltante: float
+    meses: Optional[float]  # None si el ahorro mensual no es positivo
+    mes_estimado: Optional[str]
+
+
+class FinancialAnalytics(NamedTuple):
+    """Métricas derivadas de las transacciones del usuario."""
+    categorias: List[CategoryTotal]
+    meses: List[MonthTotals]  # Del más antiguo al más reciente, sin huecos
+    variacion_gastos: Optional[float]  # % del último mes frente al anterior
+    variacion_ingresos: Optional[float]
+    mayores_variaciones: List[Tuple[str, float]]  # (categoría, diferencia del último mes frente al anterior)
+    gasto_mensual: float  # Ritmo de gasto: media mensual del periodo observado
+    gasto_diario: float
+    meses_de_saldo: Optional[float]  # Meses que cubre el saldo actual al ritmo de gasto
+    ahorro_mensual: float  # Velocidad de ahorro: media mensual de ingresos - gastos
+    tasa_ahorro: float  # % de los ingresos del periodo que no se gastó
+    metas: List[GoalEta]
+
+
+class Distribution(NamedTuple):
+    """Estadísticos de una variable sobre todos los miembros."""
+    total: float
+    media: float
+    p10: float
+    p25: float
+    mediana: float
+    p75: float
+    p90: float
+    p99: float
+
+
+class RoleTotals(NamedTuple):
+    """Miembros y saldo acumulado de un rol."""
+    rol: str
+    miembros: int
+    saldo: float
+    saldo_medio: float
+
+
+class OrganizationAnalytics(NamedTuple):
+    """Resumen estadístico de todos los miembros de una organización."""
+    miembros: int
+    saldos: Distribution
+    roles: List[RoleTotals]  # De mayor a menor saldo acumulado
+    atipicos_altos: int  # Saldos por encima de Q3 + 1.5·IQR
+    atipicos_bajos: int  # Saldos por debajo de Q1 - 1.5·IQR
+    mayores_atipicos: List[Tuple[str, float]]  # (nombre, saldo) de los atípicos más altos
+    menores_atipicos: List[Tuple[str, float]]
+    gasto: Optional[Distribution]  # Sobre topGastadores, si la organización los trae
+    mayores_gastadores: List[Tuple[str, float]]
+    concentracion_gasto: Optional[float]  # % del gasto del 10% que más gasta
+
+
+def _distribution(values: np.ndarray) -> Distribution:
+    p10, p25, p50, p75, p90, p99 = np.percentile(values, (10, 25, 50, 75, 90, 99))
+    return Distribution(float(values.sum()), float(values.mean()), float(p10), float(p25), float(p50),
+                        float(p75), float(p90), float(p99))
+
+
+def _top(names: Sequence[str], values: np.ndarray, mask: np.ndarray, limit: int, largest: bool) -> List[Tuple[str, float]]:
+    """Los `limit` valores más altos (o más bajos) entre los marcados por `mask`, con su nombre."""
+    candidates = np.flatnonzero(mask)
+    if not candidates.size:
+        return []
+    keys = -values[candidates] if largest else values[candidates]
+    if candidates.size > limit:
+        # argpartition evita ordenar todos los candidatos
+        chosen = np.argpartition(keys, limit)[:limit]
+        candidates, keys = candidates[chosen], keys[chosen]
+    return [(names[i], float(values[i])) for i in candidates[np.argsort(keys)]]
+
+
+def compute_organization_analytics(organizacion: Organizacion, top: int = 3) -> Optional[OrganizationAnalytics]:
+    """
+    Calcula percentiles, atípicos y totales por rol sobre todos los miembros.
+
+    Args:
+        organizacion: Organización validada
+        top: Atípicos y gastadores que se reportan por nombre
+
+    Returns:
+        OrganizationAnalytics o None si la organización no tiene miembros
+    """
+    try:
+        miembros = organizacion.miembros
+        if not miembros:
+            return None
+        names = [m.nombre for m in miembros]
+        balances = np.fromiter((m.saldoActual for m in miembros), dtype=np.float64, count=len(miembros))
+        index: Dict[str, int] = {}
+        codes = np.fromiter((index.setdefault(m.rol, len(index)) for m in miembros),
+                            dtype=np.int64, count=len(miembros))
+
+        saldos = _distribution(balances)
+        role_balance = np.bincount(codes, weights=balances, minlength=len(index))
+        role_count = np.bincount(codes, minlength=len(index))
+        roles = [
+            RoleTotals(rol, int(role_count[i]), float(role_balance[i]), float(role_balance[i] / role_count[i]))
+            for rol, i in sorted(index.items(), key=lambda item: -role_balance[item[1]])
+        ]
+
+        # Atípicos por el criterio de Tukey (1.5 veces el rango intercuartílico)
+        iqr = saldos.p75 - saldos.p25
+        high = balances > saldos.p75 + 1.5 * iqr
+        low = balances < saldos.p25 - 1.5 * iqr
+
+        gasto = None
+        mayores_gastadores: List[Tuple[str, float]] = []
+        concentracion = None
+        spenders = organizacion.analisis.topGastadores
+        if spenders:
+            spender_names = [g.nombre for g in spenders]
+            spent = np.fromiter((g.totalGastado for g in spenders), dtype=np.float64, count=len(spenders))
+            gasto = _distribution(spent)
+            mayores_gastadores = _top(spender_names, spent, np.ones(len(spent), dtype=bool), top, largest=True)
+            if gasto.total > 0:
+                decile = max(1, len(spent) // 10)
+                concentracion = float(np.partition(spent, len(spent) - decile)[-decile:].sum() / gasto.total * 100)
+
+        return OrganizationAnalytics(
+            miembros=len(miembros),
+            saldos=saldos,
+            roles=roles,
+            atipicos_altos=int(high.sum()),
+            atipicos_bajos=int(low.sum()),
+            mayores_atipicos=_top(names, balances, high, top, largest=True),
+            menores_atipicos=_top(names, balances, low, top, largest=False),
+            gasto=gasto,
+            mayores_gastadores=mayores_gastadores,
+            concentracion_gasto=concentracion,
+        )
+    except Exception as e:
+        logger.error(f"Error calculando la analítica de la organización: {str(e)}")
+        return None
+
+
+def _dates(fechas: Sequence[str]) -> np.ndarray:
+    """
+    Día de cada fecha ISO 8601 ("2025-11-04T11:18:25.681Z"); NaT si no es válida.
+
+    Args:
+        fechas: Fechas de las transacciones
+
+    Returns:
+        Array datetime64[D] con una fecha por transacción
+    """
+    prefixes = [fecha[:10] for fecha in fechas]
+    try:
+        return np.array(prefixes, dtype="datetime64[D]")
+    except ValueError:
+        # Alguna fecha mal formada: se descartan solo esas
+        days = np.empty(len(prefixes), dtype="datetime64[D]")
+        for i, prefix in enumerate(prefixes):
+            try:
+                days[i] = np.datetime64(prefix, "D")
+            except ValueError:
+                days[i] = np.datetime64("NaT")
+        return days
+
+
+def _month_label(index: int) -> str:
+    return str(np.datetime64(int(index), "M"))
+
+
+def _columns(transactions: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Montos, días y meses de una lista de transacciones como arrays.
+
+    Los días y meses son enteros (desde 1970-01-01 y 1970-01); -1 si la fecha no es válida.
+    """
+    amounts = np.fromiter((t.monto for t in transactions), dtype=np.float64, count=len(transactions))
+    dates = _dates([t.fecha for t in transactions])
+    invalid = np.isnat(dates)
+    days = dates.astype(np.int64)
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    days[invalid] = -1
+    months[invalid] = -1
+    return amounts, days, months
+
+
+def _pct_change(current: float, previous: float) -> Optional[float]:
+    if previous <= 0:
+        return None
+    return (current - previous) / previous * 100
+
+
+# (tipo, id(objeto)) -> (referencia débil, analítica): las preguntas sobre el mismo
+# snapshot del dashboard no vuelven a recorrer las transacciones ni los miembros
+_computed: Dict[Tuple[str, int], Tuple["weakref.ref[Any]", Any]] = {}
+
+
+def _forget(key: Tuple[str, int], ref: "weakref.ref[Any]") -> None:
+    entry = _computed.get(key)
+    if entry is not None and entry[0] is ref:
+        del _computed[key]
+
+
+def _memoized(kind: str, source: Any, compute: Callable[[Any], Any]) -> Any:
+    """Resultado de `compute(source)`, calculado una sola vez mientras `source` siga vivo."""
+    key = (kind, id(source))
+    entry = _computed.get(key)
+    if entry is not None and entry[0]() is source:
+        return entry[1]
+    result = compute(source)
+    ref = weakref.ref(source, lambda dead, key=key: _forget(key, dead))
+    _computed[key] = (ref, result)
+    return result
+
+
+def get_analytics(financial_data: FinancialData) -> Optional[FinancialAnalytics]:
+    """
+    Analítica de un dashboard, calculada una sola vez mientras el objeto siga vivo.
+
+    Args:
+        financial_data: Datos financieros validados (se tratan como inmutables)
+
+    Returns:
+        FinancialAnalytics o None si no hay transacciones con las que calcular
+    """
+    return _memoized("usuario", financial_data, compute_analytics)
+
+
+def get_organization_analytics(organizacion: Organizacion) -> Optional[OrganizationAnalytics]:
+    """
+    Analítica de una organización, calculada una sola vez mientras el objeto siga vivo.
+
+    Args:
+        organizacion: Organización validada (se trata como inmutable)
+
+    Returns:
+        OrganizationAnalytics o None si no tiene miembros
+    """
+    return _memoized("organizacion", organizacion, compute_organization_analytics)
+
+
+class TransactionAggregates(NamedTuple):
+    """Agregados de las transacciones de los que sale toda la analítica del usuario."""
+    first_month: int  # Meses desde 1970-01 del primer mes observado
+    monthly_spent: np.ndarray  # Un valor por mes, del primero al último observado
+    monthly_earned: np.ndarray
+    categories: List[str]
+    category_totals: np.ndarray
+    category_counts: np.ndarray
+    recent_by_category: Optional[np.ndarray]  # Categoría x (penúltimo, último mes); None con un solo mes
+    total_spent: float
+    total_earned: float
+    daily_spent: Optional[float]  # Gasto con fecha / días entre el primero y el último
+
+
+def _aggregate(financial_data: FinancialData) -> Optional[TransactionAggregates]:
+    """Agrega las transacciones de `detalle` en una pasada vectorizada."""
+    detalle = financial_data.detalle
+    gastos = list(detalle.gastos.transacciones)
+    if not gastos:
+        # Algunos dashboards solo traen las transacciones dentro de cada categoría
+        gastos = [
+            t.model_copy(update={"categoria": t.categoria or cat.categoria})
+            for cat in detalle.gastos.porCategoria for t in cat.transacciones
+        ]
+    entradas = list(detalle.ingresos.transacciones) + list(detalle.extras.transacciones)
+    if not gastos and not entradas:
+        return None
+
+    spent, spent_day, spent_month = _columns(gastos)
+    earned, _, earned_month = _columns(entradas)
+    valid = np.concatenate([spent_month, earned_month])
+    valid = valid[valid >= 0]
+    if not valid.size:
+        return None
+
+    # Meses del periodo observado, incluidos los que no tuvieron movimientos
+    first, last = int(valid.min()), int(valid.max())
+    n_months = last - first + 1
+    spent_ok = spent_month >= 0
+    earned_ok = earned_month >= 0
+    monthly_spent = np.bincount(spent_month[spent_ok] - first, weights=spent[spent_ok], minlength=n_months)
+    monthly_earned = np.bincount(earned_month[earned_ok] - first, weights=earned[earned_ok], minlength=n_months)
+
+    # Totales por categoría (todas las transacciones, tengan o no fecha válida).
+    # Código entero por categoría: un diccionario es más rápido que np.unique con cadenas
+    index: Dict[str, int] = {}
+    codes = np.fromiter(
+        (index.setdefault(t.categoria or "Sin categoría", len(index)) for t in gastos),
+        dtype=np.int64, count=len(gastos)
+    )
+    totals = np.bincount(codes, weights=spent, minlength=len(index))
+    counts = np.bincount(codes, minlength=len(index))
+    recent = None
+    if n_months >= 2:
+        # Matriz categoría x mes solo para los dos últimos meses
+        in_recent = spent_ok & (spent_month >= last - 1)
+        recent = np.bincount(
+            codes[in_recent] * 2 + (spent_month[in_recent] - (last - 1)),
+            weights=spent[in_recent], minlength=len(index) * 2
+        ).reshape(len(index), 2)
+
+    dated = spent_day[spent_ok]
+    daily = float(spent[spent_ok].sum()) / (int(dated.max() - dated.min()) + 1) if dated.size else None
+    return TransactionAggregates(first, monthly_spent, monthly_earned, list(index), totals, counts, recent,
+                                 float(spent.sum()), float(earned.sum()), daily)
+
+
+def _month_number(fecha: str) -> Optional[int]:
+    """Mes de una fecha ISO 8601 como meses desde 1970-01 (mismo valor que datetime64[M])."""
+    try:
+        return (int(fecha[:4]) - 1970) * 12 + int(fecha[5:7]) - 1 if fecha[4] == "-" and 1 <= int(fecha[5:7]) <= 12 else None
+    except (ValueError, IndexError):
+        return None
+
+
+class _ExpenseTotals:
+    """Sumas de gasto por mes y categoría de una lista de transacciones."""
+
+    __slots__ = ("by_month", "by_category", "counts", "by_category_month", "total", "dated", "first_day", "last_day")
+
+    def __init__(self):
+        self.by_month: Dict[int, float] = {}
+        self.by_category: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.by_category_month: Dict[Tuple[str, int], float] = {}
+        self.total = 0.0
+        self.dated = 0.0
+        self.first_day: Optional[int] = None
+        self.last_day: Optional[int] = None
+
+
+class TransactionAccumulator:
+    """
+    Agregados de la analítica calculados transacción a transacción.
+
+    Permite obtener la misma analítica que `compute_analytics` al leer un
+    dashboard en streaming, sin guardar las transacciones: la memoria depende
+    de las categorías y los meses, no del número de transacciones.
+    """
+
+    def __init__(self):
+        # Como en `compute_analytics`, las transacciones anidadas en porCategoria
+        # solo cuentan si el dashboard no trae la lista general de gastos
+        self._expenses = {False: _ExpenseTotals(), True: _ExpenseTotals()}
+        self._earned_by_month: Dict[int, float] = {}
+        self._earned = 0.0
+        # Ruta de la lista en el dashboard -> transacciones leídas (incluidas las descartadas)
+        self.list_counts: Dict[str, int] = {}
+
+    def count(self, lista: str) -> None:
+        """Cuenta una transacción de la lista indicada (p. ej. "detalle.extras.transacciones")."""
+        self.list_counts[lista] = self.list_counts.get(lista, 0) + 1
+
+    def add_expense(self, monto: float, fecha: str, categoria: Optional[str], nested: bool = False) -> None:
+        """
+        Suma un gasto.
+
+        Args:
+            monto: Monto del gasto
+            fecha: Fecha ISO 8601
+            categoria: Categoría del gasto (None = "Sin categoría")
+            nested: True si viene de `porCategoria[].transacciones`
+        """
+        totals = self._expenses[nested]
+        categoria = categoria or "Sin categoría"
+        totals.total += monto
+        totals.by_category[categoria] = totals.by_category.get(categoria, 0.0) + monto
+        totals.counts[categoria] = totals.counts.get(categoria, 0) + 1
+        month = _month_number(fecha)
+        if month is None:
+            return
+        totals.by_month[month] = totals.by_month.get(month, 0.0) + monto
+        key = (categoria, month)
+        totals.by_category_month[key] = totals.by_category_month.get(key, 0.0) + monto
+        try:
+            day = date.fromisoformat(fecha[:10]).toordinal()
+        except ValueError:
+            return
+        totals.dated += monto
+        if totals.first_day is None or day < totals.first_day:
+            totals.first_day = day
+        if totals.last_day is None or day > totals.last_day:
+            totals.last_day = day
+
+    def add_income(self, monto: float, fecha: str) -> None:
+        """Suma un ingreso o ingreso extra."""
+        self._earned += monto
+        month = _month_number(fecha)
+        if month is not None:
+            self._earned_by_month[month] = self._earned_by_month.get(month, 0.0) + monto
+
+    def aggregates(self) -> Optional[TransactionAggregates]:
+        """Agregados equivalentes a los de la pasada vectorizada (None si no hay meses válidos)."""
+        main = self._expenses[False]
+        totals = main if main.counts else self._expenses[True]
+        months = set(totals.by_month) | set(self._earned_by_month)
+        if not months:
+            return None
+        first, last = min(months), max(months)
+        n_months = last - first + 1
+        monthly_spent = np.zeros(n_months)
+        monthly_earned = np.zeros(n_months)
+        for month, amount in totals.by_month.items():
+            monthly_spent[month - first] = amount
+        for month, amount in self._earned_by_month.items():
+            monthly_earned[month - first] = amount
+
+        categories = list(totals.by_category)
+        recent = None
+        if n_months >= 2:
+            recent = np.array([
+                [totals.by_category_month.get((categoria, last - 1), 0.0),
+                 totals.by_category_month.get((categoria, last), 0.0)]
+                for categoria in categories
+            ]).reshape(len(categories), 2)
+        daily = None
+        if totals.first_day is not None:
+            daily = totals.dated / (totals.last_day - totals.first_day + 1)
+        return TransactionAggregates(
+            first, monthly_spent, monthly_earned, categories,
+            np.array([totals.by_category[c] for c in categories], dtype=np.float64),
+            np.array([totals.counts[c] for c in categories], dtype=np.int64),
+            recent, totals.total, self._earned, daily
+        )
+
+
+def remember_analytics(financial_data: FinancialData, analytics: Optional[FinancialAnalytics]) -> None:
+    """
+    Asocia a un dashboard una analítica ya calculada (p. ej. durante la lectura en streaming).
+
+    `get_analytics` la devolverá en lugar de recalcularla sobre las transacciones
+    del modelo, que en ese caso son solo una parte del historial.
+    """
+    _memoized("usuario", financial_data, lambda _: analytics)
+
+
+def remember_transaction_counts(financial_data: FinancialData, counts: Dict[str, int]) -> None:
+    """
+    Asocia a un dashboard reducido el número real de transacciones de cada lista.
+
+    Args:
+        financial_data: Datos financieros (vista reducida)
+        counts: Ruta de la lista (p. ej. "detalle.extras.transacciones") -> transacciones leídas
+    """
+    _memoized("conteos", financial_data, lambda _: dict(counts))
+
+
+def transaction_count(financial_data: FinancialData, lista: str) -> int:
+    """
+    Número real de transacciones de una lista de `detalle`.
+
+    Si el dashboard se leyó en streaming la lista del modelo solo conserva el
+    top K y se usa el conteo registrado durante la lectura.
+
+    Args:
+        financial_data: Datos financieros validados
+        lista: Ruta de la lista, p. ej. "detalle.extras.transacciones"
+
+    Returns:
+        Número de transacciones
+    """
+    counts = _memoized("conteos", financial_data, lambda _: None)
+    if counts is not None and lista in counts:
+        return counts[lista]
+    value: Any = financial_data
+    for name in lista.split("."):
+        value = getattr(value, name)
+    return len(value)
+
+
+def compute_analytics(
+    financial_data: FinancialData,
+    top_movers: int = 3,
+    aggregates: Optional[TransactionAggregates] = None
+) -> Optional[FinancialAnalytics]:
+    """
+    Calcula la analítica a partir de `detalle` sin usar los agregados del cliente.
+
+    Args:
+        financial_data: Datos financieros validados
+        top_movers: Categorías con mayor variación mes a mes que se reportan
+        aggregates: Agregados ya calculados (p. ej. por un TransactionAccumulator);
+            por defecto se calculan sobre las transacciones de `financial_data`
+
+    Returns:
+        FinancialAnalytics o None si no hay transacciones con las que calcular
+    """
+    try:
+        detalle = financial_data.detalle
+        agg = aggregates if aggregates is not None else _aggregate(financial_data)
+        if agg is None:
+            return None
+        n_months = len(agg.monthly_spent)
+        last = agg.first_month + n_months - 1
+
+        categorias: List[CategoryTotal] = []
+        movers: List[Tuple[str, float]] = []
+        if agg.categories:
+            for i in np.argsort(-agg.category_totals, kind="stable"):
+                share = agg.category_totals[i] / agg.total_spent * 100 if agg.total_spent > 0 else 0.0
+                categorias.append(CategoryTotal(agg.categories[i], float(agg.category_totals[i]),
+                                                int(agg.category_counts[i]), float(share)))
+            if agg.recent_by_category is not None:
+                delta = agg.recent_by_category[:, 1] - agg.recent_by_category[:, 0]
+                for i in np.argsort(-np.abs(delta), kind="stable")[:top_movers]:
+                    if delta[i]:
+                        movers.append((agg.categories[i], float(delta[i])))
+        elif detalle.gastos.porCategoria:
+            # Sin transacciones de gasto: solo quedan los totales por categoría del cliente
+            client_total = float(detalle.gastos.total)
+            categorias = [
+                CategoryTotal(name, float(total), 0, total / client_total * 100 if client_total > 0 else 0.0)
+                for name, total in get_top_expense_categories(detalle.gastos, limit=len(detalle.gastos.porCategoria))
+            ]
+
+        meses = [
+            MonthTotals(_month_label(agg.first_month + i), float(agg.monthly_earned[i]),
+                        float(agg.monthly_spent[i]), float(agg.monthly_earned[i] - agg.monthly_spent[i]))
+            for i in range(n_months)
+        ]
+
+        # Ritmo de gasto y velocidad de ahorro sobre el periodo observado
+        gasto_mensual = float(agg.monthly_spent.mean())
+        gasto_diario = agg.daily_spent if agg.daily_spent is not None else gasto_mensual / 30
+        ahorro_mensual = float((agg.monthly_earned - agg.monthly_spent).mean())
+        saldo = financial_data.resumen.saldoActual
+        meses_de_saldo = saldo / gasto_mensual if gasto_mensual > 0 else None
+
+        metas: List[GoalEta] = []
+        seen = set()
+        for goal in detalle.ahorros.objetivos:
+            key = (goal.objetivo, goal.montoAhorrado, goal.montoMeta)
+            if key in seen:
+                continue
+            seen.add(key)
+            missing = max(goal.montoMeta - goal.montoAhorrado, 0.0)
+            if missing == 0:
+                metas.append(GoalEta(goal.objetivo, 0.0, 0.0, None))
+            elif ahorro_mensual > 0:
+                months = missing / ahorro_mensual
+                metas.append(GoalEta(goal.objetivo, missing, months, _month_label(last + int(np.ceil(months)))))
+            else:
+                metas.append(GoalEta(goal.objetivo, missing, None, None))
+
+        return FinancialAnalytics(
+            categorias=categorias,
+            meses=meses,
+            variacion_gastos=_pct_change(meses[-1].gastos, meses[-2].gastos) if n_months >= 2 else None,
+            variacion_ingresos=_pct_change(meses[-1].ingresos, meses[-2].ingresos) if n_months >= 2 else None,
+            mayores_variaciones=movers,
+            gasto_mensual=gasto_mensual,
+            gasto_diario=gasto_diario,
+            meses_de_saldo=meses_de_saldo,
+            ahorro_mensual=ahorro_mensual,
+            tasa_ahorro=calculate_savings_rate(agg.total_earned, agg.total_spent),
+            metas=metas,
+        )
+    except Exception as e:
+        logger.error(f"Error calculando la analítica financiera: {str(e)}")
+        return None
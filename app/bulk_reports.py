@@ -0,0 +1,346 @@
+"""
+Generación masiva de reportes mensuales fuera de línea.
+Lee los dashboards de muchos usuarios (un JSONL o la API financiera con un
+archivo de tokens), construye los prompts y consulta a Gemini con concurrencia
+y tasa limitadas, escribiendo los resultados en JSONL. Se puede interrumpir y
+reanudar: los usuarios ya escritos en la salida no se vuelven a procesar.
+
+Uso:
+    python -m app.bulk_reports --input dashboards.jsonl --output reportes.jsonl
+    python -m app.bulk_reports --tokens tokens.txt --output reportes.jsonl --rpm 600
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from loguru import logger
+
+from app.data_handler import DataHandler, FinancialData
+from app.gemini_client import GeminiClient
+from app.prompt_builder import PromptBuilder
+from app.governor import PRIORITY_BATCH
+from app.rate_limit import AsyncRateLimiter
+
+
+MONTHLY_INSIGHT_QUESTION = (
+    "Dame un análisis breve de mis finanzas de este mes: qué destaca, "
+    "qué riesgo ves y una acción concreta para el próximo mes."
+)
+
+
+def iter_jsonl(path: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    Lee un JSONL línea a línea sin cargarlo completo.
+
+    Yields:
+        Tuplas (índice del registro, bytes de la línea); las líneas vacías no cuentan
+    """
+    index = 0
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield index, line
+                index += 1
+
+
+def iter_tokens(path: str) -> Iterator[Tuple[int, str]]:
+    """Lee un archivo con un bearer token por línea."""
+    for index, line in iter_jsonl(path):
+        yield index, line.decode("utf-8")
+
+
+class Checkpoint:
+    """
+    Registros terminados de forma compacta: todos los índices menores que
+    `watermark` más los terminados fuera de orden por encima de él.
+    """
+
+    def __init__(self, watermark: int = 0, done_above: Optional[Set[int]] = None, output_offset: int = 0):
+        self.watermark = watermark
+        self.done_above: Set[int] = set(done_above or ())
+        self.output_offset = output_offset
+
+    def is_done(self, index: int) -> bool:
+        return index < self.watermark or index in self.done_above
+
+    def mark(self, index: int) -> None:
+        """Marca un registro como terminado y avanza la marca de agua si es posible."""
+        if index < self.watermark:
+            return
+        self.done_above.add(index)
+        while self.watermark in self.done_above:
+            self.done_above.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self, path: str) -> None:
+        """Guarda el checkpoint de forma atómica."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "watermark": self.watermark,
+                "done_above": sorted(self.done_above),
+                "output_offset": self.output_offset,
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Checkpoint":
+        """Carga un checkpoint (uno vacío si no existe)."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["watermark"], set(data["done_above"]), data["output_offset"])
+
+    def recover(self, output_path: str) -> int:
+        """
+        Incorpora los registros escritos en la salida después del último guardado.
+
+        Una línea final incompleta (interrupción a mitad de escritura) se descarta.
+
+        Returns:
+            Número de registros recuperados
+        """
+        size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+        if size < self.output_offset:
+            # La salida se borró o se recortó: el checkpoint ya no la describe
+            logger.warning("La salida es más corta que el checkpoint; se reconstruye desde la salida")
+            self.watermark, self.done_above, self.output_offset = 0, set(), 0
+        if size == 0:
+            return 0
+
+        recovered = 0
+        with open(output_path, "r+b") as f:
+            f.seek(self.output_offset)
+            offset = self.output_offset
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    self.mark(json.loads(line)["index"])
+                    recovered += 1
+                except (ValueError, KeyError):
+                    break
+                offset += len(line)
+            f.truncate(offset)
+        self.output_offset = offset
+        return recovered
+
+
+class BulkReportJob:
+    """Procesa dashboards en paralelo y escribe un reporte JSONL por usuario."""
+
+    def __init__(
+        self,
+        gemini_client: GeminiClient,
+        prompt_builder: PromptBuilder,
+        output_path: str,
+        questions: Optional[List[str]] = None,
+        concurrency: int = 8,
+        requests_per_minute: Optional[float] = None,
+        checkpoint_path: Optional[str] = None,
+        checkpoint_every: int = 50,
+        max_tokens: int = 300,
+        temperature: float = 0.7
+    ):
+        """
+        Inicializa el trabajo.
+
+        Args:
+            gemini_client: Cliente de Gemini
+            prompt_builder: Constructor del contexto y los prompts
+            output_path: Archivo JSONL de salida (se añade al final al reanudar)
+            questions: Preguntas por usuario (default: análisis mensual)
+            concurrency: Usuarios procesados en paralelo
+            requests_per_minute: Límite de llamadas a Gemini por minuto (None = sin límite)
+            checkpoint_path: Archivo de checkpoint (default: <salida>.checkpoint.json)
+            checkpoint_every: Registros entre guardados del checkpoint
+            max_tokens: Máximo de tokens por respuesta
+            temperature: Controla la creatividad (0.0-1.0)
+        """
+        self.gemini_client = gemini_client
+        self.prompt_builder = prompt_builder
+        self.output_path = output_path
+        self.questions = questions or [MONTHLY_INSIGHT_QUESTION]
+        self.concurrency = concurrency
+        self.rate_limiter = AsyncRateLimiter(requests_per_minute) if requests_per_minute else None
+        self.checkpoint_path = checkpoint_path or f"{output_path}.checkpoint.json"
+        self.checkpoint_every = checkpoint_every
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.stats = {"processed": 0, "succeeded": 0, "failed": 0, "skipped": 0}
+
+    async def _answer(self, financial_data: FinancialData) -> List[Dict[str, Any]]:
+        """Responde las preguntas configuradas para un usuario."""
+        financial_context = self.prompt_builder.build_context(financial_data)
+        prefix = self.prompt_builder.build_prompt_prefix(financial_context)
+        results = []
+        for question in self.questions:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            response = await self.gemini_client.generate_response_async(
+                prompt=self.prompt_builder.build_prompt_from_context(financial_context, question),
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                cacheable_prefix=prefix,
+                priority=PRIORITY_BATCH
+            )
+            results.append({
+                "question": question,
+                "response": response,
+                "error": None if response else "Error al generar respuesta con Gemini",
+            })
+        return results
+
+    async def _process(
+        self,
+        index: int,
+        raw: Any,
+        load: Callable[[Any], Awaitable[Optional[FinancialData]]]
+    ) -> Dict[str, Any]:
+        """Construye el registro de salida de un usuario; los errores quedan en el registro."""
+        try:
+            financial_data = await load(raw)
+            if financial_data is None:
+                return {"index": index, "success": False, "error": "Datos financieros no válidos o no disponibles"}
+            results = await self._answer(financial_data)
+            return {
+                "index": index,
+                "user_id": financial_data.usuario.id,
+                "user_name": financial_data.usuario.nombre,
+                "results": results,
+                "success": all(result["response"] for result in results),
+            }
+        except Exception as e:
+            logger.error(f"Error procesando el registro {index}: {str(e)}")
+            return {"index": index, "success": False, "error": str(e)}
+
+    async def run(
+        self,
+        records: Iterator[Tuple[int, Any]],
+        load: Callable[[Any], Awaitable[Optional[FinancialData]]]
+    ) -> Dict[str, Any]:
+        """
+        Ejecuta el trabajo, reanudando desde el checkpoint si existe.
+
+        Args:
+            records: Iterador de (índice, dato crudo) en orden de índice
+            load: Convierte el dato crudo en FinancialData (None si no es válido)
+
+        Returns:
+            Métricas del trabajo (procesados, fallidos, usuarios por minuto...)
+        """
+        checkpoint = Checkpoint.load(self.checkpoint_path)
+        recovered = checkpoint.recover(self.output_path)
+        if checkpoint.watermark or checkpoint.done_above:
+            logger.info(f"Reanudando desde el registro {checkpoint.watermark} ({recovered} recuperados de la salida)")
+
+        # Cola acotada: la memoria no depende del tamaño de la entrada
+        queue: "asyncio.Queue[Optional[Tuple[int, Any]]]" = asyncio.Queue(maxsize=self.concurrency * 2)
+        start = time.monotonic()
+        since_save = 0
+
+        with open(self.output_path, "ab") as output:
+            async def produce():
+                for index, raw in records:
+                    if checkpoint.is_done(index):
+                        self.stats["skipped"] += 1
+                        continue
+                    await queue.put((index, raw))
+                for _ in range(self.concurrency):
+                    await queue.put(None)
+
+            async def work():
+                nonlocal since_save
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    record = await self._process(item[0], item[1], load)
+
+                    # Se escribe antes de marcarlo: el checkpoint nunca adelanta a la salida
+                    output.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                    output.flush()
+                    checkpoint.mark(record["index"])
+                    checkpoint.output_offset = output.tell()
+
+                    self.stats["processed"] += 1
+                    self.stats["succeeded" if record["success"] else "failed"] += 1
+                    since_save += 1
+                    if since_save >= self.checkpoint_every:
+                        checkpoint.save(self.checkpoint_path)
+                        since_save = 0
+                        logger.info(f"Progreso: {self.stats['processed']} usuarios procesados")
+
+            try:
+                await asyncio.gather(produce(), *(work() for _ in range(self.concurrency)))
+            finally:
+                checkpoint.save(self.checkpoint_path)
+
+        elapsed = time.monotonic() - start
+        self.stats["elapsed_seconds"] = round(elapsed, 2)
+        self.stats["users_per_minute"] = round(self.stats["processed"] / elapsed * 60, 1) if elapsed else 0.0
+        if self.rate_limiter is not None:
+            self.stats["rate_limit_wait_seconds"] = round(self.rate_limiter.waited, 2)
+        return self.stats
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Argumentos de la línea de comandos."""
+    parser = argparse.ArgumentParser(description="Genera reportes financieros mensuales en lote")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="JSONL con un dashboard por línea")
+    source.add_argument("--tokens", help="Archivo con un bearer token por línea (datos desde la API)")
+    parser.add_argument("--output", required=True, help="JSONL de salida")
+    parser.add_argument("--question", action="append", help="Pregunta por usuario (repetible)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Usuarios en paralelo (default: 8)")
+    parser.add_argument("--rpm", type=float, default=None, help="Máximo de llamadas a Gemini por minuto")
+    parser.add_argument("--checkpoint", default=None, help="Archivo de checkpoint")
+    return parser.parse_args(argv)
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    """Construye los componentes y ejecuta el trabajo."""
+    # Sin caché de respuestas ni de dashboards: cada usuario se consulta una sola vez
+    gemini_client = GeminiClient()
+    data_handler = DataHandler(
+        api_base_url=os.getenv("FINANCIAL_API_BASE_URL", "http://localhost:3000"),
+        cache_ttl=0
+    )
+    prompt_builder = PromptBuilder(token_budget=int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", "0")) or None)
+    job = BulkReportJob(
+        gemini_client=gemini_client,
+        prompt_builder=prompt_builder,
+        output_path=args.output,
+        questions=args.question,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        checkpoint_path=args.checkpoint
+    )
+
+    if args.input:
+        async def load(raw: bytes) -> Optional[FinancialData]:
+            return data_handler.parse_financial_data(raw)
+        return await job.run(iter_jsonl(args.input), load)
+
+    await data_handler.open()
+    try:
+        return await job.run(iter_tokens(args.tokens), data_handler.fetch_financial_data_from_api)
+    finally:
+        await data_handler.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Punto de entrada de la línea de comandos."""
+    stats = asyncio.run(_main(parse_args(argv)))
+    logger.info(f"Reportes generados: {stats}")
+    print(json.dumps(stats, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,260 @@
+"""
+Cachés en memoria compartidas por los componentes del chatbot.
+Incluye una caché LRU con TTL y límite de memoria, y un coalescedor de
+peticiones concurrentes (single-flight).
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Caché LRU con expiración por TTL, límite de entradas y límite de memoria."""
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None,
+        stale_ttl: float = 0.0
+    ):
+        """
+        Inicializa la caché.
+
+        Args:
+            ttl: Segundos que una entrada es válida (0 deshabilita la caché)
+            max_entries: Máximo de entradas antes de expulsar la menos usada
+            max_bytes: Tamaño total aproximado permitido (None = sin límite)
+            stale_ttl: Segundos que una entrada vencida se conserva para `lookup` y
+                `touch` (stale-while-revalidate); `get` nunca la devuelve
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        # key -> (expira_en, tamaño, valor); el orden refleja el uso más reciente al final
+        self._data: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Indica si la caché guarda entradas."""
+        return self.ttl > 0 and self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Indica si la clave sigue guardada, vigente o dentro de la ventana de vencidas."""
+        entry = self._data.get(key)
+        return entry is not None and entry[0] + self.stale_ttl > time.monotonic()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Obtiene una entrada vigente y la marca como usada recientemente.
+
+        Args:
+            key: Clave de la entrada
+
+        Returns:
+            El valor cacheado o None si no existe o expiró
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, size, value = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            self._expire(key, expires_at, now)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def lookup(self, key: Hashable) -> Tuple[Optional[Any], bool]:
+        """
+        Obtiene una entrada aunque haya vencido, si sigue dentro de `stale_ttl`.
+
+        Args:
+            key: Clave de la entrada
+
+        Returns:
+            Tupla (valor o None, True si el valor está vencido y conviene revalidarlo)
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None, False
+
+        expires_at, size, value = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if self._expire(key, expires_at, now):
+                self.misses += 1
+                return None, False
+            self._data.move_to_end(key)
+            self.stale_hits += 1
+            return value, True
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value, False
+
+    def touch(self, key: Hashable, ttl: Optional[float] = None) -> Optional[Any]:
+        """
+        Renueva la vigencia de una entrada guardada (p. ej. tras un 304 Not Modified).
+
+        Args:
+            key: Clave de la entrada
+            ttl: Nuevo TTL de la entrada (default: el de la caché)
+
+        Returns:
+            El valor renovado o None si la entrada ya no está
+        """
+        if key not in self:
+            return None
+        _, size, value = self._data[key]
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), size, value)
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, size: int = 0, ttl: Optional[float] = None) -> None:
+        """
+        Guarda una entrada, expulsando las menos usadas si se exceden los límites.
+
+        Args:
+            key: Clave de la entrada
+            value: Valor a guardar
+            size: Tamaño aproximado en bytes (para el límite de memoria)
+            ttl: TTL específico para esta entrada (default: el de la caché)
+        """
+        if not self.enabled:
+            return
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Una entrada más grande que toda la caché no se guarda
+            return
+
+        if key in self._data:
+            self._remove(key)
+
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, size, value)
+        self._bytes += size
+
+        while len(self._data) > self.max_entries or (
+            self.max_bytes is not None and self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Elimina una entrada si existe."""
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Vacía la caché (conserva las métricas)."""
+        self._data.clear()
+        self._bytes = 0
+
+    def _expire(self, key: Hashable, expires_at: float, now: float) -> bool:
+        """Elimina una entrada vencida si también pasó su ventana de `stale_ttl`."""
+        if expires_at + self.stale_ttl > now:
+            return False
+        self._remove(key)
+        self.expirations += 1
+        return True
+
+    def _remove(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de uso de la caché."""
+        lookups = self.hits + self.misses + self.stale_hits
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stale_hits": self.stale_hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SingleFlight:
+    """Coalesce llamadas concurrentes con la misma clave en una sola ejecución."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self._waiters: Dict["asyncio.Future[Any]", int] = {}
+        self.coalesced = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        cancel_if_abandoned: bool = False
+    ) -> Any:
+        """
+        Ejecuta `fn` una sola vez por clave mientras haya llamadas en curso.
+
+        Args:
+            key: Clave que identifica el trabajo
+            fn: Función asíncrona sin argumentos que realiza el trabajo
+            cancel_if_abandoned: Si este llamador se cancela y nadie más espera el
+                resultado, el trabajo también se cancela (por defecto sigue en curso)
+
+        Returns:
+            El resultado compartido de `fn`
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # shield: si un llamador se cancela, el trabajo sigue para los demás
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if cancel_if_abandoned and self._waiters[task] == 1:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    async def drain(self) -> None:
+        """Cancela el trabajo en curso y espera a que termine (al cerrar la app)."""
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _forget(self, key: Hashable, task: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
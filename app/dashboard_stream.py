@@ -0,0 +1,169 @@
+"""
+Lectura incremental de respuestas grandes de /api/dashboard/all.
+El JSON se parsea a medida que llegan los bytes (ijson) y de cada lista de
+transacciones solo se conservan las K de mayor monto; el resto se descarta tras
+sumarlo a los agregados de la analítica. La memoria depende de K, no del
+historial del usuario.
+
+Requiere `ijson` (ver requirements-optional.txt).
+"""
+
+import heapq
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from app.analytics import TransactionAccumulator
+
+
+# Listas de transacciones que se reducen (ruta sin el envoltorio "data.") -> tipo
+STREAMED_LISTS: Dict[str, str] = {
+    "detalle.ingresos.transacciones": "ingreso",
+    "detalle.extras.transacciones": "ingreso",
+    "detalle.gastos.transacciones": "gasto",
+    "detalle.gastos.porCategoria.item.transacciones": "gasto_categoria",
+}
+
+_CATEGORY_PREFIX = "detalle.gastos.porCategoria.item"
+
+
+def _relative(prefix: str) -> str:
+    """Ruta de un evento sin el envoltorio {success, data} si lo hay."""
+    return prefix[5:] if prefix.startswith("data.") else prefix
+
+
+class DashboardStreamReducer:
+    """Construye una vista reducida del dashboard a partir de fragmentos de bytes."""
+
+    def __init__(self, top_k: int = 50):
+        """
+        Inicializa el reductor.
+
+        Args:
+            top_k: Transacciones que se conservan por lista (las de mayor monto)
+
+        Raises:
+            ImportError: si `ijson` no está instalado
+        """
+        if ijson is None:
+            raise ImportError("ijson es necesario para leer el dashboard en streaming")
+        self.top_k = top_k
+        self.accumulator = TransactionAccumulator()
+        self.bytes_read = 0
+        self.dropped = 0
+        self._events = ijson.sendable_list()
+        self._parser = ijson.parse_coro(self._events, use_float=True)
+        self._root = ijson.ObjectBuilder()
+        self._order = itertools.count()
+        # Lista en curso: (tipo, lista del documento, montículo [monto, orden, transacción])
+        self._list: Optional[Tuple[str, List[Any], List[list]]] = None
+        self._list_prefix: Optional[str] = None
+        self._list_path: Optional[str] = None
+        # Transacción en curso: campos leídos, clave actual y constructor de valores anidados
+        self._item: Optional[Dict[str, Any]] = None
+        self._key: Optional[str] = None
+        self._nested: Optional[Any] = None
+        self._depth = 0
+        self._category: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> None:
+        """Procesa un fragmento del body."""
+        self.bytes_read += len(chunk)
+        self._parser.send(chunk)
+        self._process()
+
+    def close(self) -> Any:
+        """
+        Termina el parseo.
+
+        Returns:
+            Documento reducido (mismo formato que la respuesta, listas recortadas)
+
+        Raises:
+            ijson.JSONError: si el body está incompleto o mal formado
+        """
+        self._parser.close()
+        self._process()
+        return self._root.value
+
+    def _process(self) -> None:
+        for prefix, event, value in self._events:
+            if self._item is not None:
+                # Dentro de una transacción: camino rápido para los campos planos
+                if self._depth == 1:
+                    if event == "map_key":
+                        self._key = value
+                    elif event == "end_map":
+                        self._keep(self._item)
+                        self._item = None
+                    elif event == "start_map" or event == "start_array":
+                        self._nested = ijson.ObjectBuilder()
+                        self._nested.event(event, value)
+                        self._depth = 2
+                    else:
+                        self._item[self._key] = value
+                    continue
+                self._nested.event(event, value)
+                if event == "start_map" or event == "start_array":
+                    self._depth += 1
+                elif event == "end_map" or event == "end_array":
+                    self._depth -= 1
+                    if self._depth == 1:
+                        self._item[self._key] = self._nested.value
+                        self._nested = None
+                continue
+
+            if self._list is not None and prefix == self._list_prefix and event == "start_map":
+                self._item = {}
+                self._depth = 1
+                continue
+
+            self._root.event(event, value)
+            if event == "start_array":
+                path = _relative(prefix)
+                kind = STREAMED_LISTS.get(path)
+                if kind is not None:
+                    self._list = (kind, self._root.containers[-1], [])
+                    self._list_prefix = prefix + ".item"
+                    self._list_path = path
+            elif event == "end_array" and self._list is not None and prefix + ".item" == self._list_prefix:
+                # Se conservan las K de mayor monto en su orden original
+                _, items, heap = self._list
+                items.extend(entry[2] for entry in sorted(heap, key=lambda entry: entry[1]))
+                self._list = None
+                self._list_prefix = None
+                self._list_path = None
+            elif event == "start_map" and _relative(prefix) == _CATEGORY_PREFIX:
+                self._category = None
+            elif event == "string" and _relative(prefix) == _CATEGORY_PREFIX + ".categoria":
+                self._category = value
+        del self._events[:]
+
+    def _keep(self, transaction: Any) -> None:
+        kind, _, heap = self._list
+        self.accumulator.count(self._list_path)
+        monto = transaction.get("monto") if isinstance(transaction, dict) else None
+        if not isinstance(monto, (int, float)):
+            # Sin monto numérico no se puede ordenar: se conserva para que la validación lo rechace
+            heap.append([float("inf"), next(self._order), transaction])
+            return
+
+        fecha = transaction.get("fecha")
+        fecha = fecha if isinstance(fecha, str) else ""
+        if kind == "ingreso":
+            self.accumulator.add_income(monto, fecha)
+        else:
+            nested = kind == "gasto_categoria"
+            categoria = transaction.get("categoria") or (self._category if nested else None)
+            self.accumulator.add_expense(monto, fecha, categoria, nested=nested)
+
+        entry = [monto, next(self._order), transaction]
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, entry)
+        else:
+            heapq.heappushpop(heap, entry)
+            self.dropped += 1
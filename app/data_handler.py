@@ -1,9 +1,17 @@
 
 from __future__ import annotations
-from typing import Dict, Any, Optional, List
+import os
+import asyncio
+import random
+import hashlib
+import importlib.util
+from typing import Annotated, Awaitable, Callable, Dict, Any, Optional, List, Tuple, Union
 import httpx
 from loguru import logger
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from pydantic_core import to_json
+
+from app.cache import TTLCache, SingleFlight
 
 
 class Usuario(BaseModel):
@@ -192,19 +200,143 @@ class FinancialDataResponse(BaseModel):
     data: FinancialData
 
 
+# Adaptador reutilizable para ambos formatos: {success, data} o los datos directos.
+# Construirlo una sola vez evita recompilar el validador en cada petición.
+# left_to_right: el modo "smart" de las uniones valida el payload dos veces.
+FinancialPayload = Annotated[
+    Union[FinancialDataResponse, FinancialData],
+    Field(union_mode="left_to_right")
+]
+FINANCIAL_PAYLOAD_ADAPTER: TypeAdapter[FinancialPayload] = TypeAdapter(FinancialPayload)
+
+# Resultado de una sección cuando la API rechaza el token (401): a diferencia de
+# otros errores no se recurre a /all, que fallaría igual
+_REJECTED = object()
+
+
 class DataHandler:
     """Maneja la validación y procesamiento de datos financieros."""
     
-    def __init__(self, api_base_url: Optional[str] = None):
+    def __init__(
+        self,
+        api_base_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None,
+        timeout: float = 30.0,
+        cache_ttl: Optional[float] = None,
+        cache_max_entries: Optional[int] = None,
+        cache_max_bytes: Optional[int] = None,
+        cache_stale_ttl: Optional[float] = None,
+        cache_jitter: Optional[float] = None,
+        streaming: Optional[bool] = None,
+        stream_top_k: Optional[int] = None,
+        partial_fetch: Optional[bool] = None,
+        section_urls: Optional[Dict[str, str]] = None
+    ):
         """
         Inicializa el manejador de datos.
         
         Args:
             api_base_url: URL base de la API financiera externa (opcional)
+            max_connections: Máximo de conexiones del pool (default: FINANCIAL_API_MAX_CONNECTIONS o 100)
+            max_keepalive_connections: Conexiones ociosas que se mantienen abiertas
+                (default: FINANCIAL_API_MAX_KEEPALIVE o 20)
+            keepalive_expiry: Segundos que una conexión ociosa sigue abierta
+                (default: FINANCIAL_API_KEEPALIVE_EXPIRY o 30)
+            http2: Habilita HTTP/2 si el paquete `h2` está instalado (default: FINANCIAL_API_HTTP2 o false)
+            timeout: Timeout en segundos para las peticiones a la API
+            cache_ttl: Segundos que se reutilizan los datos de un token (default: DASHBOARD_CACHE_TTL o 60, 0 = sin caché)
+            cache_max_entries: Máximo de tokens en caché (default: DASHBOARD_CACHE_MAX_ENTRIES o 1000)
+            cache_max_bytes: Memoria máxima aproximada de la caché (default: DASHBOARD_CACHE_MAX_BYTES o 50 MB)
+            cache_stale_ttl: Segundos tras vencer en los que los datos se siguen sirviendo mientras se
+                revalidan en segundo plano (default: DASHBOARD_CACHE_STALE_TTL o 0 = deshabilitado)
+            cache_jitter: Fracción aleatoria que se resta al TTL de cada entrada para que no venzan
+                todas a la vez (default: DASHBOARD_CACHE_JITTER o 0.1)
+            streaming: Lee /api/dashboard/all de forma incremental y conserva solo las
+                transacciones de mayor monto, si `ijson` está instalado (default: DASHBOARD_STREAMING o false)
+            stream_top_k: Transacciones que se conservan por lista en streaming (default: DASHBOARD_STREAM_TOP_K o 50)
+            partial_fetch: Pide solo las secciones del dashboard que necesita cada pregunta
+                (default: DASHBOARD_PARTIAL_FETCH o false)
+            section_urls: URL del endpoint de cada sección (default: DASHBOARD_SECTION_URL_TEMPLATE
+                y DASHBOARD_SECTION_URL_<SECCION>, ver app/fetch_planner.py)
         """
         self.api_base_url = api_base_url or "http://localhost:3000"
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections or int(os.getenv("FINANCIAL_API_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=max_keepalive_connections or int(os.getenv("FINANCIAL_API_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=keepalive_expiry or float(os.getenv("FINANCIAL_API_KEEPALIVE_EXPIRY", "30"))
+        )
+        if http2 is None:
+            http2 = os.getenv("FINANCIAL_API_HTTP2", "false").lower() in ("1", "true", "yes")
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 solicitado pero el paquete 'h2' no está instalado; se usará HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        
+        if streaming is None:
+            streaming = os.getenv("DASHBOARD_STREAMING", "false").lower() in ("1", "true", "yes")
+        if streaming and importlib.util.find_spec("ijson") is None:
+            logger.warning("Lectura en streaming solicitada pero el paquete 'ijson' no está instalado; se leerá el body completo")
+            streaming = False
+        self.streaming = streaming
+        self.stream_top_k = stream_top_k or int(os.getenv("DASHBOARD_STREAM_TOP_K", "50"))
+        
+        if partial_fetch is None:
+            partial_fetch = os.getenv("DASHBOARD_PARTIAL_FETCH", "false").lower() in ("1", "true", "yes")
+        self.partial_fetch = partial_fetch
+        self.section_urls = section_urls
+        
+        # Pool de conexiones compartido; se abre y cierra con el ciclo de vida de la app
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # Caché de datos validados por token y coalescencia de fetches concurrentes
+        self.dashboard_cache = TTLCache(
+            ttl=cache_ttl if cache_ttl is not None else float(os.getenv("DASHBOARD_CACHE_TTL", "60")),
+            max_entries=cache_max_entries or int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "1000")),
+            max_bytes=cache_max_bytes or int(os.getenv("DASHBOARD_CACHE_MAX_BYTES", str(50 * 1024 * 1024))),
+            stale_ttl=cache_stale_ttl if cache_stale_ttl is not None else float(os.getenv("DASHBOARD_CACHE_STALE_TTL", "0"))
+        )
+        self.cache_jitter = cache_jitter if cache_jitter is not None else float(os.getenv("DASHBOARD_CACHE_JITTER", "0.1"))
+        self._dashboard_flight = SingleFlight()
+        # ETag de la última respuesta de cada token, para revalidar con If-None-Match
+        self._etags = TTLCache(
+            ttl=self.dashboard_cache.ttl + self.dashboard_cache.stale_ttl,
+            max_entries=self.dashboard_cache.max_entries
+        )
+        # Revalidaciones en segundo plano en curso (referencias para que no se recolecten)
+        self._refreshes: set = set()
+        self.refreshes = 0
+        self.not_modified = 0
         logger.info(f"DataHandler inicializado con API: {self.api_base_url}")
     
+    async def open(self) -> None:
+        """Abre el pool de conexiones compartido hacia la API financiera."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2
+            )
+            logger.info(
+                f"Pool HTTP abierto (max_connections={self.limits.max_connections}, "
+                f"keepalive={self.limits.max_keepalive_connections}, http2={self.http2})"
+            )
+    
+    async def close(self) -> None:
+        """Cierra el pool de conexiones compartido (y cancela las revalidaciones pendientes)."""
+        refreshes = list(self._refreshes)
+        for task in refreshes:
+            task.cancel()
+        await self._dashboard_flight.drain()
+        await asyncio.gather(*refreshes, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Pool HTTP cerrado")
+    
     def validate_and_process(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
         Valida y procesa los datos financieros recibidos.
@@ -238,6 +370,38 @@ class DataHandler:
             logger.error(f"Error inesperado al procesar datos: {str(e)}")
             return None
     
+    def parse_financial_data(self, data: Union[bytes, str, Dict[str, Any]]) -> Optional[FinancialData]:
+        """
+        Valida los datos financieros y devuelve el modelo tipado, sin volver a convertirlo en diccionario.
+        
+        Con bytes o str se usa el parser JSON de pydantic-core directamente, sin
+        pasar por `json.loads`. Acepta el formato {success, data} y el directo.
+        
+        Args:
+            data: JSON crudo (bytes/str) o diccionario ya parseado
+            
+        Returns:
+            FinancialData validado o None si hay error
+        """
+        try:
+            if isinstance(data, (bytes, bytearray, str)):
+                parsed = FINANCIAL_PAYLOAD_ADAPTER.validate_json(data)
+            else:
+                parsed = FINANCIAL_PAYLOAD_ADAPTER.validate_python(data)
+            
+            if isinstance(parsed, FinancialDataResponse):
+                logger.info("Datos financieros validados correctamente (formato con success/data)")
+                return parsed.data
+            logger.info("Datos financieros validados correctamente (formato directo)")
+            return parsed
+        
+        except ValidationError as e:
+            logger.error(f"Error de validación de datos: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Error inesperado al procesar datos: {str(e)}")
+            return None
+    
     def validate_financial_data(self, data: Dict[str, Any]) -> bool:
         """
         Valida que los datos financieros tengan la estructura esperada.
@@ -261,15 +425,225 @@ class DataHandler:
         except ValidationError:
             return False
     
-    async def fetch_financial_data_from_api(self, bearer_token: str) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _token_key(bearer_token: str) -> str:
+        """Clave de caché derivada del token (el token nunca se guarda en claro)."""
+        return hashlib.sha256(bearer_token.encode("utf-8")).hexdigest()
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Métricas de la caché de datos financieros."""
+        stats = self.dashboard_cache.stats()
+        stats["coalesced"] = self._dashboard_flight.coalesced
+        stats["inflight"] = len(self._dashboard_flight)
+        stats["background_refreshes"] = self.refreshes
+        stats["not_modified"] = self.not_modified
+        return stats
+    
+    def _entry_ttl(self) -> float:
+        """TTL de una entrada nueva, con jitter para que las revalidaciones no coincidan."""
+        return self.dashboard_cache.ttl * (1 - random.uniform(0, self.cache_jitter))
+    
+    def _cached_dashboard(self, key: str, bearer_token: str, section: Optional[str] = None) -> Optional[Any]:
+        """
+        Datos del token (o de una de sus secciones) en caché; si están vencidos
+        (dentro de `stale_ttl`) se devuelven igualmente y se revalidan en segundo plano.
+        """
+        entry_key = key if section is None else f"{key}:{section}"
+        cached, stale = self.dashboard_cache.lookup(entry_key)
+        if cached is None:
+            return None
+        if stale:
+            logger.info("Datos financieros vencidos servidos desde caché; revalidando en segundo plano")
+            self._refresh_in_background(key, bearer_token, section)
+        elif section is None:
+            logger.info("Datos financieros servidos desde caché")
+        return cached
+    
+    def _fetcher(self, key: str, bearer_token: str, section: Optional[str] = None) -> Callable[[], Awaitable[Any]]:
+        """Función que pide a la API el dashboard completo o una sección y la guarda en caché."""
+        if section is None:
+            return lambda: self._fetch_and_cache(key, bearer_token)
+        return lambda: self._fetch_section_and_cache(key, bearer_token, section)
+    
+    def _refresh_in_background(self, key: str, bearer_token: str, section: Optional[str] = None) -> None:
+        """Lanza la revalidación de un token (o de una sección) si no hay ya un fetch en curso."""
+        entry_key = key if section is None else f"{key}:{section}"
+        if entry_key in self._dashboard_flight:
+            return
+        task = asyncio.ensure_future(
+            self._dashboard_flight.do(entry_key, self._fetcher(key, bearer_token, section), cancel_if_abandoned=True)
+        )
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+        self.refreshes += 1
+    
+    async def fetch_financial_data_from_api(
+        self,
+        bearer_token: str,
+        cancel_if_abandoned: bool = False
+    ) -> Optional[FinancialData]:
         """
         Obtiene datos financieros desde la API externa usando el bearer token.
         
+        Los datos validados se reutilizan durante el TTL de la caché y las
+        peticiones concurrentes con el mismo token comparten un único fetch. Con
+        `stale_ttl`, los datos recién vencidos se sirven al instante mientras se
+        revalidan en segundo plano.
+        
+        Args:
+            bearer_token: Token de autenticación Bearer
+            cancel_if_abandoned: Si la llamada se cancela y nadie más espera el fetch,
+                la petición a la API también se cancela (por defecto termina y queda en caché)
+            
+        Returns:
+            FinancialData validado o None si hay error
+        """
+        key = self._token_key(bearer_token)
+        cached = self._cached_dashboard(key, bearer_token)
+        if cached is not None:
+            return cached
+        
+        return await self._dashboard_flight.do(
+            key, lambda: self._fetch_and_cache(key, bearer_token), cancel_if_abandoned
+        )
+    
+    async def fetch_for_question(
+        self,
+        bearer_token: str,
+        question: str
+    ) -> Tuple[Optional[FinancialData], Optional[List[str]]]:
+        """
+        Obtiene las secciones del dashboard que necesita una pregunta.
+        
+        Con `partial_fetch` las secciones se piden en paralelo a sus endpoints y se
+        unen en un FinancialData parcial. Se usa /api/dashboard/all si la pregunta
+        es general, necesita todo el detalle, el dashboard completo ya está en
+        caché o algún endpoint de sección falla (salvo un 401: con el token
+        rechazado /all también fallaría).
+        
+        Args:
+            bearer_token: Token de autenticación Bearer
+            question: Pregunta del usuario
+            
+        Returns:
+            Tupla (FinancialData o None si hay error, secciones del contexto que se
+            pueden renderizar o None si los datos están completos)
+        """
+        # Import diferido: el planificador depende de los modelos de este módulo
+        from app.fetch_planner import assemble_financial_data, context_sections, plan_fetch, section_urls_from_env
+        
+        plan = plan_fetch(question) if self.partial_fetch else None
+        if plan is None:
+            return await self.fetch_financial_data_from_api(bearer_token), None
+        
+        key = self._token_key(bearer_token)
+        cached = self._cached_dashboard(key, bearer_token)
+        if cached is not None:
+            return cached, None
+        
+        if self.section_urls is None:
+            self.section_urls = section_urls_from_env(self.api_base_url)
+        fragments = await asyncio.gather(
+            *(self._fetch_section(key, bearer_token, section) for section in plan)
+        )
+        if any(fragment is _REJECTED for fragment in fragments):
+            return None, None
+        if any(fragment is None for fragment in fragments):
+            logger.warning("No se pudieron obtener todas las secciones; se pide el dashboard completo")
+            return await self.fetch_financial_data_from_api(bearer_token), None
+        
+        logger.info(f"Dashboard parcial obtenido ({', '.join(plan)})")
+        return assemble_financial_data(dict(zip(plan, fragments))), context_sections(plan)
+    
+    async def _fetch_section(self, key: str, bearer_token: str, section: str) -> Optional[Any]:
+        """
+        Obtiene una sección del dashboard, reutilizando la caché por token y sección.
+        
+        Las secciones siguen las mismas reglas que el dashboard completo: TTL con
+        jitter, revalidación en segundo plano dentro de `stale_ttl` y ETag.
+        
         Args:
+            key: Clave de caché del token
             bearer_token: Token de autenticación Bearer
+            section: Sección del dashboard (ver fetch_planner.SECTION_ADAPTERS)
             
         Returns:
-            Diccionario con los datos financieros validados o None si hay error
+            Fragmento validado, None si hay error o `_REJECTED` si la API rechazó el token
+        """
+        cached = self._cached_dashboard(key, bearer_token, section)
+        if cached is not None:
+            return cached
+        return await self._dashboard_flight.do(f"{key}:{section}", self._fetcher(key, bearer_token, section))
+    
+    async def _fetch_section_and_cache(self, key: str, bearer_token: str, section: str) -> Optional[Any]:
+        """
+        Solicita una sección a su endpoint y la guarda en caché si es válida.
+        
+        Args:
+            key: Clave de caché del token
+            bearer_token: Token de autenticación Bearer
+            section: Sección del dashboard
+            
+        Returns:
+            Fragmento validado, None si hay error o `_REJECTED` si la API rechazó el token
+        """
+        from app.fetch_planner import parse_section
+        
+        section_key = f"{key}:{section}"
+        url = self.section_urls[section]
+        headers = {
+            "Authorization": f"Bearer {bearer_token}",
+            "Content-Type": "application/json"
+        }
+        etag = self._etags.get(section_key)
+        if etag is not None and section_key in self.dashboard_cache:
+            headers["If-None-Match"] = etag
+        try:
+            response = await self._get(url, headers)
+            if response.status_code == 304:
+                return await self._not_modified(key, bearer_token, section)
+            if response.status_code == 401:
+                logger.error("Token de autenticación inválido o expirado")
+                self._forget_token(key)
+                return _REJECTED
+            if response.status_code != 200:
+                logger.warning(f"Sección '{section}' no disponible en {url}: {response.status_code}")
+                return None
+            fragment = parse_section(section, response.content)
+        except httpx.TimeoutException:
+            logger.error(f"Timeout al obtener la sección '{section}'")
+            return None
+        except httpx.RequestError as e:
+            logger.error(f"Error de conexión al obtener la sección '{section}': {str(e)}")
+            return None
+        except ValueError as e:
+            logger.error(f"La sección '{section}' no es válida: {str(e)}")
+            return None
+        
+        self._store(section_key, fragment, len(response.content), response.headers.get("etag"))
+        return fragment
+    
+    async def _get(self, url: str, headers: Dict[str, str]) -> httpx.Response:
+        """GET por el pool compartido o, sin pool abierto, con una conexión de un solo uso."""
+        if self._client is not None:
+            return await self._client.get(url, headers=headers)
+        # Sin pool abierto (p. ej. fuera de la app FastAPI): conexión de un solo uso
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            return await client.get(url, headers=headers)
+    
+    async def _fetch_and_cache(self, key: str, bearer_token: str) -> Optional[FinancialData]:
+        """
+        Solicita los datos a la API externa y guarda en caché los que sean válidos.
+        
+        Si hay una copia guardada con ETag se pide con If-None-Match: un 304
+        renueva la copia sin descargar ni validar de nuevo el dashboard.
+        
+        Args:
+            key: Clave de caché del token
+            bearer_token: Token de autenticación Bearer
+            
+        Returns:
+            FinancialData validado o None si hay error
         """
         try:
             url = f"{self.api_base_url}/api/dashboard/all"
@@ -277,31 +651,40 @@ class DataHandler:
                 "Authorization": f"Bearer {bearer_token}",
                 "Content-Type": "application/json"
             }
+            etag = self._etags.get(key)
+            if etag is not None and key in self.dashboard_cache:
+                headers["If-None-Match"] = etag
             
             logger.info(f"Solicitando datos financieros desde: {url}")
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url, headers=headers)
+            if self.streaming:
+                return await self._fetch_streaming(key, bearer_token, url, headers)
+            
+            response = await self._get(url, headers)
+            
+            if response.status_code == 200:
+                logger.info("Datos financieros obtenidos exitosamente desde la API")
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    logger.info("Datos financieros obtenidos exitosamente desde la API")
-                    
-                    # Validar y procesar los datos
-                    validated_data = self.validate_and_process(data)
-                    if validated_data:
-                        return validated_data
-                    else:
-                        logger.error("Los datos obtenidos de la API no son válidos")
-                        return None
-                        
-                elif response.status_code == 401:
-                    logger.error("Token de autenticación inválido o expirado")
-                    return None
-                    
+                # Validar directamente los bytes de la respuesta
+                validated_data = self.parse_financial_data(response.content)
+                if validated_data:
+                    self._store(key, validated_data, len(response.content), response.headers.get("etag"))
+                    return validated_data
                 else:
-                    logger.error(f"Error al obtener datos de la API: {response.status_code} - {response.text}")
+                    logger.error("Los datos obtenidos de la API no son válidos")
                     return None
+            
+            elif response.status_code == 304:
+                return await self._not_modified(key, bearer_token)
+                    
+            elif response.status_code == 401:
+                logger.error("Token de autenticación inválido o expirado")
+                self._forget_token(key)
+                return None
+                
+            else:
+                logger.error(f"Error al obtener datos de la API: {response.status_code} - {response.text}")
+                return None
                     
         except httpx.TimeoutException:
             logger.error("Timeout al conectar con la API financiera")
@@ -312,4 +695,104 @@ class DataHandler:
         except Exception as e:
             logger.error(f"Error inesperado al obtener datos de la API: {str(e)}")
             return None
-
+    
+    def _store(self, key: str, validated_data: Any, size: int, etag: Optional[str]) -> None:
+        """Guarda los datos de un token o una sección (con TTL con jitter) y su ETag si la API lo envía."""
+        ttl = self._entry_ttl()
+        self.dashboard_cache.set(key, validated_data, size=size, ttl=ttl)
+        if etag:
+            self._etags.set(key, etag, ttl=ttl + self.dashboard_cache.stale_ttl)
+        else:
+            self._etags.delete(key)
+    
+    async def _not_modified(self, key: str, bearer_token: str, section: Optional[str] = None) -> Optional[Any]:
+        """
+        Renueva la copia guardada (del dashboard o de una sección) tras un 304 Not Modified.
+        
+        Si la copia se expulsó mientras llegaba la respuesta, se pide de nuevo sin ETag.
+        """
+        entry_key = key if section is None else f"{key}:{section}"
+        ttl = self._entry_ttl()
+        cached = self.dashboard_cache.touch(entry_key, ttl)
+        if cached is None:
+            self._etags.delete(entry_key)
+            return await self._fetcher(key, bearer_token, section)()
+        self._etags.touch(entry_key, ttl + self.dashboard_cache.stale_ttl)
+        self.not_modified += 1
+        logger.info("Datos financieros sin cambios (304); se renueva la copia en caché")
+        return cached
+    
+    def _forget_token(self, key: str) -> None:
+        """Descarta las copias de un token rechazado por la API para no seguir sirviéndolas vencidas."""
+        for entry_key in (key, *(f"{key}:{section}" for section in self.section_urls or ())):
+            self.dashboard_cache.delete(entry_key)
+            self._etags.delete(entry_key)
+    
+    async def _fetch_streaming(
+        self,
+        key: str,
+        bearer_token: str,
+        url: str,
+        headers: Dict[str, str]
+    ) -> Optional[FinancialData]:
+        """
+        Lee el dashboard a medida que llega y valida solo la vista reducida.
+        
+        De cada lista de transacciones se conservan las `stream_top_k` de mayor
+        monto; la analítica del prompt se calcula sobre todas mientras se leen.
+        
+        Args:
+            key: Clave de caché del token
+            bearer_token: Token de autenticación Bearer
+            url: URL de /api/dashboard/all
+            headers: Headers con el bearer token (y If-None-Match si hay copia con ETag)
+            
+        Returns:
+            FinancialData reducido o None si hay error
+        """
+        # Import diferido: la analítica depende de los modelos de este módulo
+        from app.analytics import compute_analytics, remember_analytics, remember_transaction_counts
+        from app.dashboard_stream import DashboardStreamReducer
+        
+        reducer = DashboardStreamReducer(top_k=self.stream_top_k)
+        client = self._client or httpx.AsyncClient(timeout=self.timeout)
+        try:
+            async with client.stream("GET", url, headers=headers) as response:
+                status = response.status_code
+                if status != 200:
+                    body = await response.aread()
+                    if status == 401:
+                        logger.error("Token de autenticación inválido o expirado")
+                        self._forget_token(key)
+                    elif status != 304:
+                        logger.error(f"Error al obtener datos de la API: {status} - {body[:500]!r}")
+                else:
+                    etag = response.headers.get("etag")
+                    async for chunk in response.aiter_bytes():
+                        reducer.feed(chunk)
+        finally:
+            if client is not self._client:
+                await client.aclose()
+        if status == 304:
+            return await self._not_modified(key, bearer_token)
+        if status != 200:
+            return None
+        document = reducer.close()
+        
+        logger.info(
+            f"Datos financieros leídos en streaming ({reducer.bytes_read / 1024:,.0f} KB, "
+            f"{reducer.dropped} transacciones fuera del top {self.stream_top_k})"
+        )
+        validated_data = self.parse_financial_data(document)
+        if not validated_data:
+            logger.error("Los datos obtenidos de la API no son válidos")
+            return None
+        
+        # La analítica se calculó sobre todo el historial, no sobre la vista reducida
+        remember_analytics(
+            validated_data,
+            compute_analytics(validated_data, aggregates=reducer.accumulator.aggregates())
+        )
+        remember_transaction_counts(validated_data, reducer.accumulator.list_counts)
+        self._store(key, validated_data, len(to_json(validated_data)), etag)
+        return validated_data
@@ -0,0 +1,161 @@
+"""
+Planificador de fetches parciales del dashboard.
+A partir de la intención de la pregunta decide qué secciones del dashboard hacen
+falta y las pide en paralelo a endpoints por sección, en lugar de descargar
+/api/dashboard/all completo. Las preguntas generales y las que necesitan todo el
+detalle (la sección de análisis se calcula sobre el historial completo) siguen
+usando /all.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import from_json
+
+from app.data_handler import (
+    Ahorros, Alerta, Detalle, Extras, FinancialData, Gastos, Ingresos, Organizacion, Resumen, Usuario
+)
+from app.intent import select_sections
+
+
+class SeccionResumen(BaseModel):
+    """Respuesta del endpoint de resumen: usuario y totales."""
+    usuario: Usuario
+    resumen: Resumen
+
+
+# Sección del dashboard -> validador de la respuesta de su endpoint (mismo formato que en /all)
+SECTION_ADAPTERS: Dict[str, TypeAdapter] = {
+    "resumen": TypeAdapter(SeccionResumen),
+    "ingresos": TypeAdapter(Ingresos),
+    "gastos": TypeAdapter(Gastos),
+    "extras": TypeAdapter(Extras),
+    "ahorros": TypeAdapter(Ahorros),
+    "alertas": TypeAdapter(List[Alerta]),
+    "organizacion": TypeAdapter(Organizacion),
+}
+
+# Secciones que forman `detalle`; con todas ellas se pide /all directamente
+DETAIL_SECTIONS: Tuple[str, ...] = ("ingresos", "gastos", "extras", "ahorros")
+
+# Sección del contexto del prompt -> secciones del dashboard que necesita
+CONTEXT_NEEDS: Dict[str, Tuple[str, ...]] = {
+    "usuario": ("resumen",),
+    "resumen": ("resumen",),
+    "ingresos": ("ingresos",),
+    "gastos": ("gastos",),
+    "extras": ("extras",),
+    "ahorros": ("ahorros",),
+    "analisis": DETAIL_SECTIONS,
+    "alertas": ("alertas",),
+    "organizacion": ("organizacion",),
+}
+
+DEFAULT_URL_TEMPLATE = "{base}/api/dashboard/{section}"
+
+
+def section_urls_from_env(api_base_url: str) -> Dict[str, str]:
+    """
+    URLs de los endpoints por sección.
+
+    DASHBOARD_SECTION_URL_TEMPLATE define el patrón común ({base} y {section}) y
+    DASHBOARD_SECTION_URL_<SECCION> sobrescribe el de una sección concreta.
+
+    Args:
+        api_base_url: URL base de la API financiera
+
+    Returns:
+        Diccionario sección -> URL
+    """
+    template = os.getenv("DASHBOARD_SECTION_URL_TEMPLATE", DEFAULT_URL_TEMPLATE)
+    return {
+        section: os.getenv(f"DASHBOARD_SECTION_URL_{section.upper()}", template).format(
+            base=api_base_url, section=section
+        )
+        for section in SECTION_ADAPTERS
+    }
+
+
+def plan_fetch(question: str) -> Optional[List[str]]:
+    """
+    Secciones del dashboard que hay que pedir para responder la pregunta.
+
+    Args:
+        question: Pregunta del usuario
+
+    Returns:
+        Secciones a pedir (la primera siempre es "resumen"), o None si conviene
+        pedir /all: preguntas generales o sin intención reconocida y preguntas
+        que necesitan todo el detalle
+    """
+    sections = select_sections(question)
+    if sections is None:
+        return None
+
+    plan: List[str] = []
+    for section in sections:
+        for needed in CONTEXT_NEEDS[section]:
+            if needed not in plan:
+                plan.append(needed)
+    if all(section in plan for section in DETAIL_SECTIONS):
+        return None
+    return plan
+
+
+def context_sections(fetched: Sequence[str]) -> List[str]:
+    """Secciones del contexto del prompt que se pueden renderizar con las secciones obtenidas."""
+    return [
+        name for name, needs in CONTEXT_NEEDS.items()
+        if all(section in fetched for section in needs)
+    ]
+
+
+def parse_section(section: str, body: bytes) -> Any:
+    """
+    Valida la respuesta de un endpoint de sección.
+
+    Args:
+        section: Sección del dashboard
+        body: JSON con el formato {success, data} o el fragmento directo
+
+    Returns:
+        Fragmento validado (modelo o lista de modelos)
+
+    Raises:
+        ValueError: si el JSON está mal formado o no cumple el modelo de la sección
+    """
+    payload = from_json(body)
+    if isinstance(payload, dict) and "success" in payload and "data" in payload:
+        payload = payload["data"]
+    return SECTION_ADAPTERS[section].validate_python(payload)
+
+
+def assemble_financial_data(fragments: Dict[str, Any]) -> FinancialData:
+    """
+    Une las secciones obtenidas en un FinancialData parcial.
+
+    Las partes del detalle que no se pidieron conservan el total del resumen y
+    quedan sin transacciones; alertas y organización quedan vacías.
+
+    Args:
+        fragments: Sección -> fragmento validado (debe incluir "resumen")
+
+    Returns:
+        FinancialData con las secciones obtenidas
+    """
+    base: SeccionResumen = fragments["resumen"]
+    resumen = base.resumen
+    detalle = Detalle(
+        ingresos=fragments.get("ingresos") or Ingresos(total=resumen.totalIngresos),
+        gastos=fragments.get("gastos") or Gastos(total=resumen.totalGastos),
+        extras=fragments.get("extras") or Extras(total=resumen.totalExtras),
+        ahorros=fragments.get("ahorros") or Ahorros(total=resumen.ahorroTotal),
+    )
+    return FinancialData(
+        usuario=base.usuario,
+        resumen=resumen,
+        detalle=detalle,
+        alertas=fragments.get("alertas", []),
+        organizacion=fragments.get("organizacion")
+    )
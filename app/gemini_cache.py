@@ -0,0 +1,227 @@
+"""
+Caché explícita de contexto en Gemini (cached content).
+El prompt de sistema y el contexto financiero de un usuario se suben una sola vez
+como contenido cacheado con TTL; las preguntas de seguimiento solo envían la
+pregunta y referencian ese contenido, así Gemini no vuelve a procesar el contexto.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from loguru import logger
+
+from app.cache import SingleFlight
+
+
+class _CachedContext:
+    """Contenido cacheado en Gemini para un prefijo de prompt."""
+
+    __slots__ = ("name", "expires_at", "last_used", "client")
+
+    def __init__(self, name: str, expires_at: float, last_used: float, client: Any):
+        self.name = name
+        self.expires_at = expires_at
+        self.last_used = last_used
+        self.client = client
+
+
+class CachedContentManager:
+    """Crea, reutiliza y expulsa contenidos cacheados de Gemini."""
+
+    def __init__(
+        self,
+        ttl: float = 600,
+        idle_timeout: float = 300,
+        max_contexts: int = 100,
+        min_tokens: int = 4096,
+        sweep_interval: float = 60
+    ):
+        """
+        Inicializa el gestor de contextos cacheados.
+
+        Args:
+            ttl: Segundos de vida de cada contenido cacheado en Gemini
+            idle_timeout: Segundos sin uso tras los que se borra un contenido
+            max_contexts: Máximo de contenidos vivos (se borra el menos usado)
+            min_tokens: Tokens estimados mínimos para cachear (Gemini rechaza contenidos pequeños)
+            sweep_interval: Segundos entre barridos de contenidos inactivos
+        """
+        self.ttl = ttl
+        self.idle_timeout = idle_timeout
+        self.max_contexts = max_contexts
+        self.min_tokens = min_tokens
+        self.sweep_interval = sweep_interval
+        # Margen para no referenciar un contenido a punto de expirar en Gemini
+        self.refresh_margin = min(30.0, ttl / 4)
+        self._entries: "OrderedDict[str, _CachedContext]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.creations = 0
+        self.skipped = 0
+        self.errors = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, prefix: str) -> str:
+        """Clave del contenido cacheado para un modelo y un prefijo de prompt."""
+        return hashlib.sha256(f"{model}\x00{prefix}".encode("utf-8")).hexdigest()
+
+    async def acquire(self, client: Any, model: str, prefix: str) -> Optional[str]:
+        """
+        Obtiene el nombre del contenido cacheado para un prefijo, creándolo si hace falta.
+
+        Args:
+            client: Cliente del SDK de Gemini
+            model: Modelo con el que se usará el contenido
+            prefix: Prompt de sistema + contexto financiero
+
+        Returns:
+            Nombre del contenido cacheado (p. ej. "cachedContents/...") o None si el
+            prefijo es demasiado pequeño o no se pudo crear
+        """
+        if (len(prefix) + 3) // 4 < self.min_tokens:
+            self.skipped += 1
+            return None
+
+        key = self.make_key(model, prefix)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at - now > self.refresh_margin:
+                entry.last_used = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.name
+            # A punto de expirar: se crea uno nuevo y el viejo expira solo en Gemini
+            del self._entries[key]
+
+        try:
+            return await self._flight.do(key, lambda: self._create(client, model, key, prefix))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"No se pudo crear el contexto cacheado en Gemini: {str(e)}")
+            return None
+
+    async def _create(self, client: Any, model: str, key: str, prefix: str) -> str:
+        cached = await client.aio.caches.create(
+            model=model,
+            config={
+                "contents": prefix,
+                "ttl": f"{int(self.ttl)}s",
+                "display_name": f"chatbot-{key[:16]}",
+            }
+        )
+        now = time.monotonic()
+        self._entries[key] = _CachedContext(cached.name, now + self.ttl, now, client)
+        self.creations += 1
+        logger.info(f"Contexto cacheado en Gemini: {cached.name}")
+
+        while len(self._entries) > self.max_contexts:
+            _, oldest = self._entries.popitem(last=False)
+            self.evictions += 1
+            await self._delete(oldest)
+        return cached.name
+
+    def invalidate(self, name: str) -> None:
+        """Olvida un contenido que Gemini ya no acepta (expirado o borrado)."""
+        for key, entry in list(self._entries.items()):
+            if entry.name == name:
+                del self._entries[key]
+
+    async def _delete(self, entry: _CachedContext) -> None:
+        try:
+            await entry.client.aio.caches.delete(name=entry.name)
+        except Exception as e:
+            logger.warning(f"No se pudo borrar el contexto cacheado {entry.name}: {str(e)}")
+
+    async def evict_idle(self) -> int:
+        """
+        Borra los contenidos sin uso reciente y olvida los expirados.
+
+        Returns:
+            Número de contenidos expulsados
+        """
+        now = time.monotonic()
+        evicted = 0
+        for key, entry in list(self._entries.items()):
+            if entry.expires_at <= now:
+                # Gemini ya lo borró al expirar
+                del self._entries[key]
+                evicted += 1
+            elif now - entry.last_used >= self.idle_timeout:
+                del self._entries[key]
+                await self._delete(entry)
+                evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                evicted = await self.evict_idle()
+                if evicted:
+                    logger.info(f"Contextos cacheados inactivos expulsados: {evicted}")
+            except Exception as e:
+                logger.warning(f"Error expulsando contextos cacheados: {str(e)}")
+
+    def start(self) -> None:
+        """Inicia el barrido periódico de contenidos inactivos."""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self) -> None:
+        """Detiene el barrido y borra en Gemini todos los contenidos vivos."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        entries = list(self._entries.values())
+        self._entries.clear()
+        now = time.monotonic()
+        await asyncio.gather(*(self._delete(entry) for entry in entries if entry.expires_at > now))
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de los contextos cacheados."""
+        return {
+            "contexts": len(self._entries),
+            "hits": self.hits,
+            "creations": self.creations,
+            "skipped_small": self.skipped,
+            "errors": self.errors,
+            "evictions": self.evictions,
+        }
+
+
+def create_cached_content_manager_from_env() -> Optional[CachedContentManager]:
+    """
+    Construye el gestor de contextos cacheados según las variables de entorno.
+
+    - GEMINI_CONTEXT_CACHE_ENABLED: true para habilitarlo (default: false)
+    - GEMINI_CONTEXT_CACHE_TTL: segundos de vida en Gemini (default: 600)
+    - GEMINI_CONTEXT_CACHE_IDLE: segundos sin uso antes de borrarlo (default: 300)
+    - GEMINI_CONTEXT_CACHE_MAX: contenidos vivos como máximo (default: 100)
+    - GEMINI_CONTEXT_CACHE_MIN_TOKENS: tamaño mínimo del prefijo (default: 4096,
+      el mínimo de Gemini 2.0 Flash)
+
+    Returns:
+        CachedContentManager configurado o None si está deshabilitado
+    """
+    if os.getenv("GEMINI_CONTEXT_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+
+    manager = CachedContentManager(
+        ttl=float(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "600")),
+        idle_timeout=float(os.getenv("GEMINI_CONTEXT_CACHE_IDLE", "300")),
+        max_contexts=int(os.getenv("GEMINI_CONTEXT_CACHE_MAX", "100")),
+        min_tokens=int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096"))
+    )
+    logger.info("Caché de contexto de Gemini habilitada")
+    return manager
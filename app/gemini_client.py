@@ -4,28 +4,207 @@ Se encarga de enviar prompts y recibir respuestas concisas del LLM.
 """
 
 import os
-from typing import Optional
+import time
+import asyncio
+from typing import Optional, Any, Callable, Dict, AsyncIterator, List, Tuple
 from loguru import logger
 from google import genai
 from dotenv import load_dotenv
 
+from app.response_cache import ResponseCache
+from app.gemini_cache import CachedContentManager
+from app.governor import GeminiGovernor, PRIORITY_INTERACTIVE, create_governor_from_env
+from app.resilience import (
+    Hedger,
+    RetryPolicy,
+    create_hedger_from_env,
+    create_retry_policy_from_env,
+    is_retryable_error,
+    time_left,
+)
+
 load_dotenv()
 
 
 class GeminiClient:
     """Cliente para interactuar con Google Gemini API."""
     
-    def __init__(self):
-        """Inicializa el cliente de Gemini con la API key."""
+    def __init__(
+        self,
+        client: Optional[Any] = None,
+        max_concurrency: Optional[int] = None,
+        response_cache: Optional[ResponseCache] = None,
+        context_cache: Optional[CachedContentManager] = None,
+        governor: Optional[GeminiGovernor] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        hedger: Optional[Hedger] = None
+    ):
+        """
+        Inicializa el cliente de Gemini con la API key.
+        
+        Args:
+            client: Cliente del SDK ya construido (opcional, útil para pruebas con un backend simulado)
+            max_concurrency: Máximo de llamadas asíncronas simultáneas a Gemini
+                (default: GEMINI_MAX_CONCURRENCY o 32)
+            response_cache: Caché de respuestas para prompts idénticos (opcional)
+            context_cache: Gestor de contextos cacheados en Gemini (opcional)
+            governor: Gobernador de cuota, concurrencia y prioridad
+                (default: configurado desde las variables de entorno)
+            retry_policy: Reintentos de errores transitorios (default: desde las variables de entorno)
+            hedger: Peticiones de cobertura para la latencia de cola
+                (default: según GEMINI_HEDGE_ENABLED)
+        """
         self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError("GEMINI_API_KEY no encontrada en variables de entorno")
+        # Plazo por defecto de una llamada cuando quien llama no propaga el suyo
+        self.request_timeout = float(os.getenv("GEMINI_REQUEST_TIMEOUT", "30")) or None
+        if client is None:
+            if not self.api_key:
+                raise ValueError("GEMINI_API_KEY no encontrada en variables de entorno")
+            # Usar el nuevo SDK de Google Gemini; el timeout HTTP protege también la llamada bloqueante
+            http_options = {"timeout": int(self.request_timeout * 1000)} if self.request_timeout else None
+            client = genai.Client(api_key=self.api_key, http_options=http_options)
+        
+        self.client = client
+        # Modelo por defecto; el enrutador de modelos puede elegir otro por llamada
+        self.model_name = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
         
-        # Usar el nuevo SDK de Google Gemini
-        self.client = genai.Client(api_key=self.api_key)
-        self.model_name = "gemini-2.0-flash"
+        # Limita cuota y concurrencia (adaptativa ante 429/503) y prioriza el tráfico interactivo
+        self.governor = governor or create_governor_from_env(max_concurrency)
+        self.max_concurrency = self.governor.max_concurrency
+        self.retry_policy = retry_policy or create_retry_policy_from_env()
+        self.hedger = hedger if hedger is not None else create_hedger_from_env()
+        self.response_cache = response_cache
+        self.context_cache = context_cache
         logger.info("Cliente Gemini inicializado correctamente")
     
+    async def open(self) -> None:
+        """Inicia las tareas de fondo (barrido de contextos cacheados)."""
+        if self.context_cache is not None:
+            self.context_cache.start()
+    
+    async def close(self) -> None:
+        """Detiene las tareas de fondo y borra los contextos cacheados en Gemini."""
+        if self.context_cache is not None:
+            await self.context_cache.close()
+    
+    @staticmethod
+    def _build_config(max_tokens: int, temperature: float) -> Dict[str, Any]:
+        """Construye la configuración de generación."""
+        return {
+            "max_output_tokens": max_tokens,
+            "temperature": temperature,
+        }
+    
+    @staticmethod
+    def _extract_text(response: Any) -> Optional[str]:
+        """
+        Extrae el texto de una respuesta de Gemini.
+        
+        Args:
+            response: Respuesta devuelta por el SDK
+        
+        Returns:
+            Texto de la respuesta o None si está vacía o fue bloqueada
+        """
+        if response and hasattr(response, 'text') and response.text:
+            text = response.text.strip()
+            if text:
+                logger.info("Respuesta generada exitosamente por Gemini")
+                return text
+        
+        # Si no hay texto, verificar si fue bloqueado por seguridad
+        logger.warning("Respuesta vacía o bloqueada por Gemini")
+        if hasattr(response, 'candidates') and response.candidates:
+            for candidate in response.candidates:
+                if hasattr(candidate, 'safety_ratings'):
+                    logger.warning(f"Safety ratings: {candidate.safety_ratings}")
+        return None
+    
+    @staticmethod
+    def _usage_to_dict(usage: Any) -> Dict[str, int]:
+        """Convierte el `usage_metadata` del SDK en un diccionario serializable."""
+        if usage is None:
+            return {}
+        fields = (
+            "prompt_token_count",
+            "candidates_token_count",
+            "cached_content_token_count",
+            "total_token_count",
+        )
+        return {
+            field: getattr(usage, field)
+            for field in fields
+            if getattr(usage, field, None) is not None
+        }
+    
+    async def _prepare_request(
+        self,
+        prompt: str,
+        cacheable_prefix: Optional[str],
+        max_tokens: int,
+        temperature: float,
+        history: Optional[List[Dict[str, Any]]] = None,
+        model: Optional[str] = None
+    ) -> Tuple[Any, Dict[str, Any], Optional[str]]:
+        """
+        Decide si el prompt se envía completo o referenciando un contexto cacheado.
+        
+        Args:
+            prompt: Prompt completo
+            cacheable_prefix: Parte inicial del prompt que se repite entre preguntas
+                (prompt de sistema + contexto financiero)
+            max_tokens: Máximo de tokens en la respuesta
+            temperature: Controla la creatividad (0.0-1.0)
+            history: Turnos anteriores de la conversación (contenidos multi-turno)
+            model: Modelo de la llamada (el contenido cacheado es propio de cada modelo)
+        
+        Returns:
+            Tupla (contenido a enviar, configuración, nombre del contexto cacheado o None)
+        """
+        config = self._build_config(max_tokens, temperature)
+        cached_name = None
+        if self.context_cache is not None and cacheable_prefix and prompt.startswith(cacheable_prefix):
+            cached_name = await self.context_cache.acquire(
+                self.client, model or self.model_name, cacheable_prefix
+            )
+        
+        if cached_name is not None:
+            config["cached_content"] = cached_name
+            return self._build_contents(prompt[len(cacheable_prefix):], None, history), config, cached_name
+        return self._build_contents(prompt, cacheable_prefix, history), config, None
+    
+    @staticmethod
+    def _build_contents(
+        prompt: str,
+        prefix: Optional[str],
+        history: Optional[List[Dict[str, Any]]]
+    ) -> Any:
+        """
+        Arma el contenido de la llamada: el prompt tal cual o, con historial, una
+        conversación [contexto, turnos anteriores, pregunta actual].
+        """
+        if not history:
+            return prompt
+        head = []
+        if prefix and prompt.startswith(prefix):
+            # El contexto va antes del historial, igual que cuando está cacheado
+            head = [{"role": "user", "parts": [{"text": prefix}]}]
+            prompt = prompt[len(prefix):]
+        return head + list(history) + [{"role": "user", "parts": [{"text": prompt}]}]
+    
+    @staticmethod
+    def _estimate_tokens(prompt: str, max_tokens: int, history: Optional[List[Dict[str, Any]]]) -> int:
+        """Tokens estimados de una llamada (~4 caracteres por token) para el límite por minuto."""
+        chars = len(prompt)
+        for content in history or ():
+            chars += sum(len(part.get("text", "")) for part in content.get("parts", ()))
+        return chars // 4 + max_tokens
+    
+    def _discard_cached_context(self, cached_name: str, error: Exception) -> None:
+        """Olvida un contexto cacheado que Gemini rechazó para reintentar con el prompt completo."""
+        logger.warning(f"Contexto cacheado {cached_name} rechazado, se envía el prompt completo: {str(error)}")
+        self.context_cache.invalidate(cached_name)
+    
     def generate_response(
         self, 
         prompt: str, 
@@ -33,7 +212,7 @@ class GeminiClient:
         temperature: float = 0.7
     ) -> Optional[str]:
         """
-        Genera una respuesta usando Gemini API.
+        Genera una respuesta usando Gemini API (llamada bloqueante).
         
         Args:
             prompt: El prompt completo a enviar a Gemini
@@ -44,35 +223,265 @@ class GeminiClient:
             Respuesta generada por Gemini o None si hay error
         """
         try:
-            # Configuración de generación
-            config = {
-                "max_output_tokens": max_tokens,
-                "temperature": temperature,
-            }
-            
-            # Usar el nuevo SDK
             response = self.client.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
-                config=config
+                config=self._build_config(max_tokens, temperature)
             )
-            
-            # Extraer el texto de la respuesta
-            if response and hasattr(response, 'text') and response.text:
-                text = response.text.strip()
-                if text:
-                    logger.info("Respuesta generada exitosamente por Gemini")
-                    return text
-            
-            # Si no hay texto, verificar si fue bloqueado por seguridad
-            logger.warning("Respuesta vacía o bloqueada por Gemini")
-            if hasattr(response, 'candidates') and response.candidates:
-                for candidate in response.candidates:
-                    if hasattr(candidate, 'safety_ratings'):
-                        logger.warning(f"Safety ratings: {candidate.safety_ratings}")
-            return None
+            return self._extract_text(response)
                 
         except Exception as e:
             logger.error(f"Error al generar respuesta con Gemini: {str(e)}")
             return None
-
+    
+    def _default_deadline(self, deadline: Optional[float]) -> Optional[float]:
+        """Plazo propagado por quien llama o, si no hay, el de GEMINI_REQUEST_TIMEOUT."""
+        if deadline is not None or self.request_timeout is None:
+            return deadline
+        return time.monotonic() + self.request_timeout
+    
+    async def _generate_once(
+        self,
+        prompt: str,
+        cacheable_prefix: Optional[str],
+        history: Optional[List[Dict[str, Any]]],
+        max_tokens: int,
+        temperature: float,
+        priority: int,
+        deadline: Optional[float],
+        model: str
+    ) -> Any:
+        """
+        Un intento de generación: turno del gobernador y llamada acotada por el plazo.
+        
+        Returns:
+            Respuesta del SDK
+        
+        Raises:
+            La excepción de la llamada, para que decidan los reintentos
+        """
+        contents, config, cached_name = await self._prepare_request(
+            prompt, cacheable_prefix, max_tokens, temperature, history, model
+        )
+        tokens = self._estimate_tokens(prompt, max_tokens, history)
+        async with self.governor.slot(priority, tokens, timeout=time_left(deadline)) as admitted:
+            try:
+                try:
+                    response = await asyncio.wait_for(
+                        self.client.aio.models.generate_content(
+                            model=model,
+                            contents=contents,
+                            config=config
+                        ),
+                        time_left(deadline)
+                    )
+                except Exception as e:
+                    # Los errores transitorios se reintentan tal cual; los demás pueden
+                    # deberse al contexto cacheado y se repiten con el prompt completo
+                    if cached_name is None or is_retryable_error(e):
+                        raise
+                    self._discard_cached_context(cached_name, e)
+                    response = await asyncio.wait_for(
+                        self.client.aio.models.generate_content(
+                            model=model,
+                            contents=self._build_contents(prompt, cacheable_prefix, history),
+                            config=self._build_config(max_tokens, temperature)
+                        ),
+                        time_left(deadline)
+                    )
+            except Exception as e:
+                self.governor.record_failure(e, admitted)
+                raise
+            self.governor.record_success()
+        if self.hedger is not None:
+            self.hedger.observe(time.monotonic() - admitted)
+        return response
+    
+    async def generate_response_async(
+        self,
+        prompt: str,
+        max_tokens: int = 300,
+        temperature: float = 0.7,
+        cacheable_prefix: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        deadline: Optional[float] = None,
+        model: Optional[str] = None,
+        on_usage: Optional[Callable[[Dict[str, int]], None]] = None
+    ) -> Optional[str]:
+        """
+        Genera una respuesta usando el cliente asíncrono de Gemini.
+        
+        No bloquea el event loop, por lo que varias peticiones pueden esperar
+        a Gemini al mismo tiempo en un solo worker. Si hay caché de respuestas,
+        un prompt idéntico con los mismos parámetros se responde sin llamar a Gemini.
+        Los errores transitorios (429/500/503/504, timeouts) se reintentan con
+        backoff mientras quede plazo, y si el hedger está habilitado un intento
+        que tarda más que el p95 se cubre con un segundo intento.
+        
+        Args:
+            prompt: El prompt completo a enviar a Gemini
+            max_tokens: Máximo de tokens en la respuesta (default: 300 para respuestas cortas)
+            temperature: Controla la creatividad (0.0-1.0)
+            cacheable_prefix: Prefijo del prompt que puede subirse como contexto cacheado
+            history: Turnos anteriores de la sesión; con historial no se usa la caché de respuestas
+            priority: Prioridad en la cola del gobernador (PRIORITY_BATCH para trabajos en lote)
+            deadline: Plazo absoluto (time.monotonic) propagado desde la petición HTTP
+                (default: ahora + GEMINI_REQUEST_TIMEOUT)
+            model: Modelo a usar (default: GEMINI_MODEL)
+            on_usage: Función que recibe el uso de tokens de la respuesta generada
+        
+        Returns:
+            Respuesta generada por Gemini o None si hay error
+        """
+        model = model or self.model_name
+        cache_key = None
+        if self.response_cache is not None and not history:
+            cache_key = ResponseCache.make_key(prompt, model, temperature, max_tokens)
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Respuesta servida desde la caché de respuestas")
+                return cached
+        
+        deadline = self._default_deadline(deadline)
+        
+        def attempt():
+            return self._generate_once(
+                prompt, cacheable_prefix, history, max_tokens, temperature, priority, deadline, model
+            )
+        
+        async def hedged_attempt():
+            # Con Gemini limitando la cuota, duplicar llamadas solo empeoraría la situación
+            if self.hedger is not None and self.governor.retry_after() is None:
+                return await self.hedger.run(attempt, deadline)
+            return await attempt()
+        
+        try:
+            response = await self.retry_policy.run(hedged_attempt, deadline)
+            if on_usage is not None:
+                on_usage(self._usage_to_dict(getattr(response, "usage_metadata", None)))
+            text = self._extract_text(response)
+            if text and cache_key is not None:
+                await self.response_cache.set(cache_key, text)
+            return text
+        
+        except Exception as e:
+            logger.error(f"Error al generar respuesta con Gemini: {str(e) or type(e).__name__}")
+            return None
+    
+    async def stream_response(
+        self,
+        prompt: str,
+        max_tokens: int = 300,
+        temperature: float = 0.7,
+        cacheable_prefix: Optional[str] = None,
+        history: Optional[List[Dict[str, Any]]] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        deadline: Optional[float] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Genera una respuesta en streaming, fragmento a fragmento.
+        
+        Los errores transitorios solo se reintentan antes del primer fragmento:
+        una vez enviado texto al cliente no se puede empezar de nuevo.
+        
+        Args:
+            prompt: El prompt completo a enviar a Gemini
+            max_tokens: Máximo de tokens en la respuesta (default: 300 para respuestas cortas)
+            temperature: Controla la creatividad (0.0-1.0)
+            cacheable_prefix: Prefijo del prompt que puede subirse como contexto cacheado
+            history: Turnos anteriores de la sesión; con historial no se usa la caché de respuestas
+            priority: Prioridad en la cola del gobernador (PRIORITY_BATCH para trabajos en lote)
+            deadline: Plazo absoluto (time.monotonic) para toda la generación
+                (default: ahora + GEMINI_REQUEST_TIMEOUT)
+            model: Modelo a usar (default: GEMINI_MODEL)
+        
+        Yields:
+            Eventos {"type": "chunk", "text": ...} conforme llegan los tokens, y al final
+            {"type": "done", "usage": {...}} o {"type": "error", "message": ...}
+        """
+        model = model or self.model_name
+        cache_key = None
+        if self.response_cache is not None and not history:
+            cache_key = ResponseCache.make_key(prompt, model, temperature, max_tokens)
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Respuesta en streaming servida desde la caché de respuestas")
+                yield {"type": "chunk", "text": cached}
+                yield {"type": "done", "usage": {}, "cached": True}
+                return
+        
+        deadline = self._default_deadline(deadline)
+        usage = None
+        parts = []
+        attempt = 0
+        try:
+            while True:
+                try:
+                    contents, config, cached_name = await self._prepare_request(
+                        prompt, cacheable_prefix, max_tokens, temperature, history, model
+                    )
+                    tokens = self._estimate_tokens(prompt, max_tokens, history)
+                    async with self.governor.slot(priority, tokens, timeout=time_left(deadline)) as admitted:
+                        try:
+                            try:
+                                stream = await asyncio.wait_for(
+                                    self.client.aio.models.generate_content_stream(
+                                        model=model,
+                                        contents=contents,
+                                        config=config
+                                    ),
+                                    time_left(deadline)
+                                )
+                            except Exception as e:
+                                if cached_name is None or is_retryable_error(e):
+                                    raise
+                                self._discard_cached_context(cached_name, e)
+                                stream = await asyncio.wait_for(
+                                    self.client.aio.models.generate_content_stream(
+                                        model=model,
+                                        contents=self._build_contents(prompt, cacheable_prefix, history),
+                                        config=self._build_config(max_tokens, temperature)
+                                    ),
+                                    time_left(deadline)
+                                )
+                            # El SDK puede no hacer la petición hasta el primer fragmento;
+                            # cada fragmento se espera como mucho lo que queda de plazo
+                            chunks = stream.__aiter__()
+                            while True:
+                                try:
+                                    chunk = await asyncio.wait_for(chunks.__anext__(), time_left(deadline))
+                                except StopAsyncIteration:
+                                    break
+                                if getattr(chunk, "usage_metadata", None) is not None:
+                                    usage = chunk.usage_metadata
+                                text = getattr(chunk, "text", None)
+                                if text:
+                                    parts.append(text)
+                                    yield {"type": "chunk", "text": text}
+                        except Exception as e:
+                            self.governor.record_failure(e, admitted)
+                            raise
+                        self.governor.record_success()
+                    break
+                except Exception as e:
+                    delay = None if parts else self.retry_policy.retry_delay(e, attempt, deadline)
+                    if delay is None:
+                        raise
+                    attempt += 1
+                    await asyncio.sleep(delay)
+            
+            logger.info("Respuesta en streaming generada exitosamente por Gemini")
+            full_text = "".join(parts).strip()
+            if full_text and cache_key is not None:
+                await self.response_cache.set(cache_key, full_text)
+            yield {"type": "done", "usage": self._usage_to_dict(usage)}
+        
+        except Exception as e:
+            logger.error(f"Error al generar respuesta en streaming con Gemini: {str(e) or type(e).__name__}")
+            event = {"type": "error", "message": "Error al generar respuesta con Gemini"}
+            retry_after = self.governor.retry_after()
+            if retry_after is not None:
+                event["retry_after"] = retry_after
+            yield event
@@ -0,0 +1,296 @@
+"""
+Gobernador de las llamadas salientes a Gemini.
+Combina límites de peticiones y tokens por minuto, un límite de concurrencia
+adaptativo (AIMD: crece con cada éxito y se reduce a la mitad ante 429/503) y
+una cola con prioridad para que el tráfico interactivo pase antes que los lotes.
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+from loguru import logger
+
+from app.rate_limit import AsyncRateLimiter
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+_PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+# Códigos con los que Gemini indica cuota agotada o sobrecarga
+OVERLOAD_CODES = (429, 503)
+
+
+class GovernorTimeout(Exception):
+    """La petición esperó en la cola del gobernador más de lo permitido."""
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """
+    Indica si un error de Gemini se debe a cuota agotada o sobrecarga.
+
+    Args:
+        error: Excepción lanzada por el SDK
+
+    Returns:
+        True para errores 429 (RESOURCE_EXHAUSTED) y 503 (UNAVAILABLE)
+    """
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in OVERLOAD_CODES
+    status = getattr(error, "status", None) or ""
+    return status in ("RESOURCE_EXHAUSTED", "UNAVAILABLE")
+
+
+class _WaitStats:
+    """Tiempos de espera en cola de una prioridad (últimas `window` muestras)."""
+
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+        return {
+            "requests": self.count,
+            "avg_wait_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p95_wait_ms": round(p95 * 1000, 2),
+            "max_wait_ms": round(self.max * 1000, 2),
+        }
+
+
+class GeminiGovernor:
+    """Control de admisión de llamadas a Gemini: cuota, concurrencia adaptativa y prioridad."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        min_concurrency: int = 1,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        queue_timeout: Optional[float] = 30.0,
+        decrease_factor: float = 0.5,
+        overload_window: float = 10.0
+    ):
+        """
+        Inicializa el gobernador.
+
+        Args:
+            max_concurrency: Techo de llamadas simultáneas (y valor inicial del límite)
+            min_concurrency: Suelo del límite adaptativo
+            requests_per_minute: Peticiones por minuto permitidas (None = sin límite)
+            tokens_per_minute: Tokens por minuto permitidos (None = sin límite)
+            queue_timeout: Segundos máximos de espera por un turno (None = sin límite)
+            decrease_factor: Factor con el que se reduce el límite ante 429/503
+            overload_window: Segundos tras un 429/503 o un timeout de cola durante los
+                que `retry_after` sugiere reintentar más tarde
+        """
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(1, min(min_concurrency, max_concurrency))
+        self.limit = float(max_concurrency)
+        self.queue_timeout = queue_timeout
+        self.decrease_factor = decrease_factor
+        self.overload_window = overload_window
+        self.request_limiter = AsyncRateLimiter(requests_per_minute) if requests_per_minute else None
+        self.token_limiter = AsyncRateLimiter(tokens_per_minute) if tokens_per_minute else None
+
+        self._in_flight = 0
+        # Montículo de [prioridad, orden de llegada, future]; los cancelados se descartan al sacarlos
+        self._waiters: List[list] = []
+        self._order = itertools.count()
+        self._last_decrease = float("-inf")
+        self._last_overload = float("-inf")
+        self._waits: Dict[int, _WaitStats] = {}
+        self.overloads = 0
+        self.decreases = 0
+        self.timeouts = 0
+
+    def _has_capacity(self) -> bool:
+        return self._in_flight < max(self.min_concurrency, int(self.limit))
+
+    def _wake(self) -> None:
+        """Cede los turnos libres a las peticiones en cola, por prioridad y orden de llegada."""
+        while self._waiters and self._has_capacity():
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._in_flight += 1
+            future.set_result(None)
+
+    async def _acquire_slot(self, priority: int, timeout: Optional[float] = None) -> None:
+        if self._has_capacity() and not self._waiters:
+            self._in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._order), future])
+        # Puede haber turnos libres si la cola solo tenía esperas ya canceladas
+        self._wake()
+        # El plazo de quien llama puede ser más corto que el máximo de la cola
+        limit = self.queue_timeout
+        if timeout is not None and (limit is None or timeout < limit):
+            limit = timeout
+        try:
+            await asyncio.wait_for(future, limit)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if limit == self.queue_timeout:
+                # Solo la cola llena indica saturación; un plazo corto es cosa de quien llama
+                self._last_overload = time.monotonic()
+            raise GovernorTimeout(f"Sin turno para llamar a Gemini tras {limit:.1f}s en cola") from None
+        except BaseException:
+            # Cancelada justo después de recibir el turno: se devuelve
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            raise
+
+    def _release_slot(self) -> None:
+        self._in_flight -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        priority: int = PRIORITY_INTERACTIVE,
+        tokens: int = 0,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[float]:
+        """
+        Reserva un turno para una llamada a Gemini.
+
+        Los límites por minuto se consumen ya con el turno asignado, de modo que
+        la cola con prioridad decide también quién gasta primero la cuota.
+
+        Args:
+            priority: PRIORITY_INTERACTIVE o PRIORITY_BATCH (menor = antes)
+            tokens: Tokens estimados de la llamada (prompt + respuesta) para el límite por minuto
+            timeout: Espera máxima de quien llama (p. ej. lo que queda de su plazo);
+                se aplica la menor entre esta y `queue_timeout`
+
+        Yields:
+            Instante (time.monotonic) en que se admitió la llamada, para `record_failure`
+
+        Raises:
+            GovernorTimeout: si la espera en cola supera `queue_timeout` o `timeout`
+        """
+        start = time.monotonic()
+        await self._acquire_slot(priority, timeout)
+        try:
+            if self.request_limiter is not None:
+                await self.request_limiter.acquire()
+            if self.token_limiter is not None and tokens:
+                await self.token_limiter.acquire(tokens)
+            admitted = time.monotonic()
+            self._waits.setdefault(priority, _WaitStats()).add(admitted - start)
+            yield admitted
+        finally:
+            self._release_slot()
+
+    def record_success(self) -> None:
+        """Aumento aditivo: el límite crece en ~1 por cada `limit` llamadas exitosas."""
+        if self.limit < self.max_concurrency:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._wake()
+
+    def record_failure(self, error: BaseException, admitted: float) -> None:
+        """
+        Disminución multiplicativa si el error indica cuota agotada o sobrecarga.
+
+        Solo reducen el límite las llamadas admitidas después de la última
+        reducción: los errores de las que ya estaban en vuelo cuentan una vez.
+
+        Args:
+            error: Excepción de la llamada a Gemini; los demás errores no cambian el límite
+            admitted: Instante de admisión devuelto por `slot`
+        """
+        if not is_overload_error(error):
+            return
+        self.overloads += 1
+        now = time.monotonic()
+        self._last_overload = now
+        if admitted < self._last_decrease:
+            return
+        self._last_decrease = now
+        previous = self.limit
+        self.limit = max(float(self.min_concurrency), self.limit * self.decrease_factor)
+        self.decreases += 1
+        logger.warning(
+            f"Gemini sobrecargado ({getattr(error, 'code', '?')}): concurrencia {previous:.1f} -> {self.limit:.1f}"
+        )
+
+    def retry_after(self) -> Optional[int]:
+        """
+        Segundos sugeridos para reintentar si Gemini está limitando ahora mismo.
+
+        Returns:
+            Segundos para el header Retry-After, o None si no hubo 429/503 ni
+            timeouts de cola recientes
+        """
+        elapsed = time.monotonic() - self._last_overload
+        if elapsed < self.overload_window:
+            return max(1, round(self.overload_window - elapsed))
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del gobernador: límite actual, ocupación y espera en cola por prioridad."""
+        stats = {
+            "concurrency_limit": round(self.limit, 2),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "queued": sum(1 for _, _, future in self._waiters if not future.done()),
+            "overloads": self.overloads,
+            "decreases": self.decreases,
+            "queue_timeouts": self.timeouts,
+            "queue_wait": {
+                _PRIORITY_NAMES.get(priority, str(priority)): waits.to_dict()
+                for priority, waits in sorted(self._waits.items())
+            },
+        }
+        if self.request_limiter is not None:
+            stats["rpm_wait_seconds"] = round(self.request_limiter.waited, 2)
+        if self.token_limiter is not None:
+            stats["tpm_wait_seconds"] = round(self.token_limiter.waited, 2)
+        return stats
+
+
+def create_governor_from_env(max_concurrency: Optional[int] = None) -> GeminiGovernor:
+    """
+    Construye el gobernador de Gemini según las variables de entorno.
+
+    - GEMINI_MAX_CONCURRENCY: techo de llamadas simultáneas (default: 32)
+    - GEMINI_MIN_CONCURRENCY: suelo del límite adaptativo (default: 1)
+    - GEMINI_RPM: peticiones por minuto, 0 = sin límite (default: 0)
+    - GEMINI_TPM: tokens por minuto, 0 = sin límite (default: 0)
+    - GEMINI_QUEUE_TIMEOUT: segundos máximos en cola, 0 = sin límite (default: 30)
+
+    Args:
+        max_concurrency: Techo explícito que tiene prioridad sobre la variable de entorno
+
+    Returns:
+        GeminiGovernor configurado
+    """
+    queue_timeout = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "30"))
+    return GeminiGovernor(
+        max_concurrency=max_concurrency or int(os.getenv("GEMINI_MAX_CONCURRENCY", "32")),
+        min_concurrency=int(os.getenv("GEMINI_MIN_CONCURRENCY", "1")),
+        requests_per_minute=float(os.getenv("GEMINI_RPM", "0")) or None,
+        tokens_per_minute=float(os.getenv("GEMINI_TPM", "0")) or None,
+        queue_timeout=queue_timeout or None
+    )
@@ -0,0 +1,106 @@
+"""
+Clasificador local de intención de preguntas.
+Detecta por palabras clave de qué trata la pregunta para incluir en el prompt
+solo las secciones del contexto financiero que son relevantes.
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+
+# Intención -> patrones (sobre texto en minúsculas y sin acentos)
+INTENT_PATTERNS: Dict[str, Tuple[str, ...]] = {
+    "saldo": (r"\bsaldo", r"\bbalance", r"\bcuanto (dinero )?tengo", r"\bdisponible"),
+    "ingresos": (r"\bingres", r"\bsalario", r"\bsueldo", r"\bnomina", r"\bgan(o|e|ar|ancia)", r"\bcobr",
+                 r"\bincome", r"\bsalary", r"\bearn"),
+    "gastos": (r"\bgast", r"\bcompra", r"\bpag(o|ar|ue)", r"\bconsum", r"\bcategor", r"\brecort",
+               r"\breduc", r"\bderroch", r"\bspend", r"\bexpense"),
+    "extras": (r"\bextra", r"\bbono", r"\bbonific", r"\badicional", r"\bbonus"),
+    "ahorros": (r"\bahorr", r"\bmeta", r"\bobjetivo", r"\bfondo", r"\bsav(e|ing)", r"\bgoal"),
+    "alertas": (r"\balerta", r"\briesgo", r"\bproblema", r"\baviso", r"\bpeligro", r"\balert", r"\bwarning"),
+    "organizacion": (r"\borganizacion", r"\bfamilia", r"\bmiembro", r"\bequipo", r"\bgrupo", r"\bempresa",
+                     r"\bquien(es)?\b", r"\bfamily", r"\bmember", r"\bteam"),
+}
+
+# Preguntas generales: se responde con el contexto completo
+GENERAL_PATTERNS: Tuple[str, ...] = (
+    r"\bsituacion", r"\bsalud financiera", r"\ben general", r"\bcomo (estoy|voy|ando)", r"\bfinanzas",
+    r"\banaliza", r"\bresumen", r"\bpanorama", r"\boverview", r"\bconsejo",
+)
+
+# Secciones que necesita cada intención, además de las básicas
+INTENT_SECTIONS: Dict[str, Tuple[str, ...]] = {
+    "saldo": (),
+    "ingresos": ("ingresos", "extras"),
+    "gastos": ("gastos", "analisis", "alertas"),
+    "extras": ("extras", "ingresos"),
+    "ahorros": ("ahorros", "gastos", "analisis"),  # Ahorrar más suele pasar por gastar menos
+    "alertas": ("alertas",),
+    "organizacion": ("organizacion",),
+}
+
+# Siempre se incluyen: identifican al usuario y dan los totales
+BASE_SECTIONS: Tuple[str, ...] = ("usuario", "resumen")
+
+_COMPILED_INTENTS = {
+    intent: [re.compile(pattern) for pattern in patterns]
+    for intent, patterns in INTENT_PATTERNS.items()
+}
+_COMPILED_GENERAL = [re.compile(pattern) for pattern in GENERAL_PATTERNS]
+
+
+def normalize_question(question: str) -> str:
+    """Pasa la pregunta a minúsculas y elimina acentos y signos de interrogación."""
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[¿?¡!.,;:]", " ", text)
+
+
+def detect_intents(question: str) -> Set[str]:
+    """
+    Detecta las intenciones de una pregunta.
+
+    Args:
+        question: Pregunta del usuario
+
+    Returns:
+        Conjunto de intenciones (vacío si no se reconoce ninguna)
+    """
+    text = normalize_question(question)
+    return {
+        intent
+        for intent, patterns in _COMPILED_INTENTS.items()
+        if any(pattern.search(text) for pattern in patterns)
+    }
+
+
+def is_general_question(question: str) -> bool:
+    """Indica si la pregunta pide un análisis general de las finanzas."""
+    text = normalize_question(question)
+    return any(pattern.search(text) for pattern in _COMPILED_GENERAL)
+
+
+def select_sections(question: str) -> Optional[List[str]]:
+    """
+    Elige las secciones del contexto financiero relevantes para la pregunta.
+
+    Args:
+        question: Pregunta del usuario
+
+    Returns:
+        Lista de secciones a incluir, o None para usar el contexto completo
+        (preguntas generales o sin intención reconocida)
+    """
+    if is_general_question(question):
+        return None
+    intents = detect_intents(question)
+    if not intents:
+        return None
+
+    sections = list(BASE_SECTIONS)
+    for intent in sorted(intents):
+        for section in INTENT_SECTIONS[intent]:
+            if section not in sections:
+                sections.append(section)
+    return sections
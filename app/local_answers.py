@@ -0,0 +1,326 @@
+"""
+Motor local de respuestas para preguntas puramente factuales.
+Preguntas como "¿cuál es mi saldo?" o "¿en qué categoría gasto más?" ya tienen
+la respuesta en los datos financieros validados: se responden con plantillas en
+español, en microsegundos y sin llamar a Gemini. Cualquier otra pregunta (o una
+factual sin los datos necesarios) se deja a Gemini.
+"""
+
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from app.analytics import transaction_count
+from app.data_handler import FinancialData
+from app.intent import normalize_question
+from app.utils import format_currency
+
+
+# Preguntas que piden consejo, explicación, comparación o un periodo distinto al
+# actual: aunque mencionen un dato, la respuesta no es solo ese dato
+EXCLUDED_PATTERNS: Tuple[str, ...] = (
+    r"\bcomo (puedo|podria|hago|deberia|mejoro|reduzco|estoy|voy|ando)\b", r"\bdeberia", r"\brecomiend",
+    r"\bconsejo", r"\bpor que\b", r"\bsi (ahorro|gasto|reduzco|dejo|aumento|invierto|pago)\b", r"\bplan\b",
+    r"\bestrategia", r"\bconviene", r"\bmejor(ar|es)?\b", r"\bcompar", r"\bproyect", r"\bvale la pena",
+    r"\bes posible", r"\balcanza", r"\bsuficiente", r"\bpreocup", r"\bpasad[oa]\b", r"\banterior",
+    r"\bsemana", r"\bayer\b", r"\bano\b", r"\bpromedio", r"\btendencia",
+)
+
+# Intención local -> patrones (sobre texto en minúsculas y sin acentos)
+LOCAL_PATTERNS: Dict[str, Tuple[str, ...]] = {
+    "saldo": (r"\bsaldo\b", r"\bcuanto dinero tengo\b", r"\bdinero disponible\b"),
+    "ingresos": (r"\bcuanto (he )?(gane|ganado|gano|ingrese|ingresado|cobre|cobrado)\b",
+                 r"\btotal de (mis )?ingresos\b", r"\bcuales son mis ingresos\b"),
+    "extras": (r"\bcuanto\b.*\b(bonos?|bonificacion(es)?|extras?)\b", r"\btotal de (mis )?(extras|bonos)\b"),
+    "categoria_top": (r"\bque categoria\b.*\bgast", r"\bcategoria\b.*\bmas\b", r"\b(en )?(que|donde) gasto mas\b"),
+    "gasto_mayor": (r"\bgasto mas (grande|alto|caro)\b", r"\bmayor gasto\b", r"\bcompra mas (grande|cara)\b"),
+    "gastos": (r"\bcuanto (he |llevo )?gast(e|ado|o)\b", r"\btotal de (mis )?gastos\b", r"\bcuales son mis gastos\b"),
+    "metas": (r"\b(metas?|objetivos?)\b.*\b(progreso|falta|faltan|llevo|voy|van|avance|cuales|cuanto)\b",
+              r"\b(progreso|falta|faltan|llevo|voy|van|avance|cuales|cuanto)\b.*\b(metas?|objetivos?)\b"),
+    "ahorro": (r"\bcuanto (he |tengo |llevo )?ahorrad", r"\btotal (de )?(mis )?ahorros?\b",
+               r"\bcuanto tengo en ahorros\b"),
+    "top_gastador": (r"\bquien\b.*\bgast",),
+    "miembros": (r"\bcuantos miembros\b", r"\bquienes (son|forman|estan)\b", r"\bmiembros de (mi|la)\b"),
+    "alertas": (r"\b(que|cuales|tengo)\b.*\balertas?\b", r"\balertas (activas|pendientes)\b"),
+}
+
+# Intenciones que responden a lo mismo: de cada grupo solo cuenta la primera que coincide
+_GROUPS = {
+    "categoria_top": "gastos", "gasto_mayor": "gastos", "gastos": "gastos",
+    "metas": "ahorro", "ahorro": "ahorro",
+}
+
+_COMPILED_EXCLUDED = [re.compile(pattern) for pattern in EXCLUDED_PATTERNS]
+_COMPILED_LOCAL = [
+    (intent, [re.compile(pattern) for pattern in patterns])
+    for intent, patterns in LOCAL_PATTERNS.items()
+]
+
+
+def _answer_saldo(data: FinancialData, text: str) -> Optional[str]:
+    return f"Tu saldo actual es de {format_currency(data.resumen.saldoActual)}."
+
+
+def _answer_ingresos(data: FinancialData, text: str) -> Optional[str]:
+    answer = f"Tus ingresos suman {format_currency(data.resumen.totalIngresos)}"
+    if data.resumen.totalExtras:
+        answer += f", y además recibiste {format_currency(data.resumen.totalExtras)} en ingresos extra"
+    return answer + "."
+
+
+def _answer_extras(data: FinancialData, text: str) -> Optional[str]:
+    count = transaction_count(data, "detalle.extras.transacciones")
+    answer = f"Has recibido {format_currency(data.detalle.extras.total)} en ingresos extra"
+    if count:
+        answer += f" ({count} {'movimiento' if count == 1 else 'movimientos'})"
+    return answer + "."
+
+
+def _category_mentioned(data: FinancialData, text: str) -> Optional[Tuple[str, float]]:
+    """Categoría de gasto que aparece en la pregunta, con su total."""
+    for category in data.detalle.gastos.porCategoria:
+        if re.search(rf"\b{re.escape(normalize_question(category.categoria).strip())}\b", text):
+            return category.categoria, category.total
+    return None
+
+
+# "gasté en comida": la pregunta se refiere a una categoría o concepto concreto
+_SPEND_QUALIFIER = re.compile(
+    r"\bgast\w*\s+en\s+(?:el |la |los |las |mi |mis )?(?!total\b|este\b|esta\b|todo\b|general\b)\w+"
+)
+
+
+def _answer_gastos(data: FinancialData, text: str) -> Optional[str]:
+    mentioned = _category_mentioned(data, text)
+    if mentioned is not None:
+        category, total = mentioned
+        return f"En {category} llevas gastado {format_currency(total)}."
+    if _SPEND_QUALIFIER.search(text):
+        return None  # Categoría o concepto sin desglose en los datos: que lo busque Gemini
+    return f"Tus gastos suman {format_currency(data.resumen.totalGastos)}."
+
+
+def _answer_categoria_top(data: FinancialData, text: str) -> Optional[str]:
+    categories = data.detalle.gastos.porCategoria
+    if not categories:
+        if data.detalle.gastos.total or data.detalle.gastos.transacciones:
+            return None  # Hay gastos pero sin desglose: que lo calcule Gemini
+        return "No tienes gastos registrados en este periodo."
+    top = max(categories, key=lambda category: category.total)
+    answer = f"Tu categoría con más gasto es {top.categoria}, con {format_currency(top.total)}"
+    total = data.detalle.gastos.total
+    if total > 0:
+        answer += f" ({top.total / total * 100:.0f}% de tus gastos)"
+    return answer + "."
+
+
+def _answer_gasto_mayor(data: FinancialData, text: str) -> Optional[str]:
+    transactions = list(data.detalle.gastos.transacciones)
+    if not transactions:
+        transactions = [t for category in data.detalle.gastos.porCategoria for t in category.transacciones]
+    if not transactions:
+        if data.detalle.gastos.total:
+            return None
+        return "No tienes gastos registrados en este periodo."
+    top = max(transactions, key=lambda transaction: transaction.monto)
+    return f"Tu gasto más grande fue {top.descripcion} por {format_currency(top.monto)} el {top.fecha[:10]}."
+
+
+# "meta del fondo de emergencia", "ahorrado para el viaje": la pregunta se refiere a una meta concreta
+_GOAL_QUALIFIER = re.compile(
+    r"\b(?:metas?|objetivos?|ahorrad[oa]s?|ahorros?)\s+(?:de|del|para)\s+"
+    r"(?:el |la |los |las |mi |mis |un |una )?(?!ahorro|este|esta|hoy|ya\b)\w+"
+)
+
+
+def _unique_goals(data: FinancialData) -> list:
+    # Metas repetidas (mismo nombre y montos) se muestran una vez
+    goals = data.detalle.ahorros.objetivos
+    return list({(g.objetivo, g.montoAhorrado, g.montoMeta): g for g in goals}.values())
+
+
+def _named_goal(data: FinancialData, text: str):
+    """
+    Meta concreta a la que se refiere la pregunta.
+
+    Returns:
+        Tupla (meta nombrada o None, True si la pregunta menciona una meta concreta)
+    """
+    named = [g for g in _unique_goals(data) if re.search(rf"\b{re.escape(normalize_question(g.objetivo).strip())}\b", text)]
+    if len(named) == 1:
+        return named[0], True
+    return None, bool(named) or bool(_GOAL_QUALIFIER.search(text))
+
+
+def _goal_progress(goal) -> str:
+    missing = max(goal.montoMeta - goal.montoAhorrado, 0)
+    return (
+        f"Para tu meta «{goal.objetivo}» llevas {format_currency(goal.montoAhorrado)} de "
+        f"{format_currency(goal.montoMeta)} ({goal.progreso:.0f}%); te faltan {format_currency(missing)}."
+    )
+
+
+def _answer_metas(data: FinancialData, text: str) -> Optional[str]:
+    goal, specific = _named_goal(data, text)
+    if goal is not None:
+        return _goal_progress(goal)
+    if specific:
+        return None  # Meta que no aparece en los datos (o ambigua): que lo explique Gemini
+    goals = _unique_goals(data)
+    if not goals:
+        return "No tienes metas de ahorro registradas."
+    parts = [
+        f"{g.objetivo}: {format_currency(g.montoAhorrado)} de {format_currency(g.montoMeta)} ({g.progreso:.0f}%)"
+        for g in goals[:5]
+    ]
+    return "Tus metas de ahorro: " + "; ".join(parts) + "."
+
+
+def _answer_ahorro(data: FinancialData, text: str) -> Optional[str]:
+    goal, specific = _named_goal(data, text)
+    if goal is not None:
+        return _goal_progress(goal)
+    if specific:
+        return None
+    return f"Tienes {format_currency(data.resumen.ahorroTotal)} ahorrados."
+
+
+def _answer_top_gastador(data: FinancialData, text: str) -> Optional[str]:
+    organization = data.organizacion
+    if organization is None or not organization.analisis.topGastadores:
+        return None
+    top = max(organization.analisis.topGastadores, key=lambda member: member.totalGastado)
+    return f"En {organization.nombre}, quien más ha gastado es {top.nombre}, con {format_currency(top.totalGastado)}."
+
+
+def _answer_miembros(data: FinancialData, text: str) -> Optional[str]:
+    organization = data.organizacion
+    if organization is None:
+        return None
+    names = [member.nombre for member in organization.miembros[:10]]
+    answer = f"{organization.nombre} tiene {organization.resumen.totalMiembros} miembros"
+    if names:
+        more = organization.resumen.totalMiembros - len(names)
+        answer += ": " + ", ".join(names) + (f" y {more} más" if more > 0 else "")
+    return answer + "."
+
+
+def _answer_alertas(data: FinancialData, text: str) -> Optional[str]:
+    alerts = data.alertas or []
+    if not alerts:
+        return "No tienes alertas activas."
+    messages = "; ".join(alert.mensaje for alert in alerts[:5])
+    return f"Tienes {len(alerts)} {'alerta' if len(alerts) == 1 else 'alertas'}: {messages}."
+
+
+_HANDLERS: Dict[str, Callable[[FinancialData, str], Optional[str]]] = {
+    "saldo": _answer_saldo,
+    "ingresos": _answer_ingresos,
+    "extras": _answer_extras,
+    "categoria_top": _answer_categoria_top,
+    "gasto_mayor": _answer_gasto_mayor,
+    "gastos": _answer_gastos,
+    "metas": _answer_metas,
+    "ahorro": _answer_ahorro,
+    "top_gastador": _answer_top_gastador,
+    "miembros": _answer_miembros,
+    "alertas": _answer_alertas,
+}
+
+
+class LocalAnswerEngine:
+    """Responde preguntas factuales desde los datos financieros, sin Gemini."""
+
+    def __init__(self, max_words: int = 14):
+        """
+        Inicializa el motor.
+
+        Args:
+            max_words: Las preguntas más largas se dejan a Gemini (suelen combinar
+                varias peticiones o matices que las plantillas no cubren)
+        """
+        self.max_words = max_words
+        self.answered: Counter = Counter()
+        self.fallbacks = 0
+
+    def detect(self, question: str) -> List[str]:
+        """
+        Intenciones locales de una pregunta.
+
+        Args:
+            question: Pregunta del usuario
+
+        Returns:
+            Intenciones que se pueden responder localmente, en orden; vacía si la
+            pregunta pide algo más que datos
+        """
+        text = normalize_question(question)
+        if len(text.split()) > self.max_words or any(pattern.search(text) for pattern in _COMPILED_EXCLUDED):
+            return []
+        intents = []
+        groups = set()
+        for intent, patterns in _COMPILED_LOCAL:
+            group = _GROUPS.get(intent, intent)
+            if group not in groups and any(pattern.search(text) for pattern in patterns):
+                intents.append(intent)
+                groups.add(group)
+        return intents
+
+    def answer(self, question: str, financial_data: FinancialData) -> Optional[str]:
+        """
+        Responde la pregunta con plantillas si es puramente factual.
+
+        Args:
+            question: Pregunta del usuario
+            financial_data: Datos financieros ya validados
+
+        Returns:
+            Respuesta en español, o None si debe responderla Gemini
+        """
+        intents = self.detect(question)
+        if not intents:
+            self.fallbacks += 1
+            return None
+
+        text = normalize_question(question)
+        answers = []
+        try:
+            for intent in intents:
+                answer = _HANDLERS[intent](financial_data, text)
+                if answer is None:
+                    # Sin los datos para una parte de la pregunta: mejor una respuesta completa de Gemini
+                    self.fallbacks += 1
+                    return None
+                answers.append(answer)
+        except Exception as e:
+            logger.error(f"Error en la respuesta local a '{question}': {str(e)}")
+            self.fallbacks += 1
+            return None
+
+        self.answered.update(intents)
+        return " ".join(answers)
+
+    def stats(self) -> Dict[str, object]:
+        """Preguntas respondidas localmente por intención y derivadas a Gemini."""
+        return {
+            "answered": sum(self.answered.values()),
+            "by_intent": dict(self.answered),
+            "fallbacks": self.fallbacks,
+        }
+
+
+def create_local_answer_engine_from_env() -> Optional[LocalAnswerEngine]:
+    """
+    Construye el motor de respuestas locales según las variables de entorno.
+
+    - LOCAL_ANSWERS_ENABLED: responder sin Gemini las preguntas factuales (default: true)
+    - LOCAL_ANSWERS_MAX_WORDS: longitud máxima de pregunta respondible localmente (default: 14)
+
+    Returns:
+        LocalAnswerEngine configurado o None si está deshabilitado
+    """
+    if os.getenv("LOCAL_ANSWERS_ENABLED", "true").lower() != "true":
+        return None
+    return LocalAnswerEngine(max_words=int(os.getenv("LOCAL_ANSWERS_MAX_WORDS", "14")))
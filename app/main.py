@@ -4,26 +4,56 @@ Endpoint principal que orquesta el flujo completo.
 """
 
 import os
-from typing import Optional, Dict, Any
-from fastapi import FastAPI, HTTPException
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, List, Tuple
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from loguru import logger
 from dotenv import load_dotenv
 
 from app.gemini_client import GeminiClient
+from app.governor import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from app.resilience import DeadlineExceeded, time_left
 from app.prompt_builder import PromptBuilder
-from app.data_handler import DataHandler
+from app.data_handler import DataHandler, FinancialData, FinancialDataResponse, FinancialPayload
+from app.response_cache import create_response_cache_from_env
+from app.gemini_cache import create_cached_content_manager_from_env
+from app.semantic_cache import create_semantic_cache_from_env
+from app.sessions import create_session_store_from_env
+from app.model_router import create_model_router_from_env
+from app.local_answers import create_local_answer_engine_from_env
+from app.warmup import create_warmup_manager_from_env
 
 load_dotenv()
 
 # Configurar logging
 logger.add("logs/chatbot.log", rotation="10 MB", level="INFO")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Abre y cierra los recursos compartidos con el ciclo de vida de la app."""
+    await data_handler.open()
+    await gemini_client.open()
+    try:
+        yield
+    finally:
+        if warmups is not None:
+            await warmups.close()
+        await gemini_client.close()
+        await data_handler.close()
+
+
 app = FastAPI(
     title="Chatbot Financiero API",
     description="API para análisis financiero con Gemini",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS para permitir peticiones desde el frontend
@@ -35,13 +65,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def _warm_up(bearer_token: str) -> Optional[FinancialData]:
+    """
+    Obtiene los datos de un token y deja preparado su contexto financiero.
+    
+    Args:
+        bearer_token: Token de autenticación Bearer
+        
+    Returns:
+        Datos financieros validados o None si hay error
+    """
+    # Cancelar el warm-up cancela también la petición a la API si ninguna pregunta la espera
+    financial_data = await data_handler.fetch_financial_data_from_api(bearer_token, cancel_if_abandoned=True)
+    if financial_data is not None:
+        # Renderiza las secciones (y la analítica) para que la primera pregunta las reutilice
+        prompt_builder.build_context(financial_data)
+    return financial_data
+
+
 # Inicializar componentes
 try:
-    gemini_client = GeminiClient()
+    gemini_client = GeminiClient(
+        response_cache=create_response_cache_from_env(),
+        context_cache=create_cached_content_manager_from_env()
+    )
     # DataHandler con URL de la API financiera (desde env o default)
     api_base_url = os.getenv("FINANCIAL_API_BASE_URL", "http://localhost:3000")
     data_handler = DataHandler(api_base_url=api_base_url)
-    prompt_builder = PromptBuilder()
+    # Presupuesto de tokens del contexto financiero (0 = límites fijos por sección),
+    # selección de secciones según la intención de la pregunta y caché de secciones
+    prompt_builder = PromptBuilder(
+        token_budget=int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", "0")) or None,
+        section_selection=os.getenv("PROMPT_SECTION_SELECTION", "false").lower() in ("1", "true", "yes"),
+        cache_entries=int(os.getenv("PROMPT_CONTEXT_CACHE_ENTRIES", "1000")),
+        cache_ttl=float(os.getenv("PROMPT_CONTEXT_CACHE_TTL", "3600"))
+    )
+    # Caché semántica opcional (requiere sentence-transformers)
+    semantic_cache = create_semantic_cache_from_env()
+    # Historial de las conversaciones con session_id
+    session_store = create_session_store_from_env()
+    # Enrutador opcional entre un modelo rápido y uno más capaz según la pregunta
+    model_router = create_model_router_from_env()
+    # Respuestas sin Gemini para preguntas puramente factuales (saldo, gastos, metas...)
+    local_answers = create_local_answer_engine_from_env()
+    # Precarga de datos al abrir el chat (/api/chat/warmup)
+    warmups = create_warmup_manager_from_env(_warm_up)
+    # Preguntas por petición de /api/chat/batch y cuántas se envían a Gemini a la vez
+    batch_max_questions = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "20"))
+    batch_concurrency = int(os.getenv("CHAT_BATCH_CONCURRENCY", "5"))
+    # Plazo total de una petición de chat, propagado hasta las llamadas a Gemini
+    request_timeout = float(os.getenv("CHAT_REQUEST_TIMEOUT", "30"))
     logger.info("Componentes inicializados correctamente")
 except Exception as e:
     logger.error(f"Error al inicializar componentes: {str(e)}")
@@ -52,12 +125,65 @@ class ChatRequest(BaseModel):
     """Modelo para la petición del chatbot."""
     question: str
     financial_data: Dict[str, Any]  # Puede tener formato {success: true, data: {...}} o directamente los datos
+    session_id: Optional[str] = None  # "" para iniciar una conversación; omitido = sin historial
+
+
+class ChatPayload(BaseModel):
+    """
+    Body de /api/chat validado directamente desde los bytes de la petición.
+    
+    `ChatRequest` documenta el contrato en OpenAPI; este modelo evita que FastAPI
+    construya primero el árbol de diccionarios y luego se valide otra vez.
+    """
+    question: str
+    financial_data: FinancialPayload
+    session_id: Optional[str] = None
+
+
+# Esquema del body para la documentación de los endpoints que leen bytes crudos
+CHAT_REQUEST_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": ChatRequest.model_json_schema()}}
+    }
+}
+
+
+class ChatBatchRequest(BaseModel):
+    """Modelo para la petición de varias preguntas sobre los mismos datos financieros."""
+    questions: List[str]
+    financial_data: Dict[str, Any]  # Mismo formato que en ChatRequest
+
+
+class ChatBatchPayload(BaseModel):
+    """Body de /api/chat/batch validado directamente desde los bytes de la petición."""
+    questions: List[str] = Field(min_length=1)
+    financial_data: FinancialPayload
+
+
+CHAT_BATCH_REQUEST_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": ChatBatchRequest.model_json_schema()}}
+    }
+}
 
 
 class ChatAutoRequest(BaseModel):
     """Modelo para la petición del chatbot con obtención automática de datos."""
     question: str
     bearer_token: str  # Token de autenticación para obtener datos de la API
+    session_id: Optional[str] = None  # "" para iniciar una conversación; omitido = sin historial
+
+
+class WarmupRequest(BaseModel):
+    """Modelo para precargar los datos financieros de un token."""
+    bearer_token: str
+
+
+class WarmupResponse(BaseModel):
+    """Estado del warm-up: started, pending, ready, cancelled, not_found o disabled."""
+    status: str
 
 
 @app.get("/")
@@ -80,76 +206,443 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas de rendimiento de los componentes."""
+    return {
+        "dashboard_cache": data_handler.cache_stats(),
+        "context_cache": prompt_builder.cache_stats(),
+        "response_cache": gemini_client.response_cache.stats() if gemini_client.response_cache else None,
+        "gemini_context_cache": gemini_client.context_cache.stats() if gemini_client.context_cache else None,
+        "gemini_governor": gemini_client.governor.stats(),
+        "gemini_retries": gemini_client.retry_policy.stats(),
+        "gemini_hedging": gemini_client.hedger.stats() if gemini_client.hedger else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "sessions": session_store.stats(),
+        "model_router": model_router.stats() if model_router else None,
+        "local_answers": local_answers.stats() if local_answers else None,
+        "warmups": warmups.stats() if warmups else None
+    }
+
+
 class ChatResponse(BaseModel):
     """Modelo para la respuesta del chatbot."""
     response: str
     success: bool
+    session_id: Optional[str] = None
+
+
+class ChatBatchItem(BaseModel):
+    """Resultado de una pregunta dentro de /api/chat/batch."""
+    question: str
+    response: Optional[str] = None
+    success: bool
+    error: Optional[str] = None
+
+
+class ChatBatchResponse(BaseModel):
+    """Modelo para la respuesta de /api/chat/batch."""
+    results: List[ChatBatchItem]
+    success: bool  # True si todas las preguntas se respondieron
 
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+def _parse_chat_payload(body: bytes, model: type = ChatPayload) -> Any:
     """
-    Endpoint principal del chatbot.
+    Valida el body de /api/chat en una sola pasada con el parser JSON de pydantic-core.
     
-    Flujo:
-    1. Recibe JSON financiero + pregunta del usuario
-    2. Valida y procesa los datos financieros
-    3. Construye prompt con contexto + pregunta
-    4. Envía a Gemini API
-    5. Retorna respuesta concisa
-    """
-    try:
-        # Obtener nombre del usuario para logging
-        financial_data_raw = request.financial_data
-        if isinstance(financial_data_raw, dict):
-            # Si tiene formato {success: true, data: {...}}
-            if "data" in financial_data_raw and "usuario" in financial_data_raw["data"]:
-                user_name = financial_data_raw["data"]["usuario"].get("nombre", "Usuario")
-            # Si tiene formato directo con "usuario"
-            elif "usuario" in financial_data_raw:
-                user_name = financial_data_raw["usuario"].get("nombre", "Usuario")
-            else:
-                user_name = "Usuario"
-        else:
-            user_name = "Usuario"
-        
-        logger.info(f"Consulta recibida de {user_name}: {request.question}")
+    Args:
+        body: Bytes crudos de la petición
+        model: Modelo del body (ChatPayload o ChatBatchPayload)
         
-        # 1. Validar y procesar datos financieros recibidos
-        # El data_handler maneja ambos formatos: {success: true, data: {...}} o directamente los datos
-        financial_data = data_handler.validate_and_process(financial_data_raw)
+    Returns:
+        Instancia de `model` con los datos financieros ya tipados
         
-        if not financial_data:
+    Raises:
+        HTTPException: 422 si falta la pregunta o los datos financieros o el JSON
+            está mal formado, 400 si el contenido de los datos financieros no es válido
+    """
+    try:
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_input=False)
+        # Solo los errores dentro de financial_data son 400; si falta el campo sigue siendo 422
+        if errors and all(
+            error["loc"][:1] == ("financial_data",)
+            and not (error["type"] == "missing" and error["loc"] == ("financial_data",))
+            for error in errors
+        ):
+            logger.error(f"Error de validación de datos: {str(e)}")
             raise HTTPException(
                 status_code=400,
                 detail="Los datos financieros recibidos no son válidos. Verifica el formato JSON."
             )
+        raise HTTPException(status_code=422, detail=errors)
+
+
+def _payload_financial_data(payload: ChatPayload) -> FinancialData:
+    """
+    Extrae los datos financieros de un body ya validado.
+    
+    Args:
+        payload: Petición con la pregunta y los datos financieros
         
-        logger.info(f"Datos financieros validados correctamente")
+    Returns:
+        Datos financieros del usuario
+    """
+    # El payload acepta ambos formatos: {success: true, data: {...}} o directamente los datos
+    financial_data: FinancialData = payload.financial_data
+    if isinstance(financial_data, FinancialDataResponse):
+        financial_data = financial_data.data
+    
+    logger.info(f"Consulta recibida de {financial_data.usuario.nombre}: {payload.question}")
+    logger.info(f"Datos financieros validados correctamente")
+    return financial_data
+
+
+def _build_question_prompt(
+    financial_data: FinancialData,
+    question: str,
+    sections: Optional[List[str]] = None
+) -> Tuple[str, str]:
+    """
+    Construye el prompt con el contexto financiero y la pregunta.
+    
+    Args:
+        financial_data: Datos financieros validados
+        question: Pregunta del usuario
+        sections: Secciones disponibles si el dashboard se obtuvo parcialmente
+        
+    Returns:
+        Tupla (prompt completo para Gemini, contexto financiero renderizado)
+    """
+    financial_context = prompt_builder.build_question_context(financial_data, question, sections)
+    prompt = prompt_builder.build_prompt_from_context(financial_context, question)
+    logger.debug(f"Prompt construido: {prompt[:200]}...")
+    return prompt, financial_context
+
+
+async def _fetch_auto_financial_data(
+    request: ChatAutoRequest,
+    deadline: Optional[float] = None
+) -> Tuple[FinancialData, Optional[List[str]]]:
+    """
+    Obtiene los datos financieros con el token de la petición.
+    
+    Si el fetch parcial está activo solo se piden las secciones que necesita la pregunta.
+    
+    Args:
+        request: Petición con la pregunta y el bearer token
+        deadline: Plazo absoluto de la petición; la API financiera no puede consumirlo entero
+        
+    Returns:
+        Tupla (datos financieros del usuario, secciones disponibles o None si están completos)
+        
+    Raises:
+        HTTPException: 401 si no se pudieron obtener los datos financieros,
+            504 si la API financiera no respondió dentro del plazo
+    """
+    logger.info(f"Consulta recibida con auto-fetch: {request.question}")
+    
+    # 1. Obtener datos financieros: precargados por /api/chat/warmup o desde la API externa
+    try:
+        financial_data = await warmups.claim(request.bearer_token, time_left(deadline)) if warmups else None
+        sections = None
+        if financial_data is not None:
+            logger.info("Datos financieros servidos desde el warm-up")
+        else:
+            financial_data, sections = await asyncio.wait_for(
+                data_handler.fetch_for_question(request.bearer_token, request.question),
+                time_left(deadline)
+            )
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        raise HTTPException(
+            status_code=504,
+            detail="La API financiera no respondió a tiempo"
+        )
+    
+    if not financial_data:
+        raise HTTPException(
+            status_code=401,
+            detail="No se pudieron obtener los datos financieros. Verifica que el token sea válido y que la API esté disponible."
+        )
+    
+    # Obtener nombre del usuario para logging
+    user_name = financial_data.usuario.nombre
+    logger.info(f"Datos financieros obtenidos correctamente para {user_name}")
+    return financial_data, sections
+
+
+def _local_answer(question: str, financial_data: FinancialData, session_id: Optional[str] = None) -> Optional[str]:
+    """
+    Responde sin Gemini si la pregunta es puramente factual.
+    
+    Args:
+        question: Pregunta del usuario
+        financial_data: Datos financieros validados
+        session_id: Sesión en la que se guarda el turno (opcional)
+        
+    Returns:
+        Respuesta con plantilla o None si debe responderla Gemini
+    """
+    if local_answers is None:
+        return None
+    answer = local_answers.answer(question, financial_data)
+    if answer is not None:
+        logger.info("Pregunta respondida localmente, sin llamar a Gemini")
+        if session_id is not None:
+            session_store.append_turn(session_id, question, answer)
+    return answer
+
+
+def _open_session(session_id: Optional[str], financial_data: FinancialData) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    Recupera o inicia la sesión de conversación de una petición.
+    
+    Args:
+        session_id: Id enviado por el cliente (None = petición sin historial)
+        financial_data: Datos del usuario; la sesión queda ligada a su id
         
-        # 2. Construir prompt con contexto financiero + pregunta
-        prompt = prompt_builder.build_prompt(financial_data, request.question)
-        logger.debug(f"Prompt construido: {prompt[:200]}...")
+    Returns:
+        Tupla (id de la sesión o None, historial como contenidos multi-turno)
+    """
+    if session_id is None:
+        return None, []
+    session_id, created = session_store.open(session_id, str(financial_data.usuario.id))
+    return session_id, [] if created else session_store.history(session_id)
+
+
+async def _generate_answer(
+    prompt: str,
+    financial_context: str,
+    question: str,
+    session_id: Optional[str] = None,
+    history: Optional[List[Dict[str, Any]]] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    deadline: Optional[float] = None
+) -> Optional[str]:
+    """
+    Obtiene la respuesta para una pregunta, reutilizando respuestas de
+    preguntas equivalentes si la caché semántica está habilitada.
+    
+    Args:
+        prompt: Prompt completo para Gemini
+        financial_context: Contexto financiero renderizado
+        question: Pregunta del usuario
+        session_id: Sesión en la que se guarda el turno (opcional)
+        history: Turnos anteriores de la sesión; con historial no se usa la caché semántica
+        priority: Prioridad de la llamada en la cola del gobernador de Gemini
+        deadline: Plazo absoluto de la petición (time.monotonic)
         
-        # 3. Obtener respuesta de Gemini
-        gemini_response = gemini_client.generate_response(
+    Returns:
+        Respuesta generada o None si hay error
+    """
+    vector = None
+    if semantic_cache is not None and not history:
+        cached, vector = await semantic_cache.lookup(financial_context, question)
+        if cached:
+            if session_id is not None:
+                session_store.append_turn(session_id, question, cached)
+            return cached
+    
+    decision = model_router.route(question) if model_router is not None else None
+    # on_usage solo se llama cuando la respuesta viene de Gemini (no de la caché de respuestas)
+    generated: Dict[str, Any] = {}
+    start = time.monotonic()
+    gemini_response = await gemini_client.generate_response_async(
+        prompt=prompt,
+        max_tokens=decision.max_tokens if decision else 300,  # Respuestas cortas y concisas
+        temperature=0.7,
+        cacheable_prefix=prompt_builder.build_prompt_prefix(financial_context),
+        history=history,
+        priority=priority,
+        deadline=deadline,
+        model=decision.model if decision else None,
+        on_usage=lambda usage: generated.update(usage=usage)
+    )
+    if decision is not None:
+        if gemini_response and "usage" not in generated:
+            model_router.record_cache_hit(decision.route)
+        else:
+            model_router.record(
+                decision.route, time.monotonic() - start, generated.get("usage"), bool(gemini_response)
+            )
+    
+    if gemini_response and vector is not None:
+        await semantic_cache.store(financial_context, vector, gemini_response)
+    if gemini_response and session_id is not None:
+        session_store.append_turn(session_id, question, gemini_response)
+    return gemini_response
+
+
+def _request_deadline(http_request: Request) -> float:
+    """
+    Plazo absoluto (time.monotonic) de una petición de chat.
+    
+    Es CHAT_REQUEST_TIMEOUT o, si es menor, el que indica el cliente en el
+    header `X-Request-Timeout` (segundos), para no seguir trabajando en una
+    respuesta que el cliente ya no va a esperar.
+    """
+    timeout = request_timeout
+    header = http_request.headers.get("x-request-timeout")
+    if header:
+        try:
+            timeout = min(timeout, float(header))
+        except ValueError:
+            logger.warning(f"Header X-Request-Timeout inválido: {header}")
+    return time.monotonic() + timeout
+
+
+def _gemini_error(deadline: Optional[float] = None) -> HTTPException:
+    """
+    Error HTTP para cuando Gemini no devolvió respuesta.
+    
+    Args:
+        deadline: Plazo absoluto de la petición
+    
+    Returns:
+        504 si se agotó el plazo, 503 con Retry-After si Gemini está limitando la
+        cuota (429/503 recientes o cola del gobernador agotada); 500 en otro caso
+    """
+    if deadline is not None and time.monotonic() >= deadline:
+        return HTTPException(
+            status_code=504,
+            detail="Gemini no respondió dentro del plazo de la petición"
+        )
+    retry_after = gemini_client.governor.retry_after()
+    if retry_after is not None:
+        return HTTPException(
+            status_code=503,
+            detail="Gemini está saturado en este momento, intenta de nuevo en unos segundos",
+            headers={"Retry-After": str(retry_after)}
+        )
+    return HTTPException(
+        status_code=500,
+        detail="Error al generar respuesta con Gemini"
+    )
+
+
+def _format_sse(event: Dict[str, Any]) -> str:
+    """Serializa un evento del stream de Gemini en formato Server-Sent Events."""
+    payload = {key: value for key, value in event.items() if key != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _stream_chat_response(
+    prompt: str,
+    financial_context: str,
+    question: str,
+    session_id: Optional[str] = None,
+    history: Optional[List[Dict[str, Any]]] = None,
+    deadline: Optional[float] = None
+) -> StreamingResponse:
+    """
+    Crea la respuesta SSE que reenvía los fragmentos de Gemini según llegan.
+    
+    Eventos emitidos:
+    - `chunk`: {"text": "..."} por cada fragmento generado
+    - `done`: {"usage": {...}} al terminar, con los tokens consumidos (y `session_id` si hay sesión)
+    - `error`: {"message": "..."} si la generación falla
+    """
+    done_extra = {"session_id": session_id} if session_id is not None else {}
+    
+    async def events():
+        vector = None
+        if semantic_cache is not None and not history:
+            cached, vector = await semantic_cache.lookup(financial_context, question)
+            if cached:
+                if session_id is not None:
+                    session_store.append_turn(session_id, question, cached)
+                yield _format_sse({"type": "chunk", "text": cached})
+                yield _format_sse({"type": "done", "usage": {}, **done_extra})
+                return
+        
+        decision = model_router.route(question) if model_router is not None else None
+        start = time.monotonic()
+        parts = []
+        async for event in gemini_client.stream_response(
             prompt=prompt,
-            max_tokens=300,  # Respuestas cortas y concisas
-            temperature=0.7
+            max_tokens=decision.max_tokens if decision else 300,  # Respuestas cortas y concisas
+            temperature=0.7,
+            cacheable_prefix=prompt_builder.build_prompt_prefix(financial_context),
+            history=history,
+            deadline=deadline,
+            model=decision.model if decision else None
+        ):
+            if decision is not None and event.get("cached"):
+                model_router.record_cache_hit(decision.route)
+            elif decision is not None and event["type"] in ("done", "error"):
+                model_router.record(
+                    decision.route, time.monotonic() - start, event.get("usage"), event["type"] == "done"
+                )
+            if event["type"] == "chunk":
+                parts.append(event["text"])
+            elif event["type"] == "done":
+                answer = "".join(parts).strip()
+                if answer and vector is not None:
+                    await semantic_cache.store(financial_context, vector, answer)
+                if answer and session_id is not None:
+                    session_store.append_turn(session_id, question, answer)
+                event = {**event, **done_extra}
+            yield _format_sse(event)
+    
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if session_id is not None:
+        headers["X-Session-Id"] = session_id
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+def _stream_local_response(answer: str, session_id: Optional[str] = None) -> StreamingResponse:
+    """Respuesta SSE de una respuesta local: un único `chunk` seguido de `done`."""
+    done_extra = {"session_id": session_id} if session_id is not None else {}
+    
+    async def events():
+        yield _format_sse({"type": "chunk", "text": answer})
+        yield _format_sse({"type": "done", "usage": {}, **done_extra})
+    
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if session_id is not None:
+        headers["X-Session-Id"] = session_id
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+@app.post("/api/chat", response_model=ChatResponse, openapi_extra=CHAT_REQUEST_OPENAPI)
+async def chat(request: Request):
+    """
+    Endpoint principal del chatbot.
+    
+    Flujo:
+    1. Recibe JSON financiero + pregunta del usuario (body con el formato de ChatRequest)
+    2. Valida los datos financieros directamente desde los bytes del body
+    3. Responde sin Gemini si la pregunta es puramente factual (saldo, gastos, metas...)
+    4. Si no, construye prompt con contexto + pregunta y lo envía a Gemini API
+    5. Retorna respuesta concisa
+    """
+    deadline = _request_deadline(request)
+    try:
+        payload = _parse_chat_payload(await request.body())
+        financial_data = _payload_financial_data(payload)
+        session_id, history = _open_session(payload.session_id, financial_data)
+        
+        # 3. Responder localmente las preguntas factuales; el resto va a Gemini
+        local_response = _local_answer(payload.question, financial_data, session_id)
+        if local_response is not None:
+            return ChatResponse(response=local_response, success=True, session_id=session_id)
+        
+        prompt, financial_context = _build_question_prompt(financial_data, payload.question)
+        gemini_response = await _generate_answer(
+            prompt, financial_context, payload.question, session_id, history, deadline=deadline
         )
         
         if not gemini_response:
-            raise HTTPException(
-                status_code=500,
-                detail="Error al generar respuesta con Gemini"
-            )
+            raise _gemini_error(deadline)
         
         logger.info(f"Respuesta generada exitosamente")
         
         # 4. Retornar respuesta
         return ChatResponse(
             response=gemini_response,
-            success=True
+            success=True,
+            session_id=session_id
         )
         
     except HTTPException:
@@ -163,7 +656,7 @@ async def chat(request: ChatRequest):
 
 
 @app.post("/api/chat/auto", response_model=ChatResponse)
-async def chat_auto(request: ChatAutoRequest):
+async def chat_auto(request: ChatAutoRequest, http_request: Request):
     """
     Endpoint del chatbot con obtención automática de datos financieros.
     
@@ -171,49 +664,36 @@ async def chat_auto(request: ChatAutoRequest):
     1. Recibe pregunta del usuario + bearer token
     2. Obtiene datos financieros desde la API externa usando el token
     3. Valida y procesa los datos financieros
-    4. Construye prompt con contexto + pregunta
-    5. Envía a Gemini API
+    4. Responde sin Gemini si la pregunta es puramente factual
+    5. Si no, construye prompt con contexto + pregunta y lo envía a Gemini API
     6. Retorna respuesta concisa
     """
+    deadline = _request_deadline(http_request)
     try:
-        logger.info(f"Consulta recibida con auto-fetch: {request.question}")
+        financial_data, sections = await _fetch_auto_financial_data(request, deadline)
+        user_name = financial_data.usuario.nombre
+        session_id, history = _open_session(request.session_id, financial_data)
         
-        # 1. Obtener datos financieros desde la API externa
-        financial_data = await data_handler.fetch_financial_data_from_api(request.bearer_token)
+        # 3. Responder localmente las preguntas factuales; el resto va a Gemini
+        local_response = _local_answer(request.question, financial_data, session_id)
+        if local_response is not None:
+            return ChatResponse(response=local_response, success=True, session_id=session_id)
         
-        if not financial_data:
-            raise HTTPException(
-                status_code=401,
-                detail="No se pudieron obtener los datos financieros. Verifica que el token sea válido y que la API esté disponible."
-            )
-        
-        # Obtener nombre del usuario para logging
-        user_name = financial_data.get("usuario", {}).get("nombre", "Usuario")
-        logger.info(f"Datos financieros obtenidos correctamente para {user_name}")
-        
-        # 2. Construir prompt con contexto financiero + pregunta
-        prompt = prompt_builder.build_prompt(financial_data, request.question)
-        logger.debug(f"Prompt construido: {prompt[:200]}...")
-        
-        # 3. Obtener respuesta de Gemini
-        gemini_response = gemini_client.generate_response(
-            prompt=prompt,
-            max_tokens=300,  # Respuestas cortas y concisas
-            temperature=0.7
+        prompt, financial_context = _build_question_prompt(financial_data, request.question, sections)
+        gemini_response = await _generate_answer(
+            prompt, financial_context, request.question, session_id, history, deadline=deadline
         )
         
         if not gemini_response:
-            raise HTTPException(
-                status_code=500,
-                detail="Error al generar respuesta con Gemini"
-            )
+            raise _gemini_error(deadline)
         
         logger.info(f"Respuesta generada exitosamente para {user_name}")
         
         # 4. Retornar respuesta
         return ChatResponse(
             response=gemini_response,
-            success=True
+            success=True,
+            session_id=session_id
         )
         
     except HTTPException:
@@ -226,6 +706,177 @@ async def chat_auto(request: ChatAutoRequest):
         )
 
 
+@app.post("/api/chat/stream", openapi_extra=CHAT_REQUEST_OPENAPI)
+async def chat_stream(request: Request):
+    """
+    Variante de /api/chat que transmite la respuesta token a token (SSE).
+    
+    Los errores de validación se devuelven como HTTP antes de abrir el stream;
+    los errores de Gemini llegan como evento `error` dentro del stream.
+    """
+    deadline = _request_deadline(request)
+    try:
+        payload = _parse_chat_payload(await request.body())
+        financial_data = _payload_financial_data(payload)
+        session_id, history = _open_session(payload.session_id, financial_data)
+        local_response = _local_answer(payload.question, financial_data, session_id)
+        if local_response is not None:
+            return _stream_local_response(local_response, session_id)
+        prompt, financial_context = _build_question_prompt(financial_data, payload.question)
+        return _stream_chat_response(
+            prompt, financial_context, payload.question, session_id, history, deadline
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en endpoint /api/chat/stream: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+
+async def _answer_batch(
+    financial_data: FinancialData,
+    financial_context: str,
+    questions: List[str],
+    deadline: Optional[float] = None
+) -> List[ChatBatchItem]:
+    """
+    Responde varias preguntas sobre un mismo contexto con concurrencia limitada.
+    
+    Las preguntas repetidas se envían a Gemini una sola vez y las puramente
+    factuales se responden localmente, sin ocupar turno.
+    
+    Args:
+        financial_data: Datos financieros validados, para las respuestas locales
+        financial_context: Contexto financiero renderizado una sola vez
+        questions: Preguntas en el orden recibido
+        deadline: Plazo absoluto compartido por todas las preguntas
+        
+    Returns:
+        Un resultado por pregunta, en el mismo orden
+    """
+    semaphore = asyncio.Semaphore(batch_concurrency)
+    
+    async def answer(question: str) -> ChatBatchItem:
+        local_response = _local_answer(question, financial_data)
+        if local_response is not None:
+            return ChatBatchItem(question=question, response=local_response, success=True)
+        async with semaphore:
+            try:
+                prompt = prompt_builder.build_prompt_from_context(financial_context, question)
+                response = await _generate_answer(
+                    prompt, financial_context, question, priority=PRIORITY_BATCH, deadline=deadline
+                )
+            except Exception as e:
+                logger.error(f"Error respondiendo la pregunta del lote '{question}': {str(e)}")
+                response = None
+        if not response:
+            return ChatBatchItem(question=question, success=False, error="Error al generar respuesta con Gemini")
+        return ChatBatchItem(question=question, response=response, success=True)
+    
+    unique = list(dict.fromkeys(questions))
+    answers = dict(zip(unique, await asyncio.gather(*(answer(question) for question in unique))))
+    return [answers[question] for question in questions]
+
+
+@app.post("/api/chat/batch", response_model=ChatBatchResponse, openapi_extra=CHAT_BATCH_REQUEST_OPENAPI)
+async def chat_batch(request: Request):
+    """
+    Responde varias preguntas sobre los mismos datos financieros en una sola llamada.
+    
+    Los datos se validan y el contexto se construye una sola vez; las preguntas
+    se envían a Gemini en paralelo (hasta CHAT_BATCH_CONCURRENCY a la vez). Un
+    fallo en una pregunta no afecta a las demás: cada resultado trae su error.
+    """
+    deadline = _request_deadline(request)
+    try:
+        payload = _parse_chat_payload(await request.body(), ChatBatchPayload)
+        if len(payload.questions) > batch_max_questions:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Se permiten como máximo {batch_max_questions} preguntas por petición"
+            )
+        
+        financial_data: FinancialData = payload.financial_data
+        if isinstance(financial_data, FinancialDataResponse):
+            financial_data = financial_data.data
+        logger.info(f"Lote de {len(payload.questions)} preguntas de {financial_data.usuario.nombre}")
+        
+        # Contexto completo: todas las preguntas comparten el mismo prefijo del prompt
+        financial_context = prompt_builder.build_context(financial_data)
+        results = await _answer_batch(financial_data, financial_context, payload.questions, deadline)
+        
+        answered = sum(result.success for result in results)
+        logger.info(f"Lote respondido: {answered}/{len(results)} preguntas")
+        return ChatBatchResponse(results=results, success=answered == len(results))
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en endpoint /api/chat/batch: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+
+@app.post("/api/chat/warmup", response_model=WarmupResponse, status_code=202)
+async def chat_warmup(request: WarmupRequest):
+    """
+    Precarga los datos financieros de un token en segundo plano.
+    
+    El frontend lo llama al abrir el widget del chat; la primera pregunta a
+    /api/chat/auto reutiliza los datos (o espera al warm-up si aún no terminó).
+    """
+    if warmups is None:
+        return WarmupResponse(status="disabled")
+    status = warmups.start(request.bearer_token)
+    if status == "rejected":
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiados warm-ups en curso; la primera pregunta obtendrá los datos normalmente"
+        )
+    return WarmupResponse(status=status)
+
+
+@app.post("/api/chat/warmup/cancel", response_model=WarmupResponse)
+async def chat_warmup_cancel(request: WarmupRequest):
+    """
+    Cancela el warm-up de un token (p. ej. al cerrar el widget) y descarta sus datos.
+    """
+    if warmups is None:
+        return WarmupResponse(status="disabled")
+    return WarmupResponse(status="cancelled" if warmups.cancel(request.bearer_token) else "not_found")
+
+
+@app.post("/api/chat/auto/stream")
+async def chat_auto_stream(request: ChatAutoRequest, http_request: Request):
+    """
+    Variante de /api/chat/auto que transmite la respuesta token a token (SSE).
+    """
+    deadline = _request_deadline(http_request)
+    try:
+        financial_data, sections = await _fetch_auto_financial_data(request, deadline)
+        session_id, history = _open_session(request.session_id, financial_data)
+        local_response = _local_answer(request.question, financial_data, session_id)
+        if local_response is not None:
+            return _stream_local_response(local_response, session_id)
+        prompt, financial_context = _build_question_prompt(financial_data, request.question, sections)
+        return _stream_chat_response(
+            prompt, financial_context, request.question, session_id, history, deadline
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en endpoint /api/chat/auto/stream: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error interno del servidor: {str(e)}"
+        )
+
+
 
 
 if __name__ == "__main__":
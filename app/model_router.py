@@ -0,0 +1,305 @@
+"""
+Enrutador de preguntas entre modelos de Gemini.
+Las consultas simples ("¿cuál es mi saldo?") van a un modelo rápido y barato y
+las preguntas de planificación a uno más capaz. Decide primero con reglas
+configurables y, si ninguna aplica, con un clasificador Naive Bayes local
+entrenado con ejemplos etiquetados al arrancar.
+"""
+
+import os
+import re
+import json
+import math
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from loguru import logger
+
+from app.intent import detect_intents, is_general_question, normalize_question
+
+
+ROUTE_FAST = "fast"
+ROUTE_STRONG = "strong"
+
+# Reglas por defecto (sobre texto en minúsculas y sin acentos); las de "strong" se evalúan primero
+DEFAULT_RULES: Dict[str, Tuple[str, ...]] = {
+    ROUTE_STRONG: (
+        r"\bplan(ea|ifica)?\b", r"\bestrategia", r"\bcomo (puedo|podria|hago|deberia)", r"\bdeberia",
+        r"\brecomiend", r"\bconsejo", r"\bproyecc", r"\bproyecta", r"\ben cuant(o|os) (tiempo|meses|anos)",
+        r"\bsi (ahorro|gasto|reduzco|dejo|aumento|invierto|pago)", r"\bme alcanza", r"\bconviene",
+        r"\bpor que\b", r"\banaliza", r"\bes posible", r"\b(juntar|reunir)\b",
+    ),
+    ROUTE_FAST: (
+        r"^\s*(cual|cuanto|cuantos|cuantas|que) (es|son|fue|fueron|tengo|he|hay|llevo)\b[^,]{0,40}$",
+    ),
+}
+
+# Ejemplos con los que se entrena el clasificador local
+TRAINING_EXAMPLES: Tuple[Tuple[str, str], ...] = (
+    ("¿Cuál es mi saldo?", ROUTE_FAST),
+    ("¿Cuánto dinero tengo?", ROUTE_FAST),
+    ("¿Cuánto gasté este mes?", ROUTE_FAST),
+    ("¿Cuánto he ahorrado?", ROUTE_FAST),
+    ("¿Cuáles son mis ingresos?", ROUTE_FAST),
+    ("¿Qué alertas tengo?", ROUTE_FAST),
+    ("¿Cuántos miembros hay en mi familia?", ROUTE_FAST),
+    ("¿Cuál fue mi gasto más grande?", ROUTE_FAST),
+    ("¿Cuál es mi balance neto?", ROUTE_FAST),
+    ("Total de gastos en alimentación", ROUTE_FAST),
+    ("¿Cuánto recibí de bonos?", ROUTE_FAST),
+    ("¿Cuál es mi porcentaje de ahorro?", ROUTE_FAST),
+    ("¿En qué categoría gasto más?", ROUTE_FAST),
+    ("¿Quién gastó más en la familia?", ROUTE_FAST),
+    ("Mi saldo actual", ROUTE_FAST),
+    ("¿Cuánto me falta para mi meta?", ROUTE_FAST),
+    ("¿Cómo puedo ahorrar más dinero?", ROUTE_STRONG),
+    ("Hazme un plan para salir de deudas", ROUTE_STRONG),
+    ("¿Qué estrategia me recomiendas para mi fondo de emergencia?", ROUTE_STRONG),
+    ("¿En cuántos meses alcanzo mi meta si ahorro 500 al mes?", ROUTE_STRONG),
+    ("¿Me conviene recortar gastos de ocio o de transporte?", ROUTE_STRONG),
+    ("¿Debería pagar primero la tarjeta o ahorrar?", ROUTE_STRONG),
+    ("Analiza mis finanzas y dime qué mejorar", ROUTE_STRONG),
+    ("¿Por qué mis gastos subieron tanto este mes?", ROUTE_STRONG),
+    ("¿Me alcanza para comprar un auto el próximo año?", ROUTE_STRONG),
+    ("Compara mis gastos con mis ingresos y sugiere ajustes", ROUTE_STRONG),
+    ("¿Cómo está mi salud financiera?", ROUTE_STRONG),
+    ("Dame consejos para organizar el presupuesto familiar", ROUTE_STRONG),
+    ("Proyecta mi ahorro a fin de año", ROUTE_STRONG),
+    ("¿Qué pasa si reduzco mis gastos un 20%?", ROUTE_STRONG),
+    ("Ayúdame a repartir mis ingresos entre ahorro, gastos fijos y ocio", ROUTE_STRONG),
+    ("¿Cómo puedo alcanzar mis objetivos de ahorro más rápido?", ROUTE_STRONG),
+)
+
+
+class RouteDecision(NamedTuple):
+    """Modelo elegido para una pregunta."""
+    route: str
+    model: str
+    max_tokens: int
+    reason: str  # "regla" o "clasificador"
+
+
+def _features(question: str) -> List[str]:
+    """Palabras normalizadas más rasgos de longitud y amplitud de la pregunta."""
+    words = normalize_question(question).split()
+    features = list(words)
+    if len(words) <= 5:
+        features.append("__corta__")
+    elif len(words) >= 12:
+        features.append("__larga__")
+    if len(detect_intents(question)) >= 2:
+        features.append("__varias_intenciones__")
+    if is_general_question(question):
+        features.append("__general__")
+    return features
+
+
+class _NaiveBayes:
+    """Naive Bayes multinomial de dos clases con suavizado de Laplace."""
+
+    def __init__(self, examples: Iterable[Tuple[str, str]]):
+        self._counts: Dict[str, Counter] = {ROUTE_FAST: Counter(), ROUTE_STRONG: Counter()}
+        documents = Counter()
+        for question, route in examples:
+            self._counts[route].update(_features(question))
+            documents[route] += 1
+        total = sum(documents.values())
+        self._log_prior = {route: math.log((documents[route] + 1) / (total + 2)) for route in self._counts}
+        self._totals = {route: sum(counts.values()) for route, counts in self._counts.items()}
+        self._vocabulary = len(set(self._counts[ROUTE_FAST]) | set(self._counts[ROUTE_STRONG]))
+
+    def strong_probability(self, question: str) -> float:
+        """Probabilidad de que la pregunta necesite el modelo capaz."""
+        scores = {}
+        features = _features(question)
+        for route, counts in self._counts.items():
+            denominator = self._totals[route] + self._vocabulary
+            scores[route] = self._log_prior[route] + sum(
+                math.log((counts[feature] + 1) / denominator) for feature in features
+            )
+        difference = scores[ROUTE_FAST] - scores[ROUTE_STRONG]
+        return 1 / (1 + math.exp(min(difference, 700)))
+
+
+class _RouteStats:
+    """Llamadas, latencia y tokens de una ruta."""
+
+    __slots__ = ("decisions", "by_rule", "calls", "cache_hits", "failures", "latency", "latencies",
+                 "prompt_tokens", "output_tokens")
+
+    def __init__(self):
+        self.decisions = 0
+        self.by_rule = 0
+        self.calls = 0
+        self.cache_hits = 0
+        self.failures = 0
+        self.latency = 0.0
+        self.latencies: Deque[float] = deque(maxlen=1000)
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+        return {
+            "decisions": self.decisions,
+            "by_rule": self.by_rule,
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "failures": self.failures,
+            "avg_latency_ms": round(self.latency / self.calls * 1000, 1) if self.calls else 0.0,
+            "p95_latency_ms": round(p95 * 1000, 1),
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+class ModelRouter:
+    """Elige el modelo de Gemini para cada pregunta y mide cada ruta."""
+
+    def __init__(
+        self,
+        fast_model: str,
+        strong_model: str,
+        fast_max_tokens: int = 300,
+        strong_max_tokens: int = 1024,
+        rules: Optional[Dict[str, Sequence[str]]] = None,
+        threshold: float = 0.5,
+        training_examples: Iterable[Tuple[str, str]] = TRAINING_EXAMPLES
+    ):
+        """
+        Inicializa el enrutador.
+
+        Args:
+            fast_model: Modelo para consultas simples
+            strong_model: Modelo para preguntas de planificación o análisis
+            fast_max_tokens: Máximo de tokens de respuesta en la ruta rápida
+            strong_max_tokens: Máximo de tokens en la ruta capaz (los modelos con
+                razonamiento gastan parte del presupuesto antes de responder)
+            rules: Patrones regex por ruta ("fast", "strong") que sustituyen a los
+                de DEFAULT_RULES; los de "strong" se evalúan primero
+            threshold: Probabilidad a partir de la cual el clasificador elige "strong"
+            training_examples: Pares (pregunta, ruta) para entrenar el clasificador
+        """
+        self.models = {ROUTE_FAST: fast_model, ROUTE_STRONG: strong_model}
+        self.max_tokens = {ROUTE_FAST: fast_max_tokens, ROUTE_STRONG: strong_max_tokens}
+        self.threshold = threshold
+        merged = {**DEFAULT_RULES, **(rules or {})}
+        self._rules = [
+            (route, [re.compile(pattern) for pattern in merged.get(route, ())])
+            for route in (ROUTE_STRONG, ROUTE_FAST)
+        ]
+        self._classifier = _NaiveBayes(training_examples)
+        self._stats = {route: _RouteStats() for route in self.models}
+
+    def classify(self, question: str) -> Tuple[str, str]:
+        """
+        Decide la ruta de una pregunta sin registrarla.
+
+        Args:
+            question: Pregunta del usuario
+
+        Returns:
+            Tupla (ruta, motivo: "regla" o "clasificador")
+        """
+        text = normalize_question(question)
+        for route, patterns in self._rules:
+            if any(pattern.search(text) for pattern in patterns):
+                return route, "regla"
+        probability = self._classifier.strong_probability(question)
+        return (ROUTE_STRONG if probability >= self.threshold else ROUTE_FAST), "clasificador"
+
+    def route(self, question: str) -> RouteDecision:
+        """
+        Elige modelo y máximo de tokens para una pregunta.
+
+        Args:
+            question: Pregunta del usuario
+
+        Returns:
+            RouteDecision con la ruta, el modelo, el máximo de tokens y el motivo
+        """
+        route, reason = self.classify(question)
+        stats = self._stats[route]
+        stats.decisions += 1
+        if reason == "regla":
+            stats.by_rule += 1
+        return RouteDecision(route, self.models[route], self.max_tokens[route], reason)
+
+    def record(self, route: str, latency: float, usage: Optional[Dict[str, int]] = None, success: bool = True) -> None:
+        """
+        Registra el resultado de una llamada hecha por una ruta.
+
+        Args:
+            route: Ruta de la decisión
+            latency: Segundos de la llamada a Gemini
+            usage: Uso de tokens de la respuesta (`prompt_token_count`, `candidates_token_count`)
+            success: False si no se obtuvo respuesta
+        """
+        stats = self._stats[route]
+        stats.calls += 1
+        if not success:
+            stats.failures += 1
+            return
+        stats.latency += latency
+        stats.latencies.append(latency)
+        if usage:
+            stats.prompt_tokens += usage.get("prompt_token_count", 0)
+            stats.output_tokens += usage.get("candidates_token_count", 0)
+
+    def record_cache_hit(self, route: str) -> None:
+        """
+        Registra una respuesta de la ruta servida desde la caché de respuestas.
+
+        Se cuenta aparte para que su latencia casi nula y su uso de tokens vacío
+        no se mezclen con las llamadas reales a Gemini.
+
+        Args:
+            route: Ruta de la decisión
+        """
+        self._stats[route].cache_hits += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas por ruta, con el modelo de cada una."""
+        return {
+            route: {"model": self.models[route], **stats.to_dict()}
+            for route, stats in self._stats.items()
+        }
+
+
+def _load_rules(path: str) -> Optional[Dict[str, List[str]]]:
+    """Lee reglas {"fast": [...], "strong": [...]} de un archivo JSON (None si falla)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+        return {route: list(patterns) for route, patterns in rules.items() if route in (ROUTE_FAST, ROUTE_STRONG)}
+    except (OSError, ValueError) as e:
+        logger.warning(f"No se pudieron cargar las reglas del enrutador de {path}: {str(e)}")
+        return None
+
+
+def create_model_router_from_env() -> Optional[ModelRouter]:
+    """
+    Construye el enrutador de modelos según las variables de entorno.
+
+    - MODEL_ROUTER_ENABLED: activa el enrutamiento (default: false)
+    - GEMINI_FAST_MODEL: modelo de la ruta rápida (default: gemini-2.0-flash-lite)
+    - GEMINI_STRONG_MODEL: modelo de la ruta capaz (default: gemini-2.5-pro)
+    - GEMINI_STRONG_MAX_TOKENS: máximo de tokens en la ruta capaz (default: 1024)
+    - MODEL_ROUTER_RULES: archivo JSON con reglas propias por ruta (opcional)
+    - MODEL_ROUTER_THRESHOLD: probabilidad mínima del clasificador para "strong" (default: 0.5)
+
+    Returns:
+        ModelRouter configurado o None si está deshabilitado
+    """
+    if os.getenv("MODEL_ROUTER_ENABLED", "false").lower() != "true":
+        return None
+    rules_path = os.getenv("MODEL_ROUTER_RULES")
+    router = ModelRouter(
+        fast_model=os.getenv("GEMINI_FAST_MODEL", "gemini-2.0-flash-lite"),
+        strong_model=os.getenv("GEMINI_STRONG_MODEL", "gemini-2.5-pro"),
+        strong_max_tokens=int(os.getenv("GEMINI_STRONG_MAX_TOKENS", "1024")),
+        rules=_load_rules(rules_path) if rules_path else None,
+        threshold=float(os.getenv("MODEL_ROUTER_THRESHOLD", "0.5"))
+    )
+    logger.info(f"Enrutador de modelos habilitado ({router.models[ROUTE_FAST]} / {router.models[ROUTE_STRONG]})")
+    return router
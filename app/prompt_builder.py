@@ -1,7 +1,128 @@
 
 
-from typing import Dict, Any
+import heapq
+import hashlib
+import weakref
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple, Union
 from loguru import logger
+from pydantic import BaseModel
+
+from app.cache import TTLCache
+from app.data_handler import FinancialData, Organizacion
+from app.analytics import get_analytics, get_organization_analytics
+from app.intent import select_sections
+
+
+def _field(obj: Any, name: str, default: Any = None) -> Any:
+    """Lee un campo tanto de un diccionario como de un modelo de pydantic."""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+# Selector de elementos de una lista: (clave, elementos, límite fijo, formateador) -> elementos a mostrar
+Picker = Callable[[str, Sequence[Any], Optional[int], Callable[[Any], str]], Sequence[Any]]
+
+
+def _fixed_picker(key: str, items: Sequence[Any], limit: Optional[int], fmt: Callable[[Any], str]) -> Sequence[Any]:
+    """Selector por defecto: los primeros `limit` elementos (todos si no hay límite)."""
+    return items if limit is None else items[:limit]
+
+
+# Peso de cada lista al repartir el presupuesto de tokens: los agregados
+# (categorías, objetivos, alertas) aportan más que una transacción suelta
+_ITEM_WEIGHTS = {
+    "ingresos": 1.0,
+    "gastos.categorias": 3.0,
+    "gastos": 1.0,
+    "extras": 0.8,
+    "objetivos": 2.5,
+    "alertas": 3.0,
+    "miembros": 1.0,
+}
+
+# Campo numérico que mide la relevancia de cada elemento
+_ITEM_AMOUNT_FIELDS = {
+    "ingresos": "monto",
+    "gastos.categorias": "total",
+    "gastos": "monto",
+    "extras": "monto",
+    "objetivos": "montoMeta",
+    "miembros": "saldoActual",
+}
+
+# Campos de texto que se buscan en las alertas para dar prioridad al elemento
+_ITEM_LABEL_FIELDS = {
+    "ingresos": ("categoria", "descripcion"),
+    "gastos.categorias": ("categoria",),
+    "gastos": ("categoria", "descripcion"),
+    "extras": ("descripcion",),
+    "objetivos": ("objetivo",),
+    "miembros": ("nombre",),
+}
+
+# Listas cuyos elementos tienen fecha (el resto son agregados actuales)
+_DATED_ITEMS = {"ingresos", "gastos", "extras"}
+
+_SEVERITY_SCORES = {"alta": 1.0, "high": 1.0, "media": 0.6, "medium": 0.6, "baja": 0.3, "low": 0.3}
+
+# Datos de los que depende cada sección del contexto (ruta dentro del dashboard)
+_SECTION_SOURCES = {
+    "usuario": ("usuario",),
+    "resumen": ("resumen",),
+    "ingresos": ("detalle", "ingresos"),
+    "gastos": ("detalle", "gastos"),
+    "extras": ("detalle", "extras"),
+    "ahorros": ("detalle", "ahorros"),
+    "analisis": ("detalle",),
+    "alertas": ("alertas",),
+    "organizacion": ("organizacion",),
+}
+
+# Sección que contiene cada lista candidata del contexto con presupuesto
+_ITEM_SECTIONS = {
+    "ingresos": "ingresos",
+    "gastos.categorias": "gastos",
+    "gastos": "gastos",
+    "extras": "extras",
+    "objetivos": "ahorros",
+    "alertas": "alertas",
+    "miembros": "organizacion",
+}
+
+
+# Elementos del principio de cada lista que entran en la huella (además del último y la longitud)
+_SUMMARY_HEAD_ITEMS = 5
+
+
+def _content_summary(value: Any) -> Any:
+    """
+    Resumen barato del contenido de un fragmento para su huella.
+
+    Incluye todos los escalares y, de cada lista, su longitud, sus primeros
+    elementos (los que muestran los límites fijos) y el último. Un dashboard
+    nuevo cambia los totales, la longitud o los extremos de las listas que
+    tocó; recorrer las listas completas costaría tanto como renderizarlas.
+    """
+    if isinstance(value, BaseModel):
+        return tuple(_content_summary(getattr(value, name)) for name in type(value).model_fields)
+    if isinstance(value, dict):
+        return tuple((key, _content_summary(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        head = tuple(_content_summary(item) for item in value[:_SUMMARY_HEAD_ITEMS])
+        last = _content_summary(value[-1]) if len(value) > _SUMMARY_HEAD_ITEMS else None
+        return (len(value), head, last)
+    return value
+
+
+def _section_source(financial_data: Any, section: str) -> Any:
+    """Devuelve el fragmento del dashboard del que depende una sección (None si falta)."""
+    value = financial_data
+    for name in _SECTION_SOURCES[section]:
+        value = _field(value, name)
+        if value is None:
+            return None
+    return value
 
 
 class PromptBuilder:
@@ -15,165 +136,647 @@ IMPORTANTE:
 - Sé claro y amigable pero profesional
 - No inventes información que no esté en el contexto"""
 
+    # Secciones del contexto, en el orden en que se renderizan
+    SECTIONS = ("usuario", "resumen", "ingresos", "gastos", "extras", "ahorros", "analisis", "alertas", "organizacion")
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        section_selection: bool = False,
+        cache_entries: int = 0,
+        cache_ttl: float = 3600
+    ):
+        """
+        Args:
+            token_budget: Tokens objetivo del contexto financiero. Si se define, las
+                transacciones, categorías, objetivos y miembros se eligen por relevancia
+                hasta llenar el presupuesto en lugar de usar límites fijos.
+            section_selection: Si es True, cada pregunta solo lleva las secciones que
+                le son relevantes según el clasificador de intención
+            cache_entries: Secciones renderizadas que se guardan entre preguntas (0 = sin caché)
+            cache_ttl: Segundos que se conserva cada sección en la caché
+        """
+        self.token_budget = token_budget
+        self.section_selection = section_selection
+        # (tipo, sección, huella) -> líneas renderizadas o puntuaciones de una lista
+        self.context_cache = TTLCache(ttl=cache_ttl, max_entries=cache_entries)
+        # id(objeto) -> (referencia débil, huella de contenido)
+        self._fingerprints: Dict[int, List[Any]] = {}
+
+    # ------------------------------------------------------------------
+    # Renderizado por sección
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _render_usuario(financial_data: Any, pick: Picker) -> List[str]:
+        usuario = _field(financial_data, "usuario", {})
+        if not usuario:
+            return []
+        return [
+            f"Usuario: {_field(usuario, 'nombre', 'N/A')} (ID: {_field(usuario, 'id', 'N/A')}) - "
+            f"Saldo actual: ${_field(usuario, 'saldoActual', 0):,.2f}"
+        ]
+
+    @staticmethod
+    def _render_resumen(financial_data: Any, pick: Picker) -> List[str]:
+        resumen = _field(financial_data, "resumen", {})
+        if not resumen:
+            return []
+        return [
+            f"Resumen: Ingresos ${_field(resumen, 'totalIngresos', 0):,.2f}, "
+            f"Extras ${_field(resumen, 'totalExtras', 0):,.2f}, "
+            f"Gastos ${_field(resumen, 'totalGastos', 0):,.2f}, "
+            f"Balance neto ${_field(resumen, 'balanceNeto', 0):,.2f}",
+            f"Ahorro: ${_field(resumen, 'ahorroTotal', 0):,.2f} "
+            f"({_field(resumen, 'porcentajeAhorro', 0):.1f}% del total)"
+        ]
+
+    @staticmethod
+    def _render_ingresos(financial_data: Any, pick: Picker) -> List[str]:
+        ingresos = _field(_field(financial_data, "detalle", {}) or {}, "ingresos", {})
+        if not ingresos:
+            return []
+        lines = [f"Ingresos totales: ${_field(ingresos, 'total', 0):,.2f}"]
+
+        def fmt(ing):
+            return (
+                f"{_field(ing, 'descripcion', 'N/A')} "
+                f"({_field(ing, 'categoria', 'N/A')}): ${_field(ing, 'monto', 0):,.2f}"
+            )
+
+        selected = pick("ingresos", _field(ingresos, "transacciones", []) or [], 5, fmt)  # Limitar a 5 para no saturar
+        if selected:
+            lines.append(f"  - {'; '.join(fmt(ing) for ing in selected)}")
+        return lines
+
+    @staticmethod
+    def _render_gastos(financial_data: Any, pick: Picker) -> List[str]:
+        gastos = _field(_field(financial_data, "detalle", {}) or {}, "gastos", {})
+        if not gastos:
+            return []
+        lines = [f"Gastos totales: ${_field(gastos, 'total', 0):,.2f}"]
+
+        # Gastos por categoría
+        def fmt_cat(cat):
+            return f"{_field(cat, 'categoria', 'N/A')}: ${_field(cat, 'total', 0):,.2f}"
+
+        categorias = pick("gastos.categorias", _field(gastos, "porCategoria", []) or [], None, fmt_cat)
+        if categorias:
+            lines.append(f"Gastos por categoría: {', '.join(fmt_cat(cat) for cat in categorias)}")
+
+        # Transacciones de gastos
+        def fmt(gasto):
+            return (
+                f"{_field(gasto, 'descripcion', 'N/A')} "
+                f"({_field(gasto, 'categoria', 'N/A')}): ${_field(gasto, 'monto', 0):,.2f}"
+            )
+
+        selected = pick("gastos", _field(gastos, "transacciones", []) or [], 5, fmt)  # Limitar a 5
+        if selected:
+            lines.append(f"  - {'; '.join(fmt(gasto) for gasto in selected)}")
+        return lines
+
+    @staticmethod
+    def _render_extras(financial_data: Any, pick: Picker) -> List[str]:
+        extras = _field(_field(financial_data, "detalle", {}) or {}, "extras", {})
+        if not extras or not _field(extras, "total", 0) > 0:
+            return []
+        lines = [f"Extras: ${_field(extras, 'total', 0):,.2f}"]
+
+        def fmt(ext):
+            return f"{_field(ext, 'descripcion', 'N/A')}: ${_field(ext, 'monto', 0):,.2f}"
+
+        selected = pick("extras", _field(extras, "transacciones", []) or [], 3, fmt)
+        if selected:
+            lines.append(f"  - {'; '.join(fmt(ext) for ext in selected)}")
+        return lines
+
+    @staticmethod
+    def _render_ahorros(financial_data: Any, pick: Picker) -> List[str]:
+        ahorros = _field(_field(financial_data, "detalle", {}) or {}, "ahorros", {})
+        if not ahorros:
+            return []
+        lines = [f"Ahorros totales: ${_field(ahorros, 'total', 0):,.2f}"]
+
+        def fmt(obj):
+            return (
+                f"{_field(obj, 'objetivo', 'N/A')}: "
+                f"${_field(obj, 'montoAhorrado', 0):,.2f} / "
+                f"${_field(obj, 'montoMeta', 0):,.2f} "
+                f"({_field(obj, 'progreso', 0):.1f}%)"
+            )
+
+        selected = pick("objetivos", _field(ahorros, "objetivos", []) or [], None, fmt)
+        if selected:
+            lines.append(f"Objetivos: {'; '.join(fmt(obj) for obj in selected)}")
+        return lines
+
+    @staticmethod
+    def _render_analisis(financial_data: Any, pick: Picker) -> List[str]:
+        # Cifras calculadas sobre todas las transacciones, no solo las que caben en el contexto
+        if not isinstance(financial_data, FinancialData):
+            try:
+                financial_data = FinancialData.model_validate(financial_data)
+            except Exception:
+                return []
+        analytics = get_analytics(financial_data)
+        if analytics is None:
+            return []
+
+        def signed(amount):
+            return f"{'+' if amount >= 0 else '-'}${abs(amount):,.2f}"
+
+        lines = ["Análisis (ya calculado sobre todas las transacciones):"]
+        if analytics.categorias:
+            lines.append("  - Gasto por categoría: " + ", ".join(
+                f"{cat.categoria} ${cat.total:,.2f} ({cat.porcentaje:.1f}%)" for cat in analytics.categorias[:5]
+            ))
+        lines.append("  - Por mes: " + "; ".join(
+            f"{mes.mes} ingresos ${mes.ingresos:,.2f}, gastos ${mes.gastos:,.2f}, neto {signed(mes.neto)}"
+            for mes in analytics.meses[-3:]
+        ))
+        changes = []
+        if analytics.variacion_gastos is not None:
+            changes.append(f"gastos {analytics.variacion_gastos:+.1f}%")
+        if analytics.variacion_ingresos is not None:
+            changes.append(f"ingresos {analytics.variacion_ingresos:+.1f}%")
+        if analytics.mayores_variaciones:
+            changes.append("mayores cambios: " + ", ".join(
+                f"{categoria} {signed(delta)}" for categoria, delta in analytics.mayores_variaciones
+            ))
+        if changes:
+            lines.append(f"  - Último mes frente al anterior: {'; '.join(changes)}")
+        burn = f"  - Ritmo de gasto: ${analytics.gasto_mensual:,.2f}/mes (${analytics.gasto_diario:,.2f}/día)"
+        if analytics.meses_de_saldo is not None:
+            burn += f"; el saldo actual cubre {analytics.meses_de_saldo:.1f} meses"
+        lines.append(burn)
+        lines.append(
+            f"  - Ahorro: {signed(analytics.ahorro_mensual)}/mes de media "
+            f"(tasa de ahorro {analytics.tasa_ahorro:.1f}%)"
+        )
+
+        def fmt_meta(meta):
+            if meta.faltante == 0:
+                return f"{meta.objetivo}: alcanzada"
+            if meta.meses is None:
+                return f"{meta.objetivo}: faltan ${meta.faltante:,.2f}, sin fecha al ritmo actual"
+            return f"{meta.objetivo}: faltan ${meta.faltante:,.2f}, ~{meta.meses:.1f} meses ({meta.mes_estimado})"
+
+        if analytics.metas:
+            lines.append(f"  - Metas al ritmo de ahorro actual: {'; '.join(fmt_meta(meta) for meta in analytics.metas[:5])}")
+        return lines
+
     @staticmethod
-    def build_financial_context(financial_data: Dict[str, Any]) -> str:
+    def _render_alertas(financial_data: Any, pick: Picker) -> List[str]:
+        def fmt(alerta):
+            return f"{_field(alerta, 'tipo', 'N/A')}: {_field(alerta, 'mensaje', 'N/A')}"
+
+        selected = pick("alertas", _field(financial_data, "alertas", []) or [], 3, fmt)  # Limitar a 3 alertas
+        if not selected:
+            return []
+        return [f"Alertas: {'; '.join(fmt(alerta) for alerta in selected)}"]
+
+    @staticmethod
+    def _render_organizacion(financial_data: Any, pick: Picker) -> List[str]:
+        organizacion = _field(financial_data, "organizacion", {})
+        if not organizacion:
+            return []
+        lines = [
+            f"Organización: {_field(organizacion, 'nombre', 'N/A')} "
+            f"(Rol: {_field(organizacion, 'rolUsuario', 'N/A')})"
+        ]
+        resumen_org = _field(organizacion, "resumen", {})
+        if resumen_org:
+            lines.append(
+                f"Organización - Total miembros: {_field(resumen_org, 'totalMiembros', 0)}, "
+                f"Saldo total: ${_field(resumen_org, 'saldoTotal', 0):,.2f}, "
+                f"Ahorro: ${_field(resumen_org, 'ahorroTotal', 0):,.2f} "
+                f"({_field(resumen_org, 'porcentajeAhorro', 0):.1f}%)"
+            )
+
+        def fmt(miembro):
+            return (
+                f"{_field(miembro, 'nombre', 'N/A')} "
+                f"({_field(miembro, 'rol', 'N/A')}): ${_field(miembro, 'saldoActual', 0):,.2f}"
+            )
+
+        miembros = _field(organizacion, "miembros", []) or []
+        selected = pick("miembros", miembros, 5, fmt)
+        if selected:
+            shown = f" ({len(selected)} de {len(miembros)})" if len(selected) < len(miembros) else ""
+            lines.append(f"Miembros{shown}: {'; '.join(fmt(miembro) for miembro in selected)}")
+        if len(miembros) > len(selected):
+            # Los miembros que no caben en la lista entran en el resumen estadístico
+            lines.extend(PromptBuilder._render_organization_digest(organizacion))
+        return lines
+
+    @staticmethod
+    def _render_organization_digest(organizacion: Any) -> List[str]:
+        if not isinstance(organizacion, Organizacion):
+            try:
+                organizacion = Organizacion.model_validate(organizacion)
+            except Exception:
+                return []
+        analytics = get_organization_analytics(organizacion)
+        if analytics is None:
+            return []
+
+        def fmt_people(people):
+            return ", ".join(f"{nombre} ${monto:,.2f}" for nombre, monto in people)
+
+        saldos = analytics.saldos
+        lines = [
+            f"Saldos de los {analytics.miembros} miembros: media ${saldos.media:,.2f}, "
+            f"mediana ${saldos.mediana:,.2f}, p10 ${saldos.p10:,.2f}, p90 ${saldos.p90:,.2f}, "
+            f"p99 ${saldos.p99:,.2f}",
+            "Por rol: " + "; ".join(
+                f"{rol.rol} {rol.miembros} miembros, saldo ${rol.saldo:,.2f} (media ${rol.saldo_medio:,.2f})"
+                for rol in analytics.roles[:5]
+            ),
+        ]
+        if analytics.atipicos_altos or analytics.atipicos_bajos:
+            outliers = f"Saldos atípicos: {analytics.atipicos_altos} altos"
+            if analytics.mayores_atipicos:
+                outliers += f" ({fmt_people(analytics.mayores_atipicos)})"
+            outliers += f", {analytics.atipicos_bajos} bajos"
+            if analytics.menores_atipicos:
+                outliers += f" ({fmt_people(analytics.menores_atipicos)})"
+            lines.append(outliers)
+        if analytics.gasto is not None:
+            spending = (
+                f"Gasto por miembro: total ${analytics.gasto.total:,.2f}, mediana ${analytics.gasto.mediana:,.2f}, "
+                f"p90 ${analytics.gasto.p90:,.2f}; más gastan: {fmt_people(analytics.mayores_gastadores)}"
+            )
+            if analytics.concentracion_gasto is not None:
+                spending += f"; el 10% que más gasta concentra el {analytics.concentracion_gasto:.1f}%"
+            lines.append(spending)
+        return lines
+
+    @classmethod
+    def _render_sections(
+        cls,
+        financial_data: Any,
+        pick: Picker,
+        sections: Optional[Sequence[str]] = None
+    ) -> List[str]:
+        """Renderiza las secciones pedidas (todas por defecto) en el orden canónico."""
+        context_parts: List[str] = []
+        for name in cls.SECTIONS:
+            if sections is None or name in sections:
+                context_parts.extend(getattr(cls, f"_render_{name}")(financial_data, pick))
+        return context_parts
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Estimación rápida de tokens (~4 caracteres por token)."""
+        return max(1, (len(text) + 3) // 4)
+
+    @classmethod
+    def build_financial_context(
+        cls,
+        financial_data: Union[Dict[str, Any], FinancialData],
+        sections: Optional[Sequence[str]] = None
+    ) -> str:
         """
         Construye el contexto financiero a partir del JSON recibido.
         
         Args:
-            financial_data: Diccionario con los datos financieros del usuario
+            financial_data: Datos financieros del usuario (diccionario o FinancialData validado)
+            sections: Secciones a incluir (default: todas, ver SECTIONS)
             
         Returns:
             String formateado con el contexto financiero
         """
         try:
-            context_parts = []
-            
-            # Información del usuario
-            usuario = financial_data.get("usuario", {})
-            if usuario:
-                context_parts.append(
-                    f"Usuario: {usuario.get('nombre', 'N/A')} (ID: {usuario.get('id', 'N/A')}) - "
-                    f"Saldo actual: ${usuario.get('saldoActual', 0):,.2f}"
-                )
-            
-            # Resumen financiero
-            resumen = financial_data.get("resumen", {})
-            if resumen:
-                context_parts.append(
-                    f"Resumen: Ingresos ${resumen.get('totalIngresos', 0):,.2f}, "
-                    f"Extras ${resumen.get('totalExtras', 0):,.2f}, "
-                    f"Gastos ${resumen.get('totalGastos', 0):,.2f}, "
-                    f"Balance neto ${resumen.get('balanceNeto', 0):,.2f}"
-                )
-                context_parts.append(
-                    f"Ahorro: ${resumen.get('ahorroTotal', 0):,.2f} "
-                    f"({resumen.get('porcentajeAhorro', 0):.1f}% del total)"
-                )
-            
-            # Detalle de ingresos
-            detalle = financial_data.get("detalle", {})
-            if detalle:
-                ingresos = detalle.get("ingresos", {})
-                if ingresos:
-                    total_ingresos = ingresos.get("total", 0)
-                    transacciones_ing = ingresos.get("transacciones", [])
-                    context_parts.append(f"Ingresos totales: ${total_ingresos:,.2f}")
-                    if transacciones_ing:
-                        ing_summary = []
-                        for ing in transacciones_ing[:5]:  # Limitar a 5 para no saturar
-                            ing_summary.append(
-                                f"{ing.get('descripcion', 'N/A')} "
-                                f"({ing.get('categoria', 'N/A')}): ${ing.get('monto', 0):,.2f}"
-                            )
-                        if ing_summary:
-                            context_parts.append(f"  - {'; '.join(ing_summary)}")
-                
-                # Detalle de gastos
-                gastos = detalle.get("gastos", {})
-                if gastos:
-                    total_gastos = gastos.get("total", 0)
-                    context_parts.append(f"Gastos totales: ${total_gastos:,.2f}")
-                    
-                    # Gastos por categoría
-                    por_categoria = gastos.get("porCategoria", [])
-                    if por_categoria:
-                        cat_summary = []
-                        for cat in por_categoria:
-                            cat_summary.append(
-                                f"{cat.get('categoria', 'N/A')}: ${cat.get('total', 0):,.2f}"
-                            )
-                        if cat_summary:
-                            context_parts.append(f"Gastos por categoría: {', '.join(cat_summary)}")
-                    
-                    # Transacciones de gastos
-                    transacciones_gastos = gastos.get("transacciones", [])
-                    if transacciones_gastos:
-                        gastos_summary = []
-                        for gasto in transacciones_gastos[:5]:  # Limitar a 5
-                            gastos_summary.append(
-                                f"{gasto.get('descripcion', 'N/A')} "
-                                f"({gasto.get('categoria', 'N/A')}): ${gasto.get('monto', 0):,.2f}"
-                            )
-                        if gastos_summary:
-                            context_parts.append(f"  - {'; '.join(gastos_summary)}")
-                
-                # Extras
-                extras = detalle.get("extras", {})
-                if extras and extras.get("total", 0) > 0:
-                    total_extras = extras.get("total", 0)
-                    context_parts.append(f"Extras: ${total_extras:,.2f}")
-                    transacciones_extras = extras.get("transacciones", [])
-                    if transacciones_extras:
-                        extras_summary = []
-                        for ext in transacciones_extras[:3]:
-                            extras_summary.append(
-                                f"{ext.get('descripcion', 'N/A')}: ${ext.get('monto', 0):,.2f}"
-                            )
-                        if extras_summary:
-                            context_parts.append(f"  - {'; '.join(extras_summary)}")
-                
-                # Ahorros y objetivos
-                ahorros = detalle.get("ahorros", {})
-                if ahorros:
-                    total_ahorros = ahorros.get("total", 0)
-                    objetivos = ahorros.get("objetivos", [])
-                    context_parts.append(f"Ahorros totales: ${total_ahorros:,.2f}")
-                    if objetivos:
-                        obj_summary = []
-                        for obj in objetivos:
-                            obj_summary.append(
-                                f"{obj.get('objetivo', 'N/A')}: "
-                                f"${obj.get('montoAhorrado', 0):,.2f} / "
-                                f"${obj.get('montoMeta', 0):,.2f} "
-                                f"({obj.get('progreso', 0):.1f}%)"
-                            )
-                        if obj_summary:
-                            context_parts.append(f"Objetivos: {'; '.join(obj_summary)}")
-            
-            # Alertas
-            alertas = financial_data.get("alertas", [])
-            if alertas:
-                alertas_summary = []
-                for alerta in alertas[:3]:  # Limitar a 3 alertas
-                    alertas_summary.append(f"{alerta.get('tipo', 'N/A')}: {alerta.get('mensaje', 'N/A')}")
-                if alertas_summary:
-                    context_parts.append(f"Alertas: {'; '.join(alertas_summary)}")
-            
-            # Organización (si existe)
-            organizacion = financial_data.get("organizacion", {})
-            if organizacion:
-                context_parts.append(
-                    f"Organización: {organizacion.get('nombre', 'N/A')} "
-                    f"(Rol: {organizacion.get('rolUsuario', 'N/A')})"
+            return "\n".join(cls._render_sections(financial_data, _fixed_picker, sections))
+        except Exception as e:
+            logger.error(f"Error construyendo contexto financiero: {str(e)}")
+            return "Error al procesar datos financieros"
+
+    @classmethod
+    def build_budgeted_context(
+        cls,
+        financial_data: Union[Dict[str, Any], FinancialData],
+        token_budget: int,
+        sections: Optional[Sequence[str]] = None,
+        score_items: Optional[Callable[[str, Sequence[Any], str, int], List[Tuple[int, float]]]] = None
+    ) -> str:
+        """
+        Construye el contexto financiero ajustado a un presupuesto de tokens.
+
+        Los totales de cada sección siempre se incluyen. Con el presupuesto restante
+        se agregan los elementos más informativos de todas las listas (montos más
+        altos, más recientes y relacionados con alertas) hasta llenarlo.
+
+        Args:
+            financial_data: Datos financieros del usuario (diccionario o FinancialData validado)
+            token_budget: Tokens objetivo para el contexto completo
+            sections: Secciones a incluir (default: todas)
+            score_items: Puntuador de listas (default: `_score_items`); permite
+                reutilizar puntuaciones ya calculadas
+
+        Returns:
+            String formateado con el contexto financiero
+        """
+        try:
+            # 1ª pasada: solo totales; se registran las listas candidatas de cada sección
+            candidates: Dict[str, Tuple[Sequence[Any], Callable[[Any], str]]] = {}
+
+            def collect(key, items, limit, fmt):
+                candidates[key] = (items, fmt)
+                return []
+
+            base_parts = cls._render_sections(financial_data, collect, sections)
+            remaining = token_budget - cls.estimate_tokens("\n".join(base_parts))
+            if remaining <= 0:
+                logger.warning(f"Los totales del contexto ya superan el presupuesto de {token_budget} tokens")
+
+            # Elegir elementos por relevancia mientras quepan en el presupuesto
+            alert_text = " ".join(
+                f"{_field(alerta, 'tipo', '')} {_field(alerta, 'mensaje', '')}"
+                for alerta in (_field(financial_data, "alertas", []) or [])
+            ).lower()
+            # Ningún elemento cuesta menos de ~4 tokens: más candidatos por lista no caben
+            max_items = max(1, remaining // 4)
+            score_items = score_items or cls._score_items
+            ranked = []
+            for key, (items, fmt) in candidates.items():
+                for index, score in score_items(key, items, alert_text, max_items):
+                    ranked.append((score, key, index))
+            ranked.sort(key=lambda entry: entry[0], reverse=True)
+
+            chosen: Dict[str, List[int]] = {}
+            for score, key, index in ranked:
+                if remaining < 2:
+                    break
+                items, fmt = candidates[key]
+                # Un elemento cuesta su texto + separador; el primero de cada lista abre una línea
+                cost = cls.estimate_tokens(fmt(items[index])) + (4 if key not in chosen else 1)
+                if cost <= remaining:
+                    chosen.setdefault(key, []).append(index)
+                    remaining -= cost
+
+            # 2ª pasada: renderizar con los elementos elegidos, en su orden original
+            def budgeted(key, items, limit, fmt):
+                return [items[index] for index in sorted(chosen.get(key, []))]
+
+            return "\n".join(cls._render_sections(financial_data, budgeted, sections))
+
+        except Exception as e:
+            logger.error(f"Error construyendo contexto financiero con presupuesto: {str(e)}")
+            return "Error al procesar datos financieros"
+
+    @staticmethod
+    def _date_ordinal(fecha: Any) -> Optional[int]:
+        """Convierte una fecha ISO (YYYY-MM-DD...) en un entero comparable, sin parsear la hora."""
+        try:
+            text = str(fecha)
+            return int(text[0:4]) * 372 + int(text[5:7]) * 31 + int(text[8:10])
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def _score_items(
+        cls,
+        key: str,
+        items: Sequence[Any],
+        alert_text: str,
+        max_items: int
+    ) -> List[Tuple[int, float]]:
+        """
+        Puntúa los elementos de una lista para el contexto con presupuesto.
+
+        Combina el monto relativo al mayor de la lista, la recencia por fecha y
+        un bono si el elemento aparece mencionado en alguna alerta. Solo se
+        devuelven los `max_items` mejores, con rendimientos decrecientes.
+
+        Returns:
+            Lista de (índice, puntuación)
+        """
+        if not items:
+            return []
+        weight = _ITEM_WEIGHTS.get(key, 1.0)
+
+        if key == "alertas":
+            base = [
+                (index, _SEVERITY_SCORES.get(str(_field(item, "severidad", "")).lower(), 0.5))
+                for index, item in enumerate(items)
+            ]
+        else:
+            amount_field = _ITEM_AMOUNT_FIELDS.get(key)
+            amounts = [abs(_field(item, amount_field, 0) or 0) for item in items] if amount_field else [0] * len(items)
+            max_amount = max(amounts) or 1
+
+            # Sin fechas (agregados como categorías u objetivos) todo cuenta como actual
+            if key in _DATED_ITEMS:
+                ordinals = [cls._date_ordinal(_field(item, "fecha")) for item in items]
+            else:
+                ordinals = [None] * len(items)
+            known = [value for value in ordinals if value is not None]
+            oldest, newest = (min(known), max(known)) if known else (0, 0)
+            span = (newest - oldest) or 1
+
+            label_fields = _ITEM_LABEL_FIELDS.get(key, ()) if alert_text else ()
+            mentioned: Dict[str, bool] = {}  # Las etiquetas se repiten mucho (p. ej. categorías)
+
+            base = []
+            for index, item in enumerate(items):
+                recency = 1.0 if ordinals[index] is None else (ordinals[index] - oldest) / span
+                score = 0.6 * amounts[index] / max_amount + 0.4 * recency
+                for label_field in label_fields:
+                    label = _field(item, label_field)
+                    if not label:
+                        continue
+                    if label not in mentioned:
+                        mentioned[label] = str(label).lower() in alert_text
+                    if mentioned[label]:
+                        score += 0.5
+                        break
+                base.append((index, score))
+
+        # Rendimientos decrecientes dentro de una misma lista para repartir el
+        # presupuesto entre secciones en lugar de agotarlo en una sola
+        best = heapq.nlargest(max_items, base, key=lambda entry: entry[1])
+        return [(index, weight * score * (0.85 ** position)) for position, (index, score) in enumerate(best)]
+
+    def build_context(
+        self,
+        financial_data: Union[Dict[str, Any], FinancialData],
+        sections: Optional[Sequence[str]] = None
+    ) -> str:
+        """
+        Construye el contexto usando el presupuesto de tokens configurado (si lo hay).
+
+        Args:
+            financial_data: Datos financieros del usuario
+            sections: Secciones a incluir (default: todas)
+
+        Returns:
+            String formateado con el contexto financiero
+        """
+        if self.token_budget:
+            if not self.context_cache.enabled:
+                return self.build_budgeted_context(financial_data, self.token_budget, sections)
+            return self.build_budgeted_context(
+                financial_data, self.token_budget, sections,
+                score_items=lambda key, items, alert_text, max_items: self._cached_scores(
+                    financial_data, key, items, alert_text, max_items
                 )
-                resumen_org = organizacion.get("resumen", {})
-                if resumen_org:
-                    context_parts.append(
-                        f"Organización - Total miembros: {resumen_org.get('totalMiembros', 0)}, "
-                        f"Saldo total: ${resumen_org.get('saldoTotal', 0):,.2f}, "
-                        f"Ahorro: ${resumen_org.get('ahorroTotal', 0):,.2f} "
-                        f"({resumen_org.get('porcentajeAhorro', 0):.1f}%)"
-                    )
-                miembros = organizacion.get("miembros", [])
-                if miembros:
-                    miembros_summary = []
-                    for miembro in miembros[:5]:
-                        miembros_summary.append(
-                            f"{miembro.get('nombre', 'N/A')} "
-                            f"({miembro.get('rol', 'N/A')}): ${miembro.get('saldoActual', 0):,.2f}"
-                        )
-                    if miembros_summary:
-                        context_parts.append(f"Miembros: {'; '.join(miembros_summary)}")
-            
-            return "\n".join(context_parts)
-            
+            )
+        if not self.context_cache.enabled:
+            return self.build_financial_context(financial_data, sections)
+        try:
+            return "\n".join(self._render_cached_sections(financial_data, sections))
         except Exception as e:
             logger.error(f"Error construyendo contexto financiero: {str(e)}")
             return "Error al procesar datos financieros"
+
+    # ------------------------------------------------------------------
+    # Caché de secciones
+    # ------------------------------------------------------------------
+
+    def _fingerprint(self, source: Any) -> str:
+        """
+        Huella del contenido de un fragmento del dashboard, memorizada por identidad del objeto.
+
+        La huella es el hash de `_content_summary` (escalares, longitudes y extremos
+        de las listas), no del JSON completo: cuesta lo mismo con 100 que con 100k
+        transacciones, y un snapshot nuevo reutiliza las secciones que no cambiaron.
+
+        Args:
+            source: Fragmento del dashboard (modelo, diccionario o lista)
+
+        Returns:
+            Huella del contenido
+        """
+        entry = self._fingerprints.get(id(source))
+        if entry is not None and entry[0]() is source:
+            return entry[1]
+
+        digest = hashlib.blake2b(repr(_content_summary(source)).encode("utf-8"), digest_size=16).hexdigest()
+        try:
+            # Solo los modelos admiten referencias débiles; dicts y listas no se memorizan
+            key = id(source)
+            ref = weakref.ref(source, lambda dead, key=key: self._forget_fingerprint(key, dead))
+        except TypeError:
+            return digest
+        self._fingerprints[key] = [ref, digest]
+        return digest
+
+    def _forget_fingerprint(self, key: int, ref: "weakref.ref[Any]") -> None:
+        entry = self._fingerprints.get(key)
+        if entry is not None and entry[0] is ref:
+            del self._fingerprints[key]
+
+    def _render_cached_sections(
+        self,
+        financial_data: Union[Dict[str, Any], FinancialData],
+        sections: Optional[Sequence[str]] = None
+    ) -> List[str]:
+        """
+        Renderiza las secciones con límites fijos reutilizando las ya renderizadas.
+
+        Cada sección se identifica por la huella de su contenido: las preguntas
+        sobre el mismo snapshot no vuelven a renderizar nada y un snapshot nuevo
+        solo renderiza las secciones que cambiaron.
+        """
+        context_parts: List[str] = []
+        for name in self.SECTIONS:
+            if sections is not None and name not in sections:
+                continue
+            render = getattr(self, f"_render_{name}")
+            source = _section_source(financial_data, name)
+            if source is None:
+                context_parts.extend(render(financial_data, _fixed_picker))
+                continue
+
+            key = ("seccion", name, self._fingerprint(source))
+            lines = self.context_cache.get(key)
+            if lines is None:
+                lines = render(financial_data, _fixed_picker)
+                self.context_cache.set(key, lines)
+            context_parts.extend(lines)
+        return context_parts
+
+    def _cached_scores(
+        self,
+        financial_data: Any,
+        key: str,
+        items: Sequence[Any],
+        alert_text: str,
+        max_items: int
+    ) -> List[Tuple[int, float]]:
+        """
+        Puntuaciones de una lista candidata, recalculadas solo si su sección cambió.
+
+        Con la huella del contenido de la sección, al llegar un dashboard nuevo con
+        un solo gasto más únicamente se vuelve a puntuar gastos.
+        """
+        source = _section_source(financial_data, _ITEM_SECTIONS[key])
+        if source is None:
+            return self._score_items(key, items, alert_text, max_items)
+
+        alert_digest = hashlib.blake2b(alert_text.encode("utf-8"), digest_size=8).hexdigest()
+        cache_key = ("puntajes", key, self._fingerprint(source), alert_digest)
+        cached = self.context_cache.get(cache_key)
+        # nlargest está ordenado: un resultado con más elementos sirve para un límite menor
+        if cached is not None and (cached[0] >= max_items or len(cached[1]) < cached[0]):
+            return cached[1][:max_items]
+
+        scores = self._score_items(key, items, alert_text, max_items)
+        self.context_cache.set(cache_key, (max_items, scores))
+        return scores
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Métricas de la caché de secciones del contexto."""
+        stats = self.context_cache.stats()
+        stats["tracked_objects"] = len(self._fingerprints)
+        return stats
+
+    def sections_for_question(self, question: str) -> Optional[List[str]]:
+        """
+        Secciones del contexto que necesita una pregunta.
+
+        Args:
+            question: Pregunta del usuario
+
+        Returns:
+            Lista de secciones, o None para usar el contexto completo
+        """
+        if not self.section_selection:
+            return None
+        return select_sections(question)
+
+    def build_question_context(
+        self,
+        financial_data: Union[Dict[str, Any], FinancialData],
+        question: str,
+        available: Optional[Sequence[str]] = None
+    ) -> str:
+        """
+        Construye el contexto con solo las secciones relevantes para la pregunta.
+
+        Args:
+            financial_data: Datos financieros del usuario
+            question: Pregunta del usuario
+            available: Secciones presentes en un dashboard parcial (default: todas)
+
+        Returns:
+            String formateado con el contexto financiero
+        """
+        sections = self.sections_for_question(question)
+        if available is not None:
+            sections = [name for name in (sections or self.SECTIONS) if name in available]
+        if sections is not None:
+            logger.debug(f"Secciones seleccionadas para la pregunta: {', '.join(sections)}")
+        return self.build_context(financial_data, sections)
     
     @classmethod
-    def build_prompt(cls, financial_data: Dict[str, Any], user_question: str) -> str:
+    def build_prompt(cls, financial_data: Union[Dict[str, Any], FinancialData], user_question: str) -> str:
         """
         Construye el prompt completo para enviar a Gemini.
         
@@ -185,16 +788,43 @@ IMPORTANTE:
             Prompt completo formateado
         """
         financial_context = cls.build_financial_context(financial_data)
+        return cls.build_prompt_from_context(financial_context, user_question)
+    
+    @classmethod
+    def build_prompt_from_context(cls, financial_context: str, user_question: str) -> str:
+        """
+        Construye el prompt a partir de un contexto financiero ya renderizado.
         
-        prompt = f"""{cls.SYSTEM_PROMPT}
-
-=== CONTEXTO FINANCIERO DEL USUARIO ===
-{financial_context}
-
-=== PREGUNTA DEL USUARIO ===
+        Args:
+            financial_context: Contexto generado por `build_financial_context`
+            user_question: Pregunta del usuario
+            
+        Returns:
+            Prompt completo formateado
+        """
+        prompt = f"""{cls.build_prompt_prefix(financial_context)}=== PREGUNTA DEL USUARIO ===
 {user_question}
 
 === RESPUESTA ===
 """
         return prompt
 
+    @classmethod
+    def build_prompt_prefix(cls, financial_context: str) -> str:
+        """
+        Parte del prompt que no depende de la pregunta (prompt de sistema + contexto).
+
+        Es la parte que se sube a Gemini como contexto cacheado.
+
+        Args:
+            financial_context: Contexto generado por `build_financial_context`
+
+        Returns:
+            Prefijo con el que empieza `build_prompt_from_context`
+        """
+        return f"""{cls.SYSTEM_PROMPT}
+
+=== CONTEXTO FINANCIERO DEL USUARIO ===
+{financial_context}
+
+"""
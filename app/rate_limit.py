@@ -0,0 +1,56 @@
+"""
+Limitadores de tasa asíncronos para las llamadas a Gemini.
+"""
+
+import time
+import asyncio
+from typing import Optional
+
+
+class AsyncRateLimiter:
+    """Token bucket asíncrono: `rate` unidades por `per` segundos con ráfagas de hasta `burst`."""
+
+    def __init__(self, rate: float, per: float = 60.0, burst: Optional[float] = None):
+        """
+        Inicializa el limitador.
+
+        Args:
+            rate: Unidades permitidas por periodo (p. ej. peticiones por minuto)
+            per: Duración del periodo en segundos
+            burst: Capacidad del bucket (default: una décima del periodo, mínimo 1)
+        """
+        self.rate = rate
+        self.per = per
+        self.capacity = burst if burst is not None else max(1.0, rate / 10)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        # asyncio.Lock atiende en orden de llegada: nadie se queda sin turno
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate / self.per)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """
+        Espera hasta que haya `amount` unidades disponibles y las consume.
+
+        Args:
+            amount: Unidades a consumir (1 por petición, o los tokens estimados)
+
+        Returns:
+            Segundos esperados
+        """
+        start = time.monotonic()
+        async with self._lock:
+            self._refill(time.monotonic())
+            # Una petición mayor que el bucket se deja pasar cuando este se llena
+            needed = min(amount, self.capacity)
+            if self._tokens < needed:
+                await asyncio.sleep((needed - self._tokens) * self.per / self.rate)
+                self._refill(time.monotonic())
+            self._tokens -= amount
+        waited = time.monotonic() - start
+        self.waited += waited
+        return waited
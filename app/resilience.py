@@ -0,0 +1,254 @@
+"""
+Reintentos, peticiones de cobertura (hedging) y plazos para las llamadas a Gemini.
+Los plazos son absolutos (time.monotonic) para que el tiempo que queda se
+propague desde la petición HTTP hasta cada intento contra Gemini.
+"""
+
+import os
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+import httpx
+from loguru import logger
+
+
+# Errores transitorios de Gemini: cuota, error interno, no disponible y timeout del servidor
+RETRYABLE_CODES = (429, 500, 503, 504)
+
+
+class DeadlineExceeded(Exception):
+    """No queda tiempo del plazo de la petición para otro intento."""
+
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """
+    Segundos que quedan hasta el plazo.
+
+    Args:
+        deadline: Plazo absoluto en time.monotonic() o None si no hay plazo
+
+    Returns:
+        Segundos restantes (None si no hay plazo)
+
+    Raises:
+        DeadlineExceeded: si el plazo ya venció
+    """
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Se agotó el plazo de la petición")
+    return left
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Indica si vale la pena repetir una llamada que falló con `error`.
+
+    Args:
+        error: Excepción de la llamada a Gemini
+
+    Returns:
+        True para 429/500/503/504, timeouts y errores de red; False para errores
+        del cliente (400, 403, 404...) y plazos agotados
+    """
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException, httpx.NetworkError)):
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and code in RETRYABLE_CODES
+
+
+class RetryPolicy:
+    """Reintentos con backoff exponencial y jitter completo, acotados por el plazo."""
+
+    def __init__(self, max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        Inicializa la política.
+
+        Args:
+            max_retries: Reintentos como máximo tras el primer intento
+            base_delay: Espera base en segundos (se duplica en cada reintento)
+            max_delay: Tope de la espera entre intentos
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.gave_up = 0
+
+    def backoff(self, attempt: int) -> float:
+        """Espera antes del reintento `attempt` (0 = primero): uniforme en [0, base * 2^attempt]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def retry_delay(self, error: BaseException, attempt: int, deadline: Optional[float] = None) -> Optional[float]:
+        """
+        Decide si se reintenta tras un fallo.
+
+        Args:
+            error: Excepción del intento fallido
+            attempt: Reintentos ya hechos (0 tras el primer intento)
+            deadline: Plazo absoluto de la petición
+
+        Returns:
+            Segundos a esperar antes del reintento, o None si no se reintenta
+        """
+        if not is_retryable_error(error):
+            return None
+        delay = self.backoff(attempt)
+        if attempt >= self.max_retries or (deadline is not None and time.monotonic() + delay >= deadline):
+            self.gave_up += 1
+            return None
+        self.retries += 1
+        logger.warning(f"Intento {attempt + 1} fallido contra Gemini ({str(error)[:80]}), reintento en {delay:.2f}s")
+        return delay
+
+    async def run(self, call: Callable[[], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        """
+        Ejecuta `call` reintentando los errores transitorios.
+
+        Args:
+            call: Función que crea un intento nuevo en cada llamada
+            deadline: Plazo absoluto; no se reintenta si la espera lo sobrepasa
+
+        Returns:
+            Resultado del primer intento exitoso
+
+        Raises:
+            La excepción del último intento si no es reintentable o se agotaron intentos/plazo
+        """
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de reintentos."""
+        return {"retries": self.retries, "gave_up": self.gave_up}
+
+
+class Hedger:
+    """
+    Peticiones de cobertura: si un intento no respondió al llegar al percentil
+    de latencia observado, se lanza un segundo intento y gana el primero que termine.
+    """
+
+    def __init__(self, percentile: float = 95, window: int = 500, min_samples: int = 50):
+        """
+        Inicializa el hedger.
+
+        Args:
+            percentile: Percentil de latencia tras el que se lanza la cobertura
+            window: Latencias recientes consideradas
+            min_samples: Muestras necesarias antes de empezar a cubrir
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._threshold: Optional[float] = None
+        self._pending_samples = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def observe(self, seconds: float) -> None:
+        """Registra la latencia de un intento exitoso."""
+        self._samples.append(seconds)
+        self._pending_samples += 1
+        # Recalcular el percentil cada cierto número de muestras, no en cada llamada
+        if self._pending_samples >= 10 and len(self._samples) >= self.min_samples:
+            ordered = sorted(self._samples)
+            self._threshold = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+            self._pending_samples = 0
+
+    @property
+    def threshold(self) -> Optional[float]:
+        """Segundos tras los que se lanza la cobertura (None hasta tener muestras suficientes)."""
+        return self._threshold
+
+    async def run(self, call: Callable[[], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        """
+        Ejecuta `call` con una posible segunda llamada de cobertura.
+
+        Args:
+            call: Función que crea un intento nuevo en cada llamada
+            deadline: Plazo absoluto; no se cubre si el percentil ya lo sobrepasa
+
+        Returns:
+            Resultado del primer intento que termine con éxito
+        """
+        delay = self._threshold
+        if delay is None or (deadline is not None and time.monotonic() + delay >= deadline):
+            return await call()
+
+        tasks = {asyncio.ensure_future(call())}
+        hedge = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged += 1
+                hedge = asyncio.ensure_future(call())
+                tasks.add(hedge)
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # El intento perdedor se cancela para liberar su turno en el gobernador
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de las peticiones de cobertura."""
+        return {
+            "threshold_ms": round(self._threshold * 1000, 1) if self._threshold is not None else None,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+def create_retry_policy_from_env() -> RetryPolicy:
+    """
+    Construye la política de reintentos según las variables de entorno.
+
+    - GEMINI_MAX_RETRIES: reintentos tras el primer intento (default: 2)
+    - GEMINI_RETRY_BASE_DELAY: espera base en segundos (default: 0.5)
+
+    Returns:
+        RetryPolicy configurada
+    """
+    return RetryPolicy(
+        max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "2")),
+        base_delay=float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.5"))
+    )
+
+
+def create_hedger_from_env() -> Optional[Hedger]:
+    """
+    Construye el hedger según las variables de entorno.
+
+    - GEMINI_HEDGE_ENABLED: activa las peticiones de cobertura (default: false)
+    - GEMINI_HEDGE_PERCENTILE: percentil de latencia que dispara la cobertura (default: 95)
+
+    Returns:
+        Hedger configurado o None si está deshabilitado
+    """
+    if os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() != "true":
+        return None
+    hedger = Hedger(percentile=float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95")))
+    logger.info(f"Peticiones de cobertura habilitadas (p{hedger.percentile:.0f})")
+    return hedger
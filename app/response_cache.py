@@ -0,0 +1,197 @@
+"""
+Caché de respuestas de Gemini para prompts idénticos.
+El prompt ya incluye el contexto financiero completo, así que la misma pregunta
+sobre el mismo snapshot de datos produce exactamente el mismo prompt.
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+from loguru import logger
+
+from app.cache import TTLCache
+
+
+class MemoryResponseBackend:
+    """Backend en memoria del proceso (LRU + TTL)."""
+
+    blocking = False
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: Optional[int] = None):
+        self._cache = TTLCache(ttl=ttl, max_entries=max_entries, max_bytes=max_bytes)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: str) -> None:
+        self._cache.set(key, value, size=len(value.encode("utf-8")))
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        return {"entries": stats["entries"], "bytes": stats["bytes"], "evictions": stats["evictions"]}
+
+
+class SQLiteResponseBackend:
+    """Backend persistente en un archivo SQLite (sobrevive reinicios y se comparte entre workers)."""
+
+    blocking = True
+
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS respuestas ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_respuestas_last_access ON respuestas (last_access)"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM respuestas WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE respuestas SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respuestas (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Elimina las entradas expiradas y, si sobran, las menos usadas."""
+        cursor = self._conn.execute("DELETE FROM respuestas WHERE expires_at <= ?", (now,))
+        evicted = cursor.rowcount
+        excess = self._conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0] - self.max_entries
+        if excess > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM respuestas WHERE key IN ("
+                " SELECT key FROM respuestas ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+            evicted += cursor.rowcount
+        self.evictions += max(evicted, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+        return {"entries": entries, "path": self.path, "evictions": self.evictions}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """Caché de respuestas indexada por hash de (prompt, modelo, temperatura, max_tokens)."""
+
+    def __init__(self, backend: Any):
+        """
+        Args:
+            backend: Objeto con `get(key)`, `set(key, value)`, `stats()` y el atributo
+                `blocking` (True si sus operaciones hacen I/O y deben ir a un hilo)
+        """
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(prompt: str, model: str, temperature: float, max_tokens: int) -> str:
+        """Genera la clave de caché para una llamada a Gemini."""
+        raw = f"{model}\x00{temperature}\x00{max_tokens}\x00{prompt}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Obtiene una respuesta cacheada (None si no hay o si el backend falla)."""
+        try:
+            if self.backend.blocking:
+                value = await asyncio.to_thread(self.backend.get, key)
+            else:
+                value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Error leyendo la caché de respuestas: {str(e)}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        """Guarda una respuesta; los errores del backend no interrumpen la petición."""
+        try:
+            if self.backend.blocking:
+                await asyncio.to_thread(self.backend.set, key, value)
+            else:
+                self.backend.set(key, value)
+        except Exception as e:
+            logger.warning(f"Error escribiendo en la caché de respuestas: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de la caché de respuestas."""
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+
+def create_response_cache_from_env() -> Optional[ResponseCache]:
+    """
+    Construye la caché de respuestas según las variables de entorno.
+
+    - RESPONSE_CACHE_BACKEND: memory (default), sqlite o none
+    - RESPONSE_CACHE_TTL: segundos de vida de cada respuesta (default: 3600)
+    - RESPONSE_CACHE_MAX_ENTRIES: máximo de respuestas guardadas (default: 10000)
+    - RESPONSE_CACHE_PATH: archivo SQLite (default: cache/respuestas.sqlite3)
+
+    Returns:
+        ResponseCache configurada o None si está deshabilitada
+    """
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+    max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+
+    if backend_name in ("none", "off", "") or ttl <= 0:
+        logger.info("Caché de respuestas deshabilitada")
+        return None
+
+    if backend_name == "sqlite":
+        path = os.getenv("RESPONSE_CACHE_PATH", "cache/respuestas.sqlite3")
+        backend = SQLiteResponseBackend(path=path, ttl=ttl, max_entries=max_entries)
+    elif backend_name == "memory":
+        backend = MemoryResponseBackend(ttl=ttl, max_entries=max_entries)
+    else:
+        raise ValueError(f"RESPONSE_CACHE_BACKEND no soportado: {backend_name}")
+
+    logger.info(f"Caché de respuestas habilitada ({backend_name}, TTL {ttl:.0f}s, máx. {max_entries})")
+    return ResponseCache(backend)
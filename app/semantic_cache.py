@@ -0,0 +1,205 @@
+"""
+Caché semántica de respuestas para preguntas casi idénticas.
+Las preguntas se convierten en embeddings con un modelo local y se comparan
+contra las ya respondidas sobre el mismo contexto financiero; si la similitud
+supera el umbral, se reutiliza la respuesta sin llamar a Gemini.
+
+Requiere `sentence-transformers` (ver requirements-optional.txt).
+"""
+
+import os
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+
+Embedder = Callable[[List[str]], Any]
+
+
+class _VectorIndex:
+    """Índice de embeddings normalizados de un contexto, con reemplazo circular al llenarse."""
+
+    __slots__ = ("vectors", "answers", "size", "next_slot", "max_entries")
+
+    def __init__(self, dim: int, max_entries: int):
+        self.vectors = np.empty((min(64, max_entries), dim), dtype=np.float32)
+        self.answers: List[str] = []
+        self.size = 0
+        self.next_slot = 0
+        self.max_entries = max_entries
+
+    def search(self, vector: Any) -> Tuple[int, float]:
+        """Devuelve (posición, similitud coseno) de la entrada más parecida."""
+        if self.size == 0:
+            return -1, -1.0
+        scores = self.vectors[:self.size] @ vector
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def add(self, vector: Any, answer: str) -> None:
+        if self.size < self.max_entries:
+            if self.size == len(self.vectors):
+                grown = np.empty((min(len(self.vectors) * 2, self.max_entries), self.vectors.shape[1]),
+                                 dtype=np.float32)
+                grown[:self.size] = self.vectors[:self.size]
+                self.vectors = grown
+            self.vectors[self.size] = vector
+            self.answers.append(answer)
+            self.size += 1
+        else:
+            # Índice lleno: se reemplaza la entrada más antigua
+            self.vectors[self.next_slot] = vector
+            self.answers[self.next_slot] = answer
+            self.next_slot = (self.next_slot + 1) % self.max_entries
+
+
+class SemanticCache:
+    """Caché de respuestas por similitud de preguntas, con un índice por contexto financiero."""
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        threshold: float = 0.9,
+        max_entries_per_context: int = 10000,
+        max_contexts: int = 1000
+    ):
+        """
+        Inicializa la caché semántica.
+
+        Args:
+            embedder: Función que recibe una lista de textos y devuelve una matriz de embeddings
+            threshold: Similitud coseno mínima para reutilizar una respuesta (0-1)
+            max_entries_per_context: Preguntas guardadas por contexto
+            max_contexts: Contextos distintos en memoria (LRU)
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_entries_per_context = max_entries_per_context
+        self.max_contexts = max_contexts
+        self._indexes: "OrderedDict[str, _VectorIndex]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def context_key(financial_context: str) -> str:
+        """Clave del índice para un contexto financiero renderizado."""
+        return hashlib.sha256(financial_context.encode("utf-8")).hexdigest()
+
+    def embed(self, question: str) -> Any:
+        """Calcula el embedding normalizado de una pregunta (operación de CPU)."""
+        vector = np.asarray(self.embedder([question])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup_vector(self, context_key: str, vector: Any) -> Optional[str]:
+        """
+        Busca una respuesta para un embedding ya calculado.
+
+        Args:
+            context_key: Clave devuelta por `context_key`
+            vector: Embedding normalizado de la pregunta
+
+        Returns:
+            Respuesta cacheada o None si ninguna pregunta supera el umbral
+        """
+        index = self._indexes.get(context_key)
+        if index is not None:
+            self._indexes.move_to_end(context_key)
+            position, score = index.search(vector)
+            if score >= self.threshold:
+                self.hits += 1
+                logger.info(f"Respuesta servida desde la caché semántica (similitud {score:.3f})")
+                return index.answers[position]
+        self.misses += 1
+        return None
+
+    def store_vector(self, context_key: str, vector: Any, answer: str) -> None:
+        """Guarda la respuesta de una pregunta en el índice de su contexto."""
+        index = self._indexes.get(context_key)
+        if index is None:
+            index = _VectorIndex(len(vector), self.max_entries_per_context)
+            self._indexes[context_key] = index
+            while len(self._indexes) > self.max_contexts:
+                self._indexes.popitem(last=False)
+        else:
+            self._indexes.move_to_end(context_key)
+        index.add(vector, answer)
+
+    async def lookup(self, financial_context: str, question: str) -> Tuple[Optional[str], Any]:
+        """
+        Busca una respuesta para una pregunta parecida sobre el mismo contexto.
+
+        Args:
+            financial_context: Contexto financiero renderizado
+            question: Pregunta del usuario
+
+        Returns:
+            Tupla (respuesta o None, embedding de la pregunta para `store`)
+        """
+        vector = await asyncio.to_thread(self.embed, question)
+        return self.lookup_vector(self.context_key(financial_context), vector), vector
+
+    async def store(self, financial_context: str, vector: Any, answer: str) -> None:
+        """
+        Guarda la respuesta de Gemini usando el embedding obtenido en `lookup`.
+
+        Args:
+            financial_context: Contexto financiero renderizado
+            vector: Embedding devuelto por `lookup`
+            answer: Respuesta generada
+        """
+        self.store_vector(self.context_key(financial_context), vector, answer)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de la caché semántica."""
+        lookups = self.hits + self.misses
+        return {
+            "contexts": len(self._indexes),
+            "entries": sum(index.size for index in self._indexes.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "threshold": self.threshold,
+        }
+
+
+def create_semantic_cache_from_env() -> Optional[SemanticCache]:
+    """
+    Construye la caché semántica según las variables de entorno.
+
+    - SEMANTIC_CACHE_ENABLED: true para habilitarla (default: false)
+    - SEMANTIC_CACHE_MODEL: modelo de sentence-transformers
+      (default: paraphrase-multilingual-MiniLM-L12-v2)
+    - SEMANTIC_CACHE_THRESHOLD: similitud mínima (default: 0.9)
+    - SEMANTIC_CACHE_MAX_ENTRIES: preguntas por contexto (default: 10000)
+    - SEMANTIC_CACHE_MAX_CONTEXTS: contextos en memoria (default: 1000)
+
+    Returns:
+        SemanticCache configurada o None si está deshabilitada o faltan dependencias
+    """
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        logger.warning("SEMANTIC_CACHE_ENABLED=true pero sentence-transformers no está instalado; caché semántica deshabilitada")
+        return None
+
+    model_name = os.getenv("SEMANTIC_CACHE_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+    model = SentenceTransformer(model_name)
+
+    def embedder(texts: List[str]) -> Any:
+        return model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+
+    cache = SemanticCache(
+        embedder=embedder,
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+        max_entries_per_context=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000")),
+        max_contexts=int(os.getenv("SEMANTIC_CACHE_MAX_CONTEXTS", "1000"))
+    )
+    logger.info(f"Caché semántica habilitada con el modelo {model_name}")
+    return cache
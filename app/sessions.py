@@ -0,0 +1,195 @@
+"""
+Sesiones de conversación en memoria.
+Guarda los turnos (pregunta, respuesta) de cada sesión para que las preguntas de
+seguimiento lleguen a Gemini con el historial como contenido multi-turno. Los
+turnos antiguos se condensan en un resumen para respetar un presupuesto de tokens.
+"""
+
+import os
+import time
+import secrets
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+
+
+def _estimate_tokens(text: str) -> int:
+    """Estimación rápida de tokens (~4 caracteres por token)."""
+    return (len(text) + 3) // 4
+
+
+class _Session:
+    """Estado compacto de una sesión: turnos planos [p1, r1, p2, r2, ...] y resumen."""
+
+    __slots__ = ("owner", "turns", "summary", "tokens", "expires_at")
+
+    def __init__(self, owner: str, expires_at: float):
+        self.owner = owner
+        self.turns: List[str] = []
+        self.summary = ""
+        self.tokens = 0
+        self.expires_at = expires_at
+
+
+class SessionStore:
+    """Almacén LRU de sesiones con expiración deslizante en O(1)."""
+
+    def __init__(
+        self,
+        ttl: float = 1800,
+        max_sessions: int = 100_000,
+        history_tokens: int = 1000,
+        summary_tokens: Optional[int] = None
+    ):
+        """
+        Inicializa el almacén de sesiones.
+
+        Args:
+            ttl: Segundos de inactividad tras los que expira una sesión
+            max_sessions: Sesiones vivas como máximo (se expulsa la menos reciente)
+            history_tokens: Tokens máximos de los turnos guardados literalmente
+            summary_tokens: Tokens máximos del resumen de turnos antiguos
+                (default: un cuarto de `history_tokens`)
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens if summary_tokens is not None else history_tokens // 4
+        # Todas las sesiones comparten TTL y se mueven al final al usarse, así que
+        # el orden de inserción es también el orden de expiración
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _expire(self, now: float) -> None:
+        """Elimina las sesiones expiradas, que siempre están al principio."""
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.expires_at > now:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def _touch(self, session_id: str, session: _Session, now: float) -> None:
+        session.expires_at = now + self.ttl
+        self._sessions.move_to_end(session_id)
+
+    def open(self, session_id: Optional[str], owner: str) -> Tuple[str, bool]:
+        """
+        Obtiene una sesión existente o crea una nueva.
+
+        Args:
+            session_id: Id enviado por el cliente ("" o desconocido para empezar una nueva)
+            owner: Identificador del usuario dueño de los datos financieros; una sesión
+                de otro usuario no se reutiliza
+
+        Returns:
+            Tupla (id de la sesión, True si se creó una nueva)
+        """
+        now = time.monotonic()
+        self._expire(now)
+
+        session = self._sessions.get(session_id) if session_id else None
+        if session is not None and session.owner == owner:
+            self._touch(session_id, session, now)
+            return session_id, False
+
+        new_id = secrets.token_urlsafe(16)
+        self._sessions[new_id] = _Session(owner, now + self.ttl)
+        self.created += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+        return new_id, True
+
+    def history(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        Historial de la sesión como contenidos multi-turno de Gemini.
+
+        Args:
+            session_id: Id devuelto por `open`
+
+        Returns:
+            Lista de contenidos {"role", "parts"}: el resumen de turnos antiguos (si lo
+            hay) y los turnos recientes; vacía si la sesión no existe
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            return []
+
+        contents = []
+        if session.summary:
+            contents.append({
+                "role": "user",
+                "parts": [{"text": f"Temas tratados antes en esta conversación: {session.summary}"}]
+            })
+        for index, text in enumerate(session.turns):
+            contents.append({"role": "user" if index % 2 == 0 else "model", "parts": [{"text": text}]})
+        return contents
+
+    def append_turn(self, session_id: str, question: str, answer: str) -> None:
+        """
+        Guarda un turno y condensa los más antiguos si se excede el presupuesto.
+
+        Args:
+            session_id: Id devuelto por `open`
+            question: Pregunta del usuario
+            answer: Respuesta generada
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            return
+
+        session.turns.append(question)
+        session.turns.append(answer)
+        session.tokens += _estimate_tokens(question) + _estimate_tokens(answer)
+
+        # Los turnos que no caben se reducen a su pregunta dentro del resumen
+        while session.tokens > self.history_tokens and len(session.turns) > 2:
+            old_question = session.turns.pop(0)
+            old_answer = session.turns.pop(0)
+            session.tokens -= _estimate_tokens(old_question) + _estimate_tokens(old_answer)
+            topic = old_question if len(old_question) <= 120 else old_question[:117] + "..."
+            session.summary = f"{session.summary}; {topic}" if session.summary else topic
+
+        # Del resumen se descartan primero los temas más antiguos
+        while session.summary and _estimate_tokens(session.summary) > self.summary_tokens:
+            _, _, rest = session.summary.partition("; ")
+            session.summary = rest
+
+    def delete(self, session_id: str) -> bool:
+        """Elimina una sesión; devuelve True si existía."""
+        return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del almacén de sesiones."""
+        return {
+            "sessions": len(self._sessions),
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+def create_session_store_from_env() -> SessionStore:
+    """
+    Construye el almacén de sesiones según las variables de entorno.
+
+    - SESSION_TTL: segundos de inactividad antes de expirar (default: 1800)
+    - SESSION_MAX: sesiones en memoria como máximo (default: 100000)
+    - SESSION_HISTORY_TOKENS: presupuesto del historial literal (default: 1000)
+
+    Returns:
+        SessionStore configurado
+    """
+    store = SessionStore(
+        ttl=float(os.getenv("SESSION_TTL", "1800")),
+        max_sessions=int(os.getenv("SESSION_MAX", "100000")),
+        history_tokens=int(os.getenv("SESSION_HISTORY_TOKENS", "1000"))
+    )
+    logger.info(f"Sesiones en memoria (TTL {store.ttl:.0f}s, máx. {store.max_sessions})")
+    return store
@@ -2,7 +2,7 @@
 Utilidades auxiliares para el chatbot financiero.
 """
 
-from typing import Dict, Any
+from typing import Any
 from loguru import logger
 
 
@@ -37,26 +37,32 @@ def calculate_savings_rate(income: float, expenses: float) -> float:
     return (savings / income) * 100
 
 
-def get_top_expense_categories(expenses: Dict[str, Any], limit: int = 3) -> list:
+def get_top_expense_categories(expenses: Any, limit: int = 3) -> list:
     """
     Obtiene las categorías de gastos más altas.
     
     Args:
-        expenses: Diccionario con datos de gastos
+        expenses: Gastos del dashboard (`detalle.gastos`, modelo o diccionario con
+            `porCategoria`), o diccionario con el formato antiguo {"categories": {...}}
         limit: Número máximo de categorías a retornar
         
     Returns:
         Lista de tuplas (categoría, monto) ordenadas por monto descendente
     """
     try:
-        categories = expenses.get("categories", {})
+        if isinstance(expenses, dict):
+            por_categoria = expenses.get("porCategoria")
+            if por_categoria is None:
+                categories = expenses.get("categories", {})
+                por_categoria = [{"categoria": cat, "total": data.get("total", 0)} for cat, data in categories.items()]
+        else:
+            por_categoria = getattr(expenses, "porCategoria", [])
         category_list = [
-            (cat, data.get("total", 0))
-            for cat, data in categories.items()
+            (cat["categoria"], cat.get("total", 0)) if isinstance(cat, dict) else (cat.categoria, cat.total)
+            for cat in por_categoria
         ]
         category_list.sort(key=lambda x: x[1], reverse=True)
         return category_list[:limit]
     except Exception as e:
         logger.error(f"Error obteniendo categorías de gastos: {str(e)}")
         return []
-
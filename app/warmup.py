@@ -0,0 +1,200 @@
+"""
+Precarga de datos financieros al abrir el chat.
+El frontend llama al endpoint de warm-up cuando se abre el widget: los datos del
+dashboard se obtienen (y el contexto se prepara) en segundo plano y quedan unos
+segundos en memoria por token, de modo que la primera pregunta no espera a la
+API financiera. Si la pregunta llega antes de que termine, espera ese mismo
+warm-up en lugar de lanzar otro fetch.
+"""
+
+import os
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional
+from loguru import logger
+
+from app.cache import TTLCache
+
+
+class WarmupManager:
+    """Warm-ups en segundo plano por token, con resultado de vida corta."""
+
+    def __init__(
+        self,
+        load: Callable[[str], Awaitable[Optional[Any]]],
+        ttl: float = 30.0,
+        max_inflight: int = 100,
+        max_entries: int = 1000
+    ):
+        """
+        Inicializa el gestor de warm-ups.
+
+        Args:
+            load: Función asíncrona que obtiene y prepara los datos de un bearer token
+                (None si no se pudieron obtener)
+            ttl: Segundos que se conserva un resultado precargado
+            max_inflight: Máximo de warm-ups en curso a la vez; los demás se rechazan
+            max_entries: Máximo de resultados precargados en memoria
+        """
+        self.load = load
+        self.ttl = ttl
+        self.max_inflight = max_inflight
+        self.results = TTLCache(ttl=ttl, max_entries=max_entries)
+        self._tasks: Dict[str, "asyncio.Task[Optional[Any]]"] = {}
+        self.started = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.hits = 0
+        self.joined = 0
+
+    @staticmethod
+    def _key(bearer_token: str) -> str:
+        """Clave derivada del token (el token nunca se guarda en claro)."""
+        return hashlib.sha256(bearer_token.encode("utf-8")).hexdigest()
+
+    def start(self, bearer_token: str) -> str:
+        """
+        Lanza el warm-up de un token si no hay uno listo o en curso.
+
+        Args:
+            bearer_token: Token de autenticación Bearer
+
+        Returns:
+            "started", "pending" (ya en curso), "ready" (ya precargado) o
+            "rejected" (se alcanzó el máximo de warm-ups en curso)
+        """
+        key = self._key(bearer_token)
+        if self.results.get(key) is not None:
+            return "ready"
+        if key in self._tasks:
+            return "pending"
+        if len(self._tasks) >= self.max_inflight:
+            self.rejected += 1
+            logger.warning(f"Warm-up rechazado: {len(self._tasks)} en curso (máximo {self.max_inflight})")
+            return "rejected"
+
+        task = asyncio.create_task(self._run(key, bearer_token))
+        self._tasks[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+        self.started += 1
+        return "started"
+
+    async def _run(self, key: str, bearer_token: str) -> Optional[Any]:
+        try:
+            value = await self.load(bearer_token)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error en warm-up: {str(e)}")
+            value = None
+        if value is None:
+            self.failed += 1
+            return None
+        self.results.set(key, value)
+        return value
+
+    def _forget(self, key: str, task: "asyncio.Task[Optional[Any]]") -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def cancel(self, bearer_token: str) -> bool:
+        """
+        Cancela el warm-up de un token y descarta su resultado.
+
+        Una petición a la API que también espera otra pregunta no se interrumpe
+        (ver SingleFlight): el warm-up solo deja de esperarla.
+
+        Args:
+            bearer_token: Token de autenticación Bearer
+
+        Returns:
+            True si había un warm-up en curso o un resultado precargado
+        """
+        key = self._key(bearer_token)
+        had_result = self.results.get(key) is not None
+        self.results.delete(key)
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+            self.cancelled += 1
+        return task is not None or had_result
+
+    async def claim(self, bearer_token: str, timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        Devuelve los datos precargados de un token, esperando al warm-up si está en curso.
+
+        Args:
+            bearer_token: Token de autenticación Bearer
+            timeout: Segundos máximos de espera por un warm-up en curso (None = sin límite)
+
+        Returns:
+            Datos precargados, o None si no hay warm-up, falló, se canceló o no
+            terminó a tiempo (el llamador hace el fetch normal)
+        """
+        key = self._key(bearer_token)
+        value = self.results.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._tasks.get(key)
+        if task is None:
+            return None
+        # wait() no cancela el warm-up si esta petición se cancela o agota el plazo
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if not done or task.cancelled() or task.result() is None:
+            return None
+        self.joined += 1
+        return task.result()
+
+    async def close(self) -> None:
+        """Cancela los warm-ups en curso (al apagar la app)."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de los warm-ups."""
+        return {
+            "started": self.started,
+            "inflight": len(self._tasks),
+            "ready": len(self.results),
+            "hits": self.hits,
+            "joined": self.joined,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+        }
+
+
+def create_warmup_manager_from_env(
+    load: Callable[[str], Awaitable[Optional[Any]]]
+) -> Optional[WarmupManager]:
+    """
+    Construye el gestor de warm-ups según las variables de entorno.
+
+    - WARMUP_ENABLED: "false" para desactivarlo (default: true)
+    - WARMUP_TTL: segundos que se conserva un resultado precargado (default: 30)
+    - WARMUP_MAX_INFLIGHT: warm-ups en curso a la vez como máximo (default: 100)
+
+    Args:
+        load: Función asíncrona que obtiene y prepara los datos de un bearer token
+
+    Returns:
+        WarmupManager o None si está desactivado
+    """
+    if os.getenv("WARMUP_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    ttl = float(os.getenv("WARMUP_TTL", "30"))
+    if ttl <= 0:
+        return None
+    manager = WarmupManager(
+        load,
+        ttl=ttl,
+        max_inflight=int(os.getenv("WARMUP_MAX_INFLIGHT", "100"))
+    )
+    logger.info(f"Warm-up de datos financieros activo (TTL {manager.ttl:.0f}s, máx. {manager.max_inflight} en curso)")
+    return manager
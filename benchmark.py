@@ -0,0 +1,1519 @@
+"""
+Benchmarks del chatbot financiero contra backends simulados.
+No requiere una API key real de Gemini ni la API financiera: todo corre en local.
+
+Uso:
+    python benchmark.py                 # Ejecuta todos los benchmarks
+    python benchmark.py concurrencia    # Ejecuta solo uno
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import socket
+import asyncio
+import tempfile
+import tracemalloc
+import threading
+from types import SimpleNamespace
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+# Cada benchmark configura sus propias cachés de respuestas
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "none")
+
+import httpx
+from loguru import logger
+
+# Solo advertencias y errores en consola para no ensuciar los resultados
+logger.remove()
+logger.add(sys.stderr, level="WARNING")
+
+
+# ---------------------------------------------------------------------------
+# Backend simulado de Gemini
+# ---------------------------------------------------------------------------
+
+class FakeResponse:
+    """Respuesta mínima con la forma de GenerateContentResponse."""
+
+    def __init__(self, text: str, usage: dict = None):
+        self.text = text
+        self.candidates = []
+        self.usage_metadata = SimpleNamespace(**usage) if usage else None
+
+
+class FakeModels:
+    """Imita `client.models` (llamadas bloqueantes)."""
+
+    def __init__(self, latency: float, text: str):
+        self.latency = latency
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        return FakeResponse(self.text)
+
+
+class FakeAsyncModels:
+    """Imita `client.aio.models` (llamadas asíncronas)."""
+
+    def __init__(self, latency: float, text: str, latency_per_1k_tokens: float = 0.0, caches=None):
+        self.latency = latency
+        self.text = text
+        # Tiempo extra por cada 1000 tokens de entrada no cacheados
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.caches = caches
+        self.calls = 0
+        self.input_tokens = 0
+
+    def _input_latency(self, contents, config) -> tuple:
+        """(segundos de procesamiento de la entrada, usage) según el contenido y la caché."""
+        if not isinstance(contents, str):
+            # Conversación multi-turno: [{"role", "parts": [{"text"}]}, ...]
+            contents = "".join(part["text"] for content in contents for part in content["parts"])
+        tokens = len(contents) // 4
+        cached_tokens = 0
+        cached_name = (config or {}).get("cached_content")
+        if cached_name:
+            if self.caches is None or cached_name not in self.caches.contents:
+                raise RuntimeError(f"404 NOT_FOUND: {cached_name}")
+            cached_tokens = len(self.caches.contents[cached_name]) // 4
+        self.input_tokens += tokens
+        usage = {"prompt_token_count": tokens + cached_tokens, "cached_content_token_count": cached_tokens}
+        return self.latency_per_1k_tokens * tokens / 1000, usage
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        extra, usage = self._input_latency(contents, config)
+        await asyncio.sleep(self.latency + extra)
+        return FakeResponse(self.text, usage)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        """Reparte la latencia total entre los fragmentos (una palabra por fragmento)."""
+        self.calls += 1
+        extra, _ = self._input_latency(contents, config)
+        words = self.text.split(" ")
+
+        async def chunks():
+            await asyncio.sleep(extra)
+            for index, word in enumerate(words):
+                await asyncio.sleep(self.latency / len(words))
+                usage = None
+                if index == len(words) - 1:
+                    usage = {"prompt_token_count": 120, "candidates_token_count": len(words),
+                             "total_token_count": 120 + len(words)}
+                yield FakeResponse(word if index == 0 else " " + word, usage)
+
+        return chunks()
+
+
+class FakeQuotaModels(FakeAsyncModels):
+    """Backend que responde 429 RESOURCE_EXHAUSTED cuando se supera su capacidad simultánea."""
+
+    def __init__(self, latency: float, text: str, capacity: int):
+        super().__init__(latency, text)
+        self.capacity = capacity
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def generate_content(self, model, contents, config=None):
+        from google.genai import errors
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            await asyncio.sleep(0.005)
+            raise errors.ClientError(429, {"error": {"code": 429, "message": "Resource exhausted",
+                                                     "status": "RESOURCE_EXHAUSTED"}})
+        self.in_flight += 1
+        try:
+            return await super().generate_content(model, contents, config)
+        finally:
+            self.in_flight -= 1
+
+
+class FakeRoutedModels(FakeAsyncModels):
+    """Backend con latencia distinta por modelo; informa tokens de entrada y de salida."""
+
+    def __init__(self, latencies: dict, text: str):
+        super().__init__(0.0, text)
+        self.latencies = latencies
+        self.calls_by_model = {}
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls_by_model[model] = self.calls_by_model.get(model, 0) + 1
+        _, usage = self._input_latency(contents, config)
+        await asyncio.sleep(self.latencies[model])
+        usage["candidates_token_count"] = len(self.text) // 4
+        return FakeResponse(self.text, usage)
+
+
+class FakeAsyncCaches:
+    """Imita `client.aio.caches` (contenido cacheado con TTL)."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.contents = {}
+        self.created = 0
+        self.deleted = 0
+
+    async def create(self, model, config):
+        await asyncio.sleep(self.latency)
+        self.created += 1
+        name = f"cachedContents/fake-{self.created}"
+        self.contents[name] = config["contents"]
+        return SimpleNamespace(name=name)
+
+    async def delete(self, name, config=None):
+        if self.contents.pop(name, None) is None:
+            raise RuntimeError(f"404 NOT_FOUND: {name}")
+        self.deleted += 1
+
+
+class FakeGenaiClient:
+    """Sustituto de `genai.Client` con latencia configurable."""
+
+    def __init__(self, latency: float = 0.2, text: str = "Respuesta simulada.", latency_per_1k_tokens: float = 0.0):
+        caches = FakeAsyncCaches()
+        self.models = FakeModels(latency, text)
+        self.aio = SimpleNamespace(
+            models=FakeAsyncModels(latency, text, latency_per_1k_tokens, caches),
+            caches=caches
+        )
+
+
+def load_test_data():
+    """Carga los datos de prueba desde test_data.json"""
+    with open("test_data.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def make_payload(transactions: int, members: int = 5, seed: int = 7) -> dict:
+    """
+    Genera un dashboard sintético con el formato {success, data}.
+    Las transacciones se reparten 20% ingresos, 70% gastos y 10% extras.
+    """
+    rng = random.Random(seed)
+    categorias = ["Alimentación", "Transporte", "Vivienda", "Ocio", "Salud", "Servicios", "Educación"]
+
+    def fecha(i):
+        return f"2025-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}T10:00:00.000Z"
+
+    n_ing = transactions * 2 // 10
+    n_ext = transactions // 10
+    n_gas = transactions - n_ing - n_ext
+    ingresos = [{"monto": round(rng.uniform(500, 20000), 2), "descripcion": f"Ingreso {i}",
+                 "categoria": "Salario", "fecha": fecha(i)} for i in range(n_ing)]
+    gastos = [{"monto": round(rng.uniform(10, 3000), 2), "descripcion": f"Gasto {i}",
+               "categoria": rng.choice(categorias), "fecha": fecha(i)} for i in range(n_gas)]
+    extras = [{"monto": round(rng.uniform(50, 2000), 2), "descripcion": f"Extra {i}",
+               "fecha": fecha(i)} for i in range(n_ext)]
+
+    por_categoria = {}
+    for gasto in gastos:
+        por_categoria[gasto["categoria"]] = por_categoria.get(gasto["categoria"], 0) + gasto["monto"]
+
+    total_ing = sum(t["monto"] for t in ingresos)
+    total_gas = sum(t["monto"] for t in gastos)
+    total_ext = sum(t["monto"] for t in extras)
+    miembros = [{"id": i, "nombre": f"Miembro {i}", "rol": rng.choice(["Administrador", "Miembro", "Invitado"]),
+                 "saldoActual": round(rng.lognormvariate(8, 1), 2)} for i in range(members)]
+    return {
+        "success": True,
+        "data": {
+            "usuario": {"id": 1, "nombre": "Usuario Sintético", "saldoActual": 15000},
+            "resumen": {"totalIngresos": total_ing, "totalExtras": total_ext, "totalGastos": total_gas,
+                        "saldoActual": 15000, "ahorroTotal": 5000, "porcentajeAhorro": 12.5,
+                        "balanceNeto": total_ing + total_ext - total_gas},
+            "detalle": {
+                "ingresos": {"total": total_ing, "transacciones": ingresos},
+                "gastos": {"total": total_gas, "transacciones": gastos,
+                           "porCategoria": [{"categoria": c, "total": t} for c, t in por_categoria.items()]},
+                "extras": {"total": total_ext, "transacciones": extras},
+                "ahorros": {"total": 5000, "objetivos": [
+                    {"objetivo": "Fondo de emergencia", "montoAhorrado": 3000, "montoMeta": 10000, "progreso": 30},
+                    {"objetivo": "Vacaciones", "montoAhorrado": 2000, "montoMeta": 4000, "progreso": 50},
+                ]},
+            },
+            "alertas": [{"tipo": "gasto", "mensaje": "Tus gastos en Ocio subieron", "severidad": "media"}],
+            "organizacion": {
+                "id": 1, "nombre": "Familia", "rolUsuario": "Administrador", "miembros": miembros,
+                "resumen": {"totalMiembros": members, "saldoTotal": sum(m["saldoActual"] for m in miembros),
+                            "ahorroTotal": 8000, "ingresosMes": 40000, "gastosMes": 30000,
+                            "balanceNeto": 10000, "porcentajeAhorro": 20},
+                "analisis": {"gastosPorCategoria": [], "topGastadores": []},
+            },
+        },
+    }
+
+
+def time_per_call(fn, budget: float = 1.0) -> float:
+    """Tiempo medio por llamada en milisegundos, repitiendo hasta agotar `budget` segundos."""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget:
+            return elapsed / calls * 1000
+
+
+def load_app(fake_client):
+    """Importa la app FastAPI y reemplaza el SDK de Gemini por el backend simulado."""
+    from app import main
+    main.gemini_client.client = fake_client
+    # Los benchmarks miden el camino hacia Gemini; respuestas_locales lo activa aparte
+    main.local_answers = None
+    return main
+
+
+class StubServer:
+    """Levanta una app ASGI en un hilo con uvicorn para simular servicios externos."""
+
+    def __init__(self, app):
+        import uvicorn
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def dashboard_stub(body: bytes, stats: dict = None, latency: float = 0.0):
+    """
+    App ASGI que responde /api/dashboard/all con `body`.
+    Si se pasa `stats`, registra peticiones ("requests") y conexiones ("connections").
+    """
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        if stats is not None:
+            stats["requests"] = stats.get("requests", 0) + 1
+            stats.setdefault("connections", set()).add(scope["client"])
+        if latency:
+            await asyncio.sleep(latency)
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+def gemini_stub(rng: random.Random, stats: dict, slow: float = 0.05, hang: float = 0.03,
+                errors: float = 0.03, slow_latency: float = 1.0, hang_latency: float = 3.0):
+    """
+    App ASGI que imita el endpoint generateContent de Gemini inyectando latencia:
+    la mayoría responde en 50-100ms, una fracción `slow` tarda `slow_latency`,
+    otra `hang` se queda colgada `hang_latency` y otra `errors` responde 500.
+    """
+    ok_body = json.dumps({"candidates": [{"content": {"role": "model", "parts": [{"text": "Respuesta simulada."}]}}]}).encode()
+    error_body = json.dumps({"error": {"code": 500, "message": "Internal error.", "status": "INTERNAL"}}).encode()
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        while (await receive()).get("more_body"):
+            pass
+        stats["requests"] = stats.get("requests", 0) + 1
+        roll = rng.random()
+        status, body = 200, ok_body
+        if roll < errors:
+            status, body = 500, error_body
+            await asyncio.sleep(0.02)
+        elif roll < errors + hang:
+            await asyncio.sleep(hang_latency)
+        elif roll < errors + hang + slow:
+            await asyncio.sleep(slow_latency)
+        else:
+            await asyncio.sleep(rng.uniform(0.05, 0.1))
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    return app
+
+
+def percentile(values, pct: float) -> float:
+    """Percentil simple (sin interpolación) en milisegundos."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index] * 1000
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+async def bench_concurrencia(n: int = 20, latency: float = 0.2):
+    """N chats concurrentes en un solo worker deben tardar ~ lo que el más lento."""
+    print(f"\n⏱️  Concurrencia: {n} chats simultáneos, latencia simulada {latency:.2f}s")
+    fake = FakeGenaiClient(latency=latency)
+    main = load_app(fake)
+    payload = {"question": "¿Cómo puedo ahorrar más?", "financial_data": load_test_data()}
+
+    # Antes: llamada bloqueante dentro de corrutinas (como hacían los endpoints)
+    async def blocking_call():
+        return main.gemini_client.generate_response("prompt")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(blocking_call() for _ in range(n)))
+    blocking_elapsed = time.perf_counter() - start
+
+    # Ahora: endpoint /api/chat usando el camino asíncrono
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *(client.post("/api/chat", json=payload) for _ in range(n))
+        )
+        async_elapsed = time.perf_counter() - start
+
+    ok = sum(1 for r in responses if r.status_code == 200)
+    print(f"   Bloqueante: {blocking_elapsed:.2f}s (suma ≈ {n * latency:.2f}s)")
+    print(f"   Asíncrono:  {async_elapsed:.2f}s ({ok}/{n} respuestas 200)")
+    print(f"   Aceleración: x{blocking_elapsed / async_elapsed:.1f}")
+
+
+async def bench_pool(requests: int = 300):
+    """Latencia p50/p99 de fetch_financial_data_from_api con y sin pool de conexiones."""
+    from app.data_handler import DataHandler
+
+    print(f"\n🔌 Pool HTTP: {requests} fetches secuenciales contra un stub local")
+    body = json.dumps(load_test_data()).encode()
+
+    for label, pooled in (("Sin pool", False), ("Con pool", True)):
+        stats = {}
+        with StubServer(dashboard_stub(body, stats)) as stub:
+            handler = DataHandler(api_base_url=stub.url, cache_ttl=0)
+            if pooled:
+                await handler.open()
+            timings = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                data = await handler.fetch_financial_data_from_api("token")
+                timings.append(time.perf_counter() - start)
+                assert data is not None
+            await handler.close()
+        print(
+            f"   {label}: p50 {percentile(timings, 50):.2f}ms, "
+            f"p99 {percentile(timings, 99):.2f}ms, conexiones TCP: {len(stats['connections'])}"
+        )
+
+
+async def bench_cache_dashboard(concurrent: int = 50, sequential: int = 200, latency: float = 0.05):
+    """Caché por token: fetches concurrentes coalescidos y preguntas seguidas sin fetch."""
+    from app.data_handler import DataHandler
+
+    print(f"\n🗃️  Caché de dashboard: {concurrent} misses concurrentes + {sequential} preguntas seguidas")
+    body = json.dumps(load_test_data()).encode()
+    stats = {}
+    with StubServer(dashboard_stub(body, stats, latency=latency)) as stub:
+        handler = DataHandler(api_base_url=stub.url, cache_ttl=60)
+        await handler.open()
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(handler.fetch_financial_data_from_api("token-a") for _ in range(concurrent))
+        )
+        burst = time.perf_counter() - start
+        upstream_after_burst = stats["requests"]
+
+        timings = []
+        for _ in range(sequential):
+            start = time.perf_counter()
+            await handler.fetch_financial_data_from_api("token-a")
+            timings.append(time.perf_counter() - start)
+        await handler.close()
+
+    print(f"   Ráfaga: {burst * 1000:.1f}ms, peticiones upstream: {upstream_after_burst}")
+    print(f"   Hits: p50 {percentile(timings, 50):.4f}ms, peticiones upstream totales: {stats['requests']}")
+    print(f"   Métricas: {handler.cache_stats()}")
+
+
+async def bench_streaming(latency: float = 1.0):
+    """Time-to-first-byte de /api/chat/stream frente a /api/chat con un backend que transmite."""
+    text = " ".join(f"palabra{i}" for i in range(40))
+    print(f"\n📡 Streaming SSE: {len(text.split())} fragmentos, generación total {latency:.1f}s")
+    main = load_app(FakeGenaiClient(latency=latency, text=text))
+    payload = {"question": "¿Cómo puedo ahorrar más?", "financial_data": load_test_data()}
+
+    with StubServer(main.app) as server:
+        async with httpx.AsyncClient(base_url=server.url, timeout=30) as client:
+            start = time.perf_counter()
+            response = await client.post("/api/chat", json=payload)
+            blocking_ttfb = time.perf_counter() - start
+            assert response.status_code == 200
+
+            start = time.perf_counter()
+            first_chunk = None
+            events = []
+            async with client.stream("POST", "/api/chat/stream", json=payload) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("event: "):
+                        events.append(line[len("event: "):])
+                        if first_chunk is None and events[-1] == "chunk":
+                            first_chunk = time.perf_counter() - start
+                    elif line.startswith("data: ") and events and events[-1] == "done":
+                        usage = json.loads(line[len("data: "):])["usage"]
+            stream_total = time.perf_counter() - start
+
+    print(f"   /api/chat:        primer byte a los {blocking_ttfb * 1000:.0f}ms")
+    print(f"   /api/chat/stream: primer fragmento a los {first_chunk * 1000:.0f}ms, "
+          f"completo a los {stream_total * 1000:.0f}ms")
+    print(f"   Eventos: {events.count('chunk')} chunk + {events[-1]}, uso: {usage}")
+
+
+async def bench_cache_respuestas(requests: int = 200, latency: float = 0.3):
+    """Preguntas repetidas sobre el mismo snapshot: miss vs hit por backend."""
+    from app.gemini_client import GeminiClient
+    from app.prompt_builder import PromptBuilder
+    from app.response_cache import ResponseCache, MemoryResponseBackend, SQLiteResponseBackend
+
+    print(f"\n💾 Caché de respuestas: {requests} preguntas repetidas, latencia de Gemini {latency:.1f}s")
+    data = load_test_data()["data"]
+    prompt = PromptBuilder.build_prompt(data, "¿Cómo puedo ahorrar más?")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {
+            "memory": MemoryResponseBackend(ttl=3600, max_entries=1000),
+            "sqlite": SQLiteResponseBackend(os.path.join(tmp, "respuestas.sqlite3"), ttl=3600, max_entries=1000),
+        }
+        for name, backend in backends.items():
+            fake = FakeGenaiClient(latency=latency)
+            client = GeminiClient(client=fake, response_cache=ResponseCache(backend))
+
+            start = time.perf_counter()
+            await client.generate_response_async(prompt)
+            miss = time.perf_counter() - start
+
+            timings = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                await client.generate_response_async(prompt)
+                timings.append(time.perf_counter() - start)
+
+            print(f"   {name}: miss {miss * 1000:.0f}ms, hit p50 {percentile(timings, 50):.3f}ms, "
+                  f"p99 {percentile(timings, 99):.3f}ms, llamadas a Gemini: {fake.aio.models.calls}")
+        backends["sqlite"].close()
+
+
+def hashing_embedder(texts, dim: int = 384):
+    """Embedder local de bolsa de palabras con hashing (sustituye a sentence-transformers)."""
+    import numpy as np
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            digest = zlib.crc32(word.encode())
+            matrix[row, digest % dim] += 1.0 if digest & 1 else -1.0
+    return matrix
+
+
+async def bench_cache_semantica(sizes=(10_000, 50_000), queries: int = 2000, threshold: float = 0.8):
+    """Tasa de aciertos y latencia de búsqueda de la caché semántica con índices grandes."""
+    import numpy as np
+    from app.semantic_cache import SemanticCache
+
+    print(f"\n🧠 Caché semántica: embedder de hashing local (sin descargar modelos), umbral {threshold}")
+
+    rng = random.Random(42)
+    vocab = [f"termino{i}" for i in range(500)]
+    fillers = ["por", "favor", "dinero", "mas"]
+
+    for size in sizes:
+        cache = SemanticCache(embedder=hashing_embedder, threshold=threshold, max_entries_per_context=size)
+        context = cache.context_key("contexto financiero")
+        stored = [rng.sample(vocab, 6) for _ in range(size)]
+        vectors = hashing_embedder([" ".join(words) for words in stored])
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        for vector, words in zip(vectors, stored):
+            cache.store_vector(context, vector, " ".join(words))
+
+        # Mitad paráfrasis (mismas palabras reordenadas + relleno) y mitad preguntas nuevas
+        expected_hits = 0
+        timings = []
+        for i in range(queries):
+            if i % 2 == 0:
+                words = rng.choice(stored)[:]
+                rng.shuffle(words)
+                words.append(rng.choice(fillers))
+                expected_hits += 1
+            else:
+                words = rng.sample(vocab, 6)
+            start = time.perf_counter()
+            cache.lookup_vector(context, cache.embed(" ".join(words)))
+            timings.append(time.perf_counter() - start)
+
+        stats = cache.stats()
+        print(f"   {size:>6} entradas: hit rate {stats['hit_rate']:.1%} (paráfrasis {expected_hits}/{queries}), "
+              f"búsqueda p50 {percentile(timings, 50):.2f}ms, p99 {percentile(timings, 99):.2f}ms")
+
+
+async def bench_validacion(sizes=(10, 1_000, 100_000)):
+    """Validación + prompt: camino de diccionarios (model_dump) vs TypeAdapter sobre bytes."""
+    from app.data_handler import DataHandler
+    from app.prompt_builder import PromptBuilder
+
+    print("\n✅ Validación: json.loads + validate_and_process vs parse_financial_data(bytes)")
+    handler = DataHandler()
+    for size in sizes:
+        raw = json.dumps(make_payload(size)).encode()
+        question = "¿En qué gasto más?"
+
+        def legacy():
+            data = handler.validate_and_process(json.loads(raw))
+            PromptBuilder.build_prompt(data, question)
+
+        def typed():
+            data = handler.parse_financial_data(raw)
+            PromptBuilder.build_prompt(data, question)
+
+        legacy_ms = time_per_call(legacy)
+        typed_ms = time_per_call(typed)
+        print(f"   {size:>7} transacciones ({len(raw) / 1024:,.0f} KB): "
+              f"dict {legacy_ms:.2f}ms, tipado {typed_ms:.2f}ms (x{legacy_ms / typed_ms:.1f})")
+
+
+def cpu_and_peak(fn, repeat: int = 5):
+    """(CPU en ms por llamada, pico de memoria asignada en KB) de `fn`."""
+    fn()  # Calentamiento
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    cpu_ms = (time.process_time() - start) / repeat * 1000
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_ms, peak / 1024
+
+
+async def bench_ingesta(sizes=(1_000, 10_000, 100_000)):
+    """Body de /api/chat: parseo de FastAPI a dict + validación vs validación directa de bytes."""
+    from app.data_handler import DataHandler
+    from app.main import ChatRequest, ChatPayload
+
+    print("\n📥 Ingesta de /api/chat: CPU y pico de asignaciones por petición")
+    handler = DataHandler()
+    for size in sizes:
+        body = json.dumps({"question": "¿En qué gasto más?", "financial_data": make_payload(size)}).encode()
+
+        def dict_path():
+            request = ChatRequest.model_validate(json.loads(body))
+            handler.parse_financial_data(request.financial_data)
+
+        def raw_path():
+            ChatPayload.model_validate_json(body)
+
+        dict_cpu, dict_peak = cpu_and_peak(dict_path)
+        raw_cpu, raw_peak = cpu_and_peak(raw_path)
+        print(f"   {size:>7} transacciones ({len(body) / 1024:,.0f} KB): "
+              f"dict {dict_cpu:.1f}ms / {dict_peak:,.0f} KB, "
+              f"bytes {raw_cpu:.1f}ms / {raw_peak:,.0f} KB "
+              f"(CPU -{(1 - raw_cpu / dict_cpu):.0%}, memoria -{(1 - raw_peak / dict_peak):.0%})")
+
+
+async def bench_presupuesto(sizes=(10, 1_000, 100_000), budgets=(300, 800)):
+    """Tokens y tiempo de construcción del contexto: límites fijos vs presupuesto."""
+    from app.data_handler import DataHandler
+    from app.prompt_builder import PromptBuilder
+
+    print("\n🎯 Contexto con presupuesto de tokens (estimación ~4 caracteres/token)")
+    handler = DataHandler()
+    for size in sizes:
+        data = handler.parse_financial_data(json.dumps(make_payload(size, members=50)).encode())
+        fixed = PromptBuilder.build_financial_context(data)
+        results = [f"fijo {PromptBuilder.estimate_tokens(fixed)} tokens "
+                   f"({time_per_call(lambda: PromptBuilder.build_financial_context(data), 0.3):.2f}ms)"]
+        for budget in budgets:
+            context = PromptBuilder.build_budgeted_context(data, budget)
+            elapsed = time_per_call(lambda: PromptBuilder.build_budgeted_context(data, budget), 0.3)
+            results.append(f"presupuesto {budget}: {PromptBuilder.estimate_tokens(context)} tokens ({elapsed:.2f}ms)")
+        print(f"   {size:>7} transacciones: " + ", ".join(results))
+
+
+async def bench_cache_contexto(sizes=(1_000, 100_000), budget: int = 800):
+    """Construcción del contexto sin caché, en preguntas de seguimiento y tras un gasto nuevo."""
+    from app.data_handler import DataHandler
+    from app.prompt_builder import PromptBuilder
+
+    print(f"\n🧩 Caché de secciones del contexto (presupuesto {budget} tokens)")
+    handler = DataHandler()
+    for size in sizes:
+        payload = make_payload(size, members=50)
+        data = handler.parse_financial_data(json.dumps(payload).encode())
+        gastos = payload["data"]["detalle"]["gastos"]["transacciones"]
+        gastos.append(dict(gastos[0], descripcion="Gasto nuevo"))
+        updated = handler.parse_financial_data(json.dumps(payload).encode())
+
+        cold = time_per_call(lambda: PromptBuilder.build_budgeted_context(data, budget), 0.5)
+        builder = PromptBuilder(token_budget=budget, cache_entries=1000)
+        start = time.perf_counter()
+        builder.build_context(data)
+        first = (time.perf_counter() - start) * 1000
+        follow_up = time_per_call(lambda: builder.build_context(data), 0.3)
+        start = time.perf_counter()
+        builder.build_context(updated)
+        changed = (time.perf_counter() - start) * 1000
+
+        fixed_builder = PromptBuilder(cache_entries=1000)
+        fixed_cold = time_per_call(lambda: PromptBuilder.build_financial_context(data), 0.3)
+        fixed_builder.build_context(data)
+        fixed_follow_up = time_per_call(lambda: fixed_builder.build_context(data), 0.3)
+        # Con un gasto nuevo solo deberían volver a renderizarse gastos y análisis
+        misses = fixed_builder.context_cache.misses
+        start = time.perf_counter()
+        fixed_builder.build_context(updated)
+        fixed_changed = (time.perf_counter() - start) * 1000
+        rerendered = fixed_builder.context_cache.misses - misses
+        print(f"   {size:>7} transacciones: presupuesto sin caché {cold:.1f}ms, primera {first:.1f}ms, "
+              f"seguimiento {follow_up:.2f}ms, con un gasto nuevo {changed:.1f}ms | "
+              f"fijo {fixed_cold:.3f}ms -> {fixed_follow_up:.3f}ms, con un gasto nuevo {fixed_changed:.1f}ms "
+              f"({rerendered} de {len(PromptBuilder.SECTIONS)} secciones renderizadas)")
+
+
+async def bench_cache_contexto_gemini(questions: int = 10, budget: int = 6000):
+    """Preguntas de seguimiento con y sin contexto cacheado en Gemini, y ciclo de vida de la caché."""
+    from app.data_handler import DataHandler
+    from app.gemini_cache import CachedContentManager
+    from app.gemini_client import GeminiClient
+    from app.prompt_builder import PromptBuilder
+
+    print(f"\n🗄️  Contexto cacheado en Gemini ({questions} preguntas de seguimiento, backend con 0.2s + 0.1s/1k tokens)")
+    data = DataHandler().parse_financial_data(json.dumps(make_payload(10_000, members=50)).encode())
+    context = PromptBuilder(token_budget=budget).build_context(data)
+    prefix = PromptBuilder.build_prompt_prefix(context)
+    prompts = [PromptBuilder.build_prompt_from_context(context, f"Pregunta de seguimiento {i}")
+               for i in range(questions)]
+    print(f"   Prefijo (sistema + contexto): ~{PromptBuilder.estimate_tokens(prefix)} tokens")
+
+    for label, manager in (("sin caché", None), ("con caché", CachedContentManager(ttl=600, min_tokens=1024))):
+        fake = FakeGenaiClient(latency=0.2, latency_per_1k_tokens=0.1)
+        client = GeminiClient(client=fake, context_cache=manager)
+        latencies = []
+        for prompt in prompts:
+            start = time.perf_counter()
+            await client.generate_response_async(prompt, cacheable_prefix=prefix)
+            latencies.append(time.perf_counter() - start)
+        print(f"   {label}: primera {latencies[0] * 1000:.0f}ms, siguientes p50 {percentile(latencies[1:], 50):.0f}ms, "
+              f"tokens de entrada enviados {fake.aio.models.input_tokens:,}, contenidos creados {fake.aio.caches.created}")
+
+    # Ciclo de vida: expulsión por inactividad y contenido que expiró en Gemini
+    fake = FakeGenaiClient(latency=0.01)
+    manager = CachedContentManager(ttl=600, idle_timeout=0.05, min_tokens=1024)
+    client = GeminiClient(client=fake, context_cache=manager)
+    await client.generate_response_async(prompts[0], cacheable_prefix=prefix)
+    await asyncio.sleep(0.1)
+    evicted = await manager.evict_idle()
+    print(f"   Inactivos expulsados: {evicted} (borrados en Gemini: {fake.aio.caches.deleted})")
+    await client.generate_response_async(prompts[1], cacheable_prefix=prefix)
+    fake.aio.caches.contents.clear()  # Gemini lo expiró por su cuenta
+    answer = await client.generate_response_async(prompts[2], cacheable_prefix=prefix)
+    print(f"   Contenido desaparecido en Gemini: respuesta {'obtenida' if answer else 'perdida'} con el prompt completo")
+    await client.close()
+
+
+async def bench_sesiones(sessions: int = 100_000, turns: int = 3):
+    """Memoria por sesión, coste por turno y expiración con 100k sesiones vivas."""
+    from app.sessions import SessionStore
+
+    print(f"\n💬 Sesiones: {sessions:,} sesiones con {turns} turnos cada una")
+    questions = [f"¿Cuánto gasté en la categoría {i}?" for i in range(50)]
+    answer = "Este mes gastaste $1,234.56 en esa categoría, un 12% más que el mes anterior."
+
+    store = SessionStore(ttl=1800, max_sessions=sessions, history_tokens=1000)
+    tracemalloc.start()
+    start = time.perf_counter()
+    ids = []
+    for i in range(sessions):
+        session_id, _ = store.open("", f"usuario-{i}")
+        for turn in range(turns):
+            # Textos distintos por sesión para medir la memoria real de los turnos
+            store.append_turn(session_id, f"{questions[(i + turn) % len(questions)]} ({i})", f"{answer} ({i})")
+        ids.append(session_id)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   Carga: {elapsed:.2f}s, {current / sessions:,.0f} bytes por sesión "
+          f"(~{current / 1024 / 1024:,.0f} MB en total, con los textos de los turnos)")
+
+    rng = random.Random(3)
+    sample = [rng.randrange(sessions) for _ in range(20_000)]
+    start = time.perf_counter()
+    for i in sample:
+        session_id, _ = store.open(ids[i], f"usuario-{i}")
+        store.history(session_id)
+        store.append_turn(session_id, questions[i % len(questions)], answer)
+    per_turn = (time.perf_counter() - start) / len(sample) * 1e6
+    print(f"   Turno de seguimiento (abrir + historial + guardar): {per_turn:.1f}µs")
+
+    # Expiración: todas vencen a la vez y se limpian en la siguiente petición
+    for session in store._sessions.values():
+        session.expires_at = 0.0
+    start = time.perf_counter()
+    store.open("", "nuevo")
+    sweep = (time.perf_counter() - start) * 1000
+    print(f"   Expirar {store.expired:,} sesiones: {sweep:.1f}ms (≈{sweep * 1000 / max(store.expired, 1):.2f}µs por sesión); "
+          f"vivas: {len(store)}")
+
+
+async def bench_lote(latency: float = 0.2, transactions: int = 5_000):
+    """Tarjeta de reporte con las preguntas estándar: N llamadas a /api/chat vs una a /api/chat/batch."""
+    questions = [question for question, _ in INTENT_EVAL_SET[:8]]
+    print(f"\n📦 Lote: {len(questions)} preguntas por usuario, latencia simulada {latency:.2f}s, "
+          f"{transactions:,} transacciones")
+    fake = FakeGenaiClient(latency=latency)
+    main = load_app(fake)
+    financial_data = make_payload(transactions)
+    body = json.dumps({"questions": questions, "financial_data": financial_data}).encode()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for question in questions:
+            await client.post("/api/chat", content=json.dumps(
+                {"question": question, "financial_data": financial_data}).encode())
+        sequential = time.perf_counter() - start
+
+        calls_before = fake.aio.models.calls
+        start = time.perf_counter()
+        response = await client.post("/api/chat/batch", content=body)
+        batch = time.perf_counter() - start
+
+    results = response.json()["results"]
+    ok = sum(result["success"] for result in results)
+    print(f"   /api/chat x{len(questions)} (secuencial): {sequential:.2f}s, {len(questions)} validaciones")
+    print(f"   /api/chat/batch: {batch:.2f}s, 1 validación, {fake.aio.models.calls - calls_before} llamadas "
+          f"a Gemini con concurrencia {main.batch_concurrency} ({ok}/{len(results)} respondidas)")
+
+
+async def bench_gobernador(capacity: int = 8, batch: int = 150, interactive: int = 40, latency: float = 0.1):
+    """Pico de tráfico contra una cuota de Gemini: semáforo fijo vs gobernador AIMD con prioridad."""
+    from app.gemini_client import GeminiClient
+    from app.governor import GeminiGovernor, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+    print(f"\n🚦 Gobernador: {batch} llamadas de lote + {interactive} interactivas, "
+          f"Gemini acepta {capacity} simultáneas, latencia simulada {latency:.2f}s")
+
+    async def scenario(name, governor, batch_priority):
+        models = FakeQuotaModels(latency, "Respuesta simulada.", capacity)
+        client = GeminiClient(client=SimpleNamespace(aio=SimpleNamespace(models=models)), governor=governor)
+        latencies = {"lote": [], "interactiva": []}
+        failures = {"lote": 0, "interactiva": 0}
+
+        async def call(kind, priority, delay):
+            await asyncio.sleep(delay)
+            start = time.perf_counter()
+            answer = await client.generate_response_async(f"{kind} {random.random()}", priority=priority)
+            if answer:
+                latencies[kind].append(time.perf_counter() - start)
+            else:
+                failures[kind] += 1
+
+        start = time.perf_counter()
+        # El lote llega primero y las preguntas interactivas van llegando mientras se procesa
+        await asyncio.gather(
+            *(call("lote", batch_priority, 0) for _ in range(batch)),
+            *(call("interactiva", PRIORITY_INTERACTIVE, 0.02 * (i + 1)) for i in range(interactive))
+        )
+        total = time.perf_counter() - start
+        interactive_ms = latencies["interactiva"]
+        p95 = f"{percentile(interactive_ms, 95):.0f}ms" if interactive_ms else "-"
+        print(f"   {name}: {total:.2f}s; fallidas lote {failures['lote']}/{batch}, "
+              f"interactivas {failures['interactiva']}/{interactive}; 429 recibidos {models.rejected}; "
+              f"p95 interactivas {p95}")
+        return governor
+
+    # Los 429 simulados generan cientos de líneas de log; solo interesan los resultados
+    logger.disable("app")
+    # Comportamiento anterior: 32 llamadas simultáneas fijas y sin prioridad
+    await scenario("Semáforo fijo (32)", GeminiGovernor(max_concurrency=32, decrease_factor=1.0),
+                   PRIORITY_INTERACTIVE)
+    governor = await scenario("Gobernador AIMD + prioridad", GeminiGovernor(max_concurrency=32), PRIORITY_BATCH)
+    stats = governor.stats()
+    waits = ", ".join(f"{name} p95 {wait['p95_wait_ms']:.0f}ms" for name, wait in stats["queue_wait"].items())
+    print(f"   Límite final {stats['concurrency_limit']}, reducciones {stats['decreases']}; espera en cola: {waits}")
+    logger.enable("app")
+
+    governor = GeminiGovernor(max_concurrency=32, requests_per_minute=600)
+    client = GeminiClient(client=FakeGenaiClient(latency=0.01), governor=governor)
+    start = time.perf_counter()
+    await asyncio.gather(*(client.generate_response_async(f"rpm {i}") for i in range(100)))
+    elapsed = time.perf_counter() - start
+    burst = governor.request_limiter.capacity
+    print(f"   GEMINI_RPM=600: 100 llamadas en {elapsed:.2f}s (ráfaga inicial de {burst:.0f}, "
+          f"después {(100 - burst) / elapsed:.1f}/s; el límite es 10/s)")
+
+
+async def bench_resiliencia(requests: int = 300, concurrency: int = 20, deadline: float = 2.0):
+    """Plazos, reintentos con jitter y peticiones de cobertura contra un servidor Gemini local con latencia inyectada."""
+    from google import genai
+    from app.gemini_client import GeminiClient
+    from app.resilience import Hedger, RetryPolicy
+
+    print(f"\n🛡️  Resiliencia: {requests} llamadas ({concurrency} a la vez) contra un Gemini local con 5% lentas (1s), "
+          f"3% colgadas (3s) y 3% con error 500")
+
+    async def scenario(name, retry_policy, hedger, request_timeout):
+        stats = {}
+        with StubServer(gemini_stub(random.Random(11), stats)) as stub:
+            sdk = genai.Client(api_key="benchmark-fake-key", http_options={"base_url": stub.url})
+            client = GeminiClient(client=sdk, retry_policy=retry_policy, hedger=hedger)
+            client.request_timeout = request_timeout
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def call(i):
+                async with semaphore:
+                    start = time.perf_counter()
+                    answer = await client.generate_response_async(f"pregunta {i}")
+                    return answer is not None, time.perf_counter() - start
+
+            # Calentamiento: el hedger necesita latencias observadas para fijar su p95
+            await asyncio.gather(*(call(i) for i in range(60)))
+            sent_before = stats["requests"]
+            results = await asyncio.gather(*(call(i) for i in range(requests)))
+            sent = stats["requests"] - sent_before
+        latencies = [elapsed for _, elapsed in results]
+        ok = sum(success for success, _ in results)
+        extra = f", cobertura tras {hedger.threshold * 1000:.0f}ms ({hedger.hedged} lanzadas, {hedger.hedge_wins} ganaron)" \
+            if hedger is not None and hedger.threshold else ""
+        print(f"   {name}: {ok}/{requests} ok, p50 {percentile(latencies, 50):.0f}ms, p99 {percentile(latencies, 99):.0f}ms, "
+              f"máx {max(latencies) * 1000:.0f}ms; {sent} llamadas a Gemini{extra}")
+
+    logger.disable("app")
+    await scenario("Sin plazo, reintentos ni cobertura", RetryPolicy(max_retries=0), None, None)
+    await scenario(f"Plazo {deadline:.0f}s + reintentos", RetryPolicy(max_retries=2, base_delay=0.1), None, deadline)
+    await scenario(f"Plazo {deadline:.0f}s + reintentos + cobertura p95",
+                   RetryPolicy(max_retries=2, base_delay=0.1), Hedger(), deadline)
+    logger.enable("app")
+
+
+# Preguntas etiquetadas con la ruta esperada (distintas de los ejemplos de entrenamiento)
+ROUTER_EVAL_SET = [
+    ("¿Cuál es mi saldo actual?", "fast"),
+    ("¿Cuánto dinero tengo disponible?", "fast"),
+    ("¿Cuánto gané este mes con mi salario?", "fast"),
+    ("¿Qué alertas tengo activas?", "fast"),
+    ("¿Cuál fue mi gasto más grande?", "fast"),
+    ("¿Cuántos miembros tiene mi organización?", "fast"),
+    ("¿Cuánto he recibido en bonos?", "fast"),
+    ("¿En qué categoría gasto más?", "fast"),
+    ("¿Quién ha gastado más en la familia este mes?", "fast"),
+    ("¿Cuánto llevo ahorrado para el viaje?", "fast"),
+    ("¿Qué gastos hormiga tengo?", "fast"),
+    ("Total de ingresos del mes", "fast"),
+    ("¿Cómo puedo alcanzar mis objetivos de ahorro más rápido?", "strong"),
+    ("¿Cómo está mi salud financiera?", "strong"),
+    ("¿Me alcanza para comprar un auto?", "strong"),
+    ("¿Qué me recomiendas?", "strong"),
+    ("Dame un resumen de mis finanzas", "strong"),
+    ("Quiero reducir gastos, ¿por dónde empiezo?", "strong"),
+    ("Necesito juntar 10000 para diciembre, ¿es posible?", "strong"),
+    ("Arma un presupuesto mensual con mis ingresos actuales", "strong"),
+    ("¿Vale la pena adelantar pagos de la tarjeta?", "strong"),
+    ("¿Debería preocuparme por algún riesgo?", "strong"),
+    ("¿Voy bien con mis ahorros este año?", "strong"),
+    ("Si dejo de salir a comer, ¿cuánto ahorraría en un año?", "strong"),
+]
+
+
+async def bench_enrutador(repeat: int = 5):
+    """Precisión y coste del enrutador de modelos, y latencia/tokens por ruta a través de /api/chat."""
+    from app.model_router import ModelRouter
+
+    latencies = {"gemini-2.0-flash-lite": 0.15, "gemini-2.0-flash": 0.3, "gemini-2.5-pro": 1.2}
+    print(f"\n🧭 Enrutador de modelos: {len(ROUTER_EVAL_SET)} preguntas etiquetadas; latencia simulada "
+          + ", ".join(f"{model} {latency:.2f}s" for model, latency in latencies.items()))
+    router = ModelRouter("gemini-2.0-flash-lite", "gemini-2.5-pro")
+
+    wrong = [(question, expected, router.classify(question)) for question, expected in ROUTER_EVAL_SET
+             if router.classify(question)[0] != expected]
+    by_rule = sum(router.classify(question)[1] == "regla" for question, _ in ROUTER_EVAL_SET)
+    start = time.perf_counter()
+    for _ in range(100):
+        for question, _ in ROUTER_EVAL_SET:
+            router.classify(question)
+    cost = (time.perf_counter() - start) / (100 * len(ROUTER_EVAL_SET)) * 1e6
+    print(f"   Aciertos: {len(ROUTER_EVAL_SET) - len(wrong)}/{len(ROUTER_EVAL_SET)} "
+          f"({by_rule} por regla, el resto por el clasificador); {cost:.0f}µs por decisión")
+    for question, expected, (got, reason) in wrong:
+        print(f"      ✗ {question} → {got} ({reason}), esperado {expected}")
+
+    financial_data = load_test_data()
+    fake = SimpleNamespace(aio=SimpleNamespace(models=FakeRoutedModels(latencies, "Respuesta simulada " * 20)))
+    main = load_app(fake)
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    for name, model_router in (("Sin enrutador (gemini-2.0-flash)", None), ("Con enrutador", router)):
+        main.model_router = model_router
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for question, _ in ROUTER_EVAL_SET:
+                    await client.post("/api/chat", content=json.dumps(
+                        {"question": question, "financial_data": financial_data}).encode())
+            results[name] = (time.perf_counter() - start) / (repeat * len(ROUTER_EVAL_SET))
+            metrics = (await client.get("/metrics")).json()["model_router"]
+        print(f"   {name}: {results[name] * 1000:.0f}ms de media por pregunta")
+    main.model_router = None
+    for route, stats in metrics.items():
+        print(f"      {route} ({stats['model']}): {stats['calls']} llamadas, media {stats['avg_latency_ms']:.0f}ms, "
+              f"p95 {stats['p95_latency_ms']:.0f}ms, tokens {stats['prompt_tokens']:,} entrada / "
+              f"{stats['output_tokens']:,} salida")
+
+
+async def bench_analitica(sizes=(1_000, 10_000, 100_000, 250_000)):
+    """Coste de la analítica precalculada (NumPy) frente a un bucle en Python, y tokens que añade al prompt."""
+    from collections import defaultdict
+    from app.analytics import compute_analytics, get_analytics
+    from app.data_handler import DataHandler
+    from app.prompt_builder import PromptBuilder
+
+    def python_loop(data):
+        # Mismos agregados principales recorriendo las transacciones en Python
+        by_category, by_month = defaultdict(float), defaultdict(float)
+        for t in data.detalle.gastos.transacciones:
+            by_category[t.categoria] += t.monto
+            by_month[t.fecha[:7]] -= t.monto
+        for t in list(data.detalle.ingresos.transacciones) + list(data.detalle.extras.transacciones):
+            by_month[t.fecha[:7]] += t.monto
+        return by_category, by_month
+
+    print("\n🧮 Analítica precalculada (categorías, mes a mes, ritmo de gasto, ahorro y metas)")
+    handler = DataHandler(cache_ttl=0)
+    for size in sizes:
+        data = handler.parse_financial_data(make_payload(size))
+        numpy_ms = time_per_call(lambda: compute_analytics(data), budget=0.5)
+        loop_ms = time_per_call(lambda: python_loop(data), budget=0.5)
+        get_analytics(data)
+        cached_ms = time_per_call(lambda: get_analytics(data), budget=0.2)
+        section = "\n".join(PromptBuilder._render_analisis(data, None))
+        print(f"   {size:>7} transacciones: NumPy {numpy_ms:7.1f}ms (mismo snapshot {cached_ms * 1000:.1f}µs) | "
+              f"bucle Python (solo totales) {loop_ms:7.1f}ms | sección del prompt "
+              f"{PromptBuilder.estimate_tokens(section)} tokens")
+
+
+async def bench_organizacion(sizes=(10_000, 100_000)):
+    """Resumen estadístico de organizaciones grandes: coste y tokens frente a listar a todos los miembros."""
+    from app.analytics import compute_organization_analytics
+    from app.data_handler import DataHandler
+    from app.prompt_builder import PromptBuilder
+
+    print("\n👥 Analítica de organizaciones (percentiles, atípicos y totales por rol)")
+    handler = DataHandler(cache_ttl=0)
+    for size in sizes:
+        payload = make_payload(100, members=size)
+        rng = random.Random(size)
+        payload["data"]["organizacion"]["analisis"]["topGastadores"] = [
+            {"nombre": m["nombre"], "totalGastado": round(rng.lognormvariate(6, 1), 2)}
+            for m in payload["data"]["organizacion"]["miembros"]
+        ]
+        data = handler.parse_financial_data(payload)
+        organizacion = data.organizacion
+        cold_ms = time_per_call(lambda: compute_organization_analytics(organizacion), budget=0.5)
+        builder = PromptBuilder(cache_entries=1000)
+        builder.build_context(data, ["organizacion"])
+        cached_ms = time_per_call(lambda: builder.build_context(data, ["organizacion"]), budget=0.2)
+        digest = PromptBuilder.build_financial_context(data, ["organizacion"])
+        everyone = "; ".join(f"{m.nombre} ({m.rol}): ${m.saldoActual:,.2f}" for m in organizacion.miembros)
+        print(f"   {size:>7} miembros: análisis {cold_ms:6.1f}ms (sección cacheada {cached_ms * 1000:.0f}µs) | "
+              f"sección {PromptBuilder.estimate_tokens(digest)} tokens frente a "
+              f"{PromptBuilder.estimate_tokens(everyone):,} tokens listando a todos")
+
+
+async def bench_dashboard_streaming(sizes=(10_000, 100_000, 300_000), top_k: int = 50):
+    """Pico de memoria y tiempo al obtener /api/dashboard/all completo frente a leerlo en streaming."""
+    import subprocess
+    from app.analytics import compute_analytics, get_analytics
+    from app.data_handler import DataHandler
+
+    print(f"\n🌊 Dashboard en streaming (top {top_k} transacciones por lista) frente al body completo")
+    print("   (la API se sirve desde otro proceso para que tracemalloc mida solo al cliente)")
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, "api", "dashboard"))
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = subprocess.Popen(
+            [sys.executable, "-m", "http.server", str(port), "--bind", "127.0.0.1", "--directory", directory],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            for size in sizes:
+                path = os.path.join(directory, "api", "dashboard", "all")
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(make_payload(size), f)
+                megabytes = os.path.getsize(path) / 1024 / 1024
+                results = {}
+                for name, streaming in (("completo", False), ("streaming", True)):
+                    handler = DataHandler(api_base_url=f"http://127.0.0.1:{port}", cache_ttl=0,
+                                          streaming=streaming, stream_top_k=top_k)
+                    await handler.open()
+                    for _ in range(50):  # Esperar a que el servidor acepte conexiones
+                        if await handler.fetch_financial_data_from_api("calentamiento"):
+                            break
+                        await asyncio.sleep(0.1)
+                    start = time.perf_counter()
+                    await handler.fetch_financial_data_from_api("token")
+                    elapsed = time.perf_counter() - start
+                    tracemalloc.start()
+                    data = await handler.fetch_financial_data_from_api("token")
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    await handler.close()
+                    kept = len(data.detalle.gastos.transacciones)
+                    results[name] = get_analytics(data) if streaming else compute_analytics(data)
+                    print(f"   {size:>7} transacciones ({megabytes:,.1f} MB) {name:>9}: "
+                          f"{elapsed * 1000:6.0f}ms, pico {peak / 1024 / 1024:7.1f} MB, {kept:,} gastos en memoria")
+                same = [round(m.gastos, 2) for m in results["completo"].meses] == \
+                    [round(m.gastos, 2) for m in results["streaming"].meses]
+                print(f"      Analítica del historial completo idéntica en ambos modos: {'sí' if same else 'NO'}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+# Latencia simulada de cada endpoint del dashboard: /all arma todas las secciones
+SECTION_LATENCIES = {
+    "all": 0.30, "resumen": 0.03, "ingresos": 0.08, "gastos": 0.15, "extras": 0.04,
+    "ahorros": 0.03, "alertas": 0.05, "organizacion": 0.06,
+}
+
+
+def sectioned_dashboard_stub(payload: dict, latencies: dict, stats: dict):
+    """
+    App ASGI que sirve /api/dashboard/all y un endpoint por sección
+    (/api/dashboard/<seccion>) con la latencia indicada para cada uno.
+    """
+    data = payload["data"]
+    detalle = data["detalle"]
+    fragments = {
+        "resumen": {"usuario": data["usuario"], "resumen": data["resumen"]},
+        "ingresos": detalle["ingresos"], "gastos": detalle["gastos"], "extras": detalle["extras"],
+        "ahorros": detalle["ahorros"], "alertas": data["alertas"], "organizacion": data["organizacion"],
+    }
+    bodies = {name: json.dumps({"success": True, "data": fragment}).encode() for name, fragment in fragments.items()}
+    bodies["all"] = json.dumps(payload).encode()
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        section = scope["path"].rsplit("/", 1)[-1]
+        stats[section] = stats.get(section, 0) + 1
+        await asyncio.sleep(latencies.get(section, 0))
+        body = bodies.get(section)
+        await send({
+            "type": "http.response.start",
+            "status": 200 if body is not None else 404,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({"type": "http.response.body", "body": body or b"{}"})
+
+    return app
+
+
+async def bench_fetch_parcial(transactions: int = 20_000, repeat: int = 3):
+    """Fetch + contexto por pregunta: /api/dashboard/all siempre frente a pedir solo las secciones necesarias."""
+    from app.data_handler import DataHandler
+    from app.prompt_builder import PromptBuilder
+
+    questions = [question for question, _ in INTENT_EVAL_SET]
+    print(f"\n🧩 Fetch parcial del dashboard ({transactions:,} transacciones, {len(questions)} preguntas sin caché)")
+    print("   Latencias del stub: " + ", ".join(f"{name} {latency * 1000:.0f}ms"
+                                                for name, latency in SECTION_LATENCIES.items()))
+    builder = PromptBuilder()
+    stats = {}
+    with StubServer(sectioned_dashboard_stub(make_payload(transactions, members=50), SECTION_LATENCIES, stats)) as stub:
+        results = {}
+        for name, partial in (("/all siempre", False), ("planificador", True)):
+            handler = DataHandler(api_base_url=stub.url, cache_ttl=0, partial_fetch=partial)
+            await handler.open()
+            stats.clear()
+            timings, tokens, plans = [], [], []
+            for _ in range(repeat):
+                for question in questions:
+                    start = time.perf_counter()
+                    data, sections = await handler.fetch_for_question("token", question)
+                    context = builder.build_question_context(data, question, sections)
+                    timings.append(time.perf_counter() - start)
+                    tokens.append(PromptBuilder.estimate_tokens(context))
+                    plans.append(sections)
+            await handler.close()
+            results[name] = (plans[:len(questions)], timings)
+            requests = ", ".join(f"{section} {count}" for section, count in sorted(stats.items()))
+            print(f"   {name:>13}: p50 {percentile(timings, 50):6.1f}ms, media {sum(timings) / len(timings) * 1000:6.1f}ms, "
+                  f"{sum(tokens) / len(tokens):5.0f} tokens de contexto; peticiones: {requests}")
+
+    partial_plans, partial_timings = results["planificador"]
+    _, full_timings = results["/all siempre"]
+    subset = [i for i in range(len(full_timings)) if partial_plans[i % len(questions)] is not None]
+    served = sum(sections is not None for sections in partial_plans)
+    print(f"   {served}/{len(questions)} preguntas resueltas con fetch parcial: "
+          f"{sum(full_timings[i] for i in subset) / len(subset) * 1000:.1f}ms -> "
+          f"{sum(partial_timings[i] for i in subset) / len(subset) * 1000:.1f}ms de media")
+    for question, sections in zip(questions, partial_plans):
+        print(f"      {'/all' if sections is None else ', '.join(sections):<45} {question}")
+
+
+async def bench_warmup(latency: float = 0.3, transactions: int = 20_000, burst: int = 150, max_inflight: int = 100):
+    """Primera pregunta de /api/chat/auto sin warm-up, con warm-up terminado y con warm-up en curso; límite y cancelación."""
+    from app.data_handler import DataHandler
+    from app.warmup import WarmupManager
+
+    print(f"\n🔥 Warm-up al abrir el chat (API financiera {latency * 1000:.0f}ms, Gemini {latency * 1000:.0f}ms, "
+          f"{transactions:,} transacciones)")
+    main = load_app(FakeGenaiClient(latency=latency))
+    question = "¿Cómo puedo ahorrar más dinero?"
+    stats = {}
+    with StubServer(dashboard_stub(json.dumps(make_payload(transactions)).encode(), stats, latency=latency)) as stub:
+        main.data_handler = DataHandler(api_base_url=stub.url)
+        main.warmups = WarmupManager(main._warm_up, max_inflight=max_inflight)
+        await main.data_handler.open()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            async def ask(token):
+                start = time.perf_counter()
+                response = await client.post("/api/chat/auto", json={"question": question, "bearer_token": token})
+                assert response.status_code == 200, response.text
+                return (time.perf_counter() - start) * 1000
+
+            cold = await ask("token-frio")
+            await client.post("/api/chat/warmup", json={"bearer_token": "token-tibio"})
+            await asyncio.sleep(latency * 2)  # El usuario aún está escribiendo
+            warm = await ask("token-tibio")
+            before = stats["requests"]
+            await client.post("/api/chat/warmup", json={"bearer_token": "token-apurado"})
+            early = await ask("token-apurado")
+            early_requests = stats["requests"] - before
+            print(f"   Sin warm-up:                {cold:6.0f}ms")
+            print(f"   Warm-up terminado:          {warm:6.0f}ms")
+            print(f"   Pregunta durante warm-up:   {early:6.0f}ms ({early_requests} petición a la API)")
+
+            before = stats["requests"]
+            responses = await asyncio.gather(*(
+                client.post("/api/chat/warmup", json={"bearer_token": f"rafaga-{i}"}) for i in range(burst)
+            ))
+            accepted = sum(response.status_code == 202 for response in responses)
+            rejected = sum(response.status_code == 429 for response in responses)
+            cancels = await asyncio.gather(*(
+                client.post("/api/chat/warmup/cancel", json={"bearer_token": f"rafaga-{i}"}) for i in range(burst)
+            ))
+            cancelled = sum(response.json()["status"] == "cancelled" for response in cancels)
+            await asyncio.sleep(latency * 2)
+            print(f"   Ráfaga de {burst} warm-ups (máx. {max_inflight} en curso): {accepted} aceptados, "
+                  f"{rejected} rechazados con 429, {cancelled} cancelados")
+            print(f"   Métricas: {main.warmups.stats()}")
+        await main.data_handler.close()
+
+
+def etag_dashboard_stub(body: bytes, stats: dict, latency: float = 0.0):
+    """
+    App ASGI que responde /api/dashboard/all con ETag y 304 si If-None-Match coincide.
+    Registra respuestas 200 y 304, bytes enviados y peticiones simultáneas máximas.
+    """
+    etag = f'"{zlib.crc32(body):08x}"'.encode()
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        stats["active"] = stats.get("active", 0) + 1
+        stats["max_active"] = max(stats.get("max_active", 0), stats["active"])
+        try:
+            await asyncio.sleep(latency)
+            not_modified = dict(scope["headers"]).get(b"if-none-match") == etag
+            status, payload = (304, b"") if not_modified else (200, body)
+            stats[status] = stats.get(status, 0) + 1
+            stats["bytes"] = stats.get("bytes", 0) + len(payload)
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json"), (b"etag", etag)],
+            })
+            await send({"type": "http.response.body", "body": payload})
+        finally:
+            stats["active"] -= 1
+
+    return app
+
+
+async def bench_swr(latency: float = 0.2, ttl: float = 0.5, duration: float = 4.0, tokens: int = 300):
+    """Picos de latencia al vencer la caché del dashboard: TTL simple frente a stale-while-revalidate con ETag."""
+    from app.data_handler import DataHandler
+
+    print(f"\n♻️  Stale-while-revalidate (TTL {ttl}s, API {latency * 1000:.0f}ms, una pregunta cada 50ms durante {duration:.0f}s)")
+    body = json.dumps(make_payload(20_000)).encode()
+    for name, stale_ttl in (("TTL simple", 0.0), ("SWR + ETag", 10.0)):
+        stats = {}
+        with StubServer(etag_dashboard_stub(body, stats, latency=latency)) as stub:
+            handler = DataHandler(api_base_url=stub.url, cache_ttl=ttl, cache_stale_ttl=stale_ttl, cache_jitter=0)
+            await handler.open()
+            await handler.fetch_financial_data_from_api("token")
+            timings = []
+            end = time.perf_counter() + duration
+            while time.perf_counter() < end:
+                start = time.perf_counter()
+                await handler.fetch_financial_data_from_api("token")
+                timings.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+            await handler.close()
+        print(f"   {name:>11}: p50 {percentile(timings, 50):7.3f}ms, p99 {percentile(timings, 99):6.1f}ms, "
+              f"máx {max(timings) * 1000:6.1f}ms; API: {stats.get(200, 0)} respuestas 200, "
+              f"{stats.get(304, 0)} 304, {stats.get('bytes', 0) / 1024 / 1024:.1f} MB")
+
+    print(f"\n   {tokens} usuarios con la caché cargada en el mismo instante (TTL 3s, API {latency * 1000:.0f}ms): "
+          f"revalidaciones simultáneas al vencer")
+    small = json.dumps(load_test_data()).encode()
+    for jitter in (0.0, 0.1, 0.3):
+        stats = {}
+        with StubServer(etag_dashboard_stub(small, stats, latency=latency)) as stub:
+            handler = DataHandler(api_base_url=stub.url, cache_ttl=3.0, cache_stale_ttl=10.0, cache_jitter=jitter,
+                                  max_connections=tokens)
+            await handler.open()
+            data = handler.parse_financial_data(small)
+            for i in range(tokens):  # P. ej. tras un despliegue o un pico de aperturas del chat
+                handler._store(handler._token_key(f"token-{i}"), data, len(small), None)
+            end = time.perf_counter() + 3.0 + 1.0
+            while time.perf_counter() < end:
+                for i in range(tokens):
+                    await handler.fetch_financial_data_from_api(f"token-{i}")
+                await asyncio.sleep(0.02)
+            refreshes = handler.refreshes
+            await handler.close()
+        print(f"   jitter {jitter:.0%}: {stats.get('max_active', 0):>3} peticiones simultáneas como máximo "
+              f"({refreshes} revalidaciones)")
+
+
+def load_http_questions(path: str = "test_requests.http"):
+    """Preguntas de los ejemplos de test_requests.http, sin repetir."""
+    import re
+    with open(path, "r", encoding="utf-8") as f:
+        return list(dict.fromkeys(re.findall(r'"question":\s*"([^"]+)"', f.read())))
+
+
+async def bench_respuestas_locales(repeat: int = 2):
+    """Fracción de preguntas que se responden sin Gemini y coste frente a la llamada simulada."""
+    from app.data_handler import DataHandler
+    from app.local_answers import LocalAnswerEngine
+
+    engine = LocalAnswerEngine()
+    data = DataHandler().parse_financial_data(load_test_data())
+    print("\n⚡ Respuestas locales sin Gemini (test_data.json)")
+    for name, questions in (("test_requests.http", load_http_questions()),
+                            ("preguntas de intención", [q for q, _ in INTENT_EVAL_SET]),
+                            ("preguntas del enrutador", [q for q, _ in ROUTER_EVAL_SET])):
+        answers = [(question, engine.answer(question, data)) for question in questions]
+        served = sum(answer is not None for _, answer in answers)
+        print(f"   {name}: {served}/{len(questions)} respondidas localmente ({served / len(questions):.0%})")
+        if name == "test_requests.http":
+            for question, answer in answers:
+                print(f"      {'✓' if answer else '→ Gemini'} {question}" + (f"  «{answer}»" if answer else ""))
+
+    questions = [q for q, _ in INTENT_EVAL_SET]
+    cost = time_per_call(lambda: [engine.answer(q, data) for q in questions]) / len(questions) * 1000
+    print(f"   {cost:.1f}µs por pregunta (detección + respuesta)")
+
+    latency = 0.3
+    main = load_app(FakeGenaiClient(latency=latency))
+    financial_data = load_test_data()
+    transport = httpx.ASGITransport(app=main.app)
+    for label, local in (("Sin respuestas locales", None), ("Con respuestas locales", LocalAnswerEngine())):
+        main.local_answers = local
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for question in questions:
+                    await client.post("/api/chat", content=json.dumps(
+                        {"question": question, "financial_data": financial_data}).encode())
+            elapsed = (time.perf_counter() - start) / (repeat * len(questions))
+        print(f"   {label}: {elapsed * 1000:.0f}ms de media por pregunta vía /api/chat "
+              f"(latencia simulada de Gemini {latency:.2f}s)")
+    main.local_answers = None
+
+
+async def bench_reportes(users=(500, 2_000), concurrency: int = 50, latency: float = 0.2):
+    """Reportes en lote: usuarios por minuto, memoria según el tamaño de la entrada, límite de tasa y reanudación."""
+    from app.bulk_reports import BulkReportJob, iter_jsonl
+    from app.data_handler import DataHandler
+    from app.gemini_client import GeminiClient
+    from app.prompt_builder import PromptBuilder
+    from app.rate_limit import AsyncRateLimiter
+
+    print(f"\n🌙 Reportes en lote: concurrencia {concurrency}, latencia simulada {latency:.2f}s")
+    handler = DataHandler(cache_ttl=0)
+
+    async def load(raw):
+        return handler.parse_financial_data(raw)
+
+    def make_job(directory, fake, **kwargs):
+        return BulkReportJob(GeminiClient(client=fake, max_concurrency=concurrency), PromptBuilder(),
+                             os.path.join(directory, "reportes.jsonl"), concurrency=concurrency, **kwargs)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for count in users:
+            input_path = os.path.join(directory, f"dashboards_{count}.jsonl")
+            with open(input_path, "w", encoding="utf-8") as f:
+                for i in range(count):
+                    f.write(json.dumps(make_payload(50, seed=i)) + "\n")
+            for name in os.listdir(directory):
+                if name.startswith("reportes"):
+                    os.remove(os.path.join(directory, name))
+
+            job = make_job(directory, FakeGenaiClient(latency=latency))
+            tracemalloc.start()
+            stats = await job.run(iter_jsonl(input_path), load)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"   {count:>6} usuarios: {stats['users_per_minute']:,.0f} usuarios/min "
+                  f"({stats['elapsed_seconds']:.1f}s), pico de memoria {peak / 1024 / 1024:.1f} MB, "
+                  f"{stats['succeeded']} ok / {stats['failed']} fallidos")
+
+        # Límite de tasa: 1200 llamadas/min con ráfagas de 10
+        for name in os.listdir(directory):
+            if name.startswith("reportes"):
+                os.remove(os.path.join(directory, name))
+        job = make_job(directory, FakeGenaiClient(latency=latency))
+        job.rate_limiter = AsyncRateLimiter(1200, burst=10)
+        records = ((index, raw) for index, raw in iter_jsonl(input_path) if index < 100)
+        stats = await job.run(records, load)
+        print(f"   Con límite de 1200 llamadas/min: {stats['users_per_minute']:,.0f} usuarios/min "
+              f"(espera acumulada {stats['rate_limit_wait_seconds']:.1f}s)")
+
+        # Interrupción a mitad y reanudación
+        for name in os.listdir(directory):
+            if name.startswith("reportes"):
+                os.remove(os.path.join(directory, name))
+        total = users[0]
+        input_path = os.path.join(directory, f"dashboards_{total}.jsonl")
+        fake = FakeGenaiClient(latency=latency)
+        try:
+            await asyncio.wait_for(make_job(directory, fake).run(iter_jsonl(input_path), load),
+                                   timeout=total / concurrency * latency / 2)
+        except asyncio.TimeoutError:
+            pass
+        first_calls = fake.aio.models.calls
+        stats = await make_job(directory, fake).run(iter_jsonl(input_path), load)
+        with open(os.path.join(directory, "reportes.jsonl"), "rb") as f:
+            indices = [json.loads(line)["index"] for line in f]
+        complete = sorted(indices) == list(range(total))
+        print(f"   Reanudación: {first_calls} llamadas antes de interrumpir, {stats['skipped']} registros saltados "
+              f"al reanudar; salida {'completa y sin duplicados' if complete else 'INCORRECTA'} ({len(indices)} líneas)")
+
+
+# Preguntas de evaluación -> secciones que una buena respuesta necesita (None = todas)
+INTENT_EVAL_SET = [
+    ("¿Cómo puedo ahorrar más dinero?", {"ahorros", "gastos"}),
+    ("¿En qué categoría gasto más?", {"gastos"}),
+    ("¿Cómo está mi salud financiera?", None),
+    ("¿Cómo puedo alcanzar mis objetivos de ahorro más rápido?", {"ahorros"}),
+    ("¿Quién ha gastado más en la familia este mes?", {"organizacion"}),
+    ("¿Cuánto dinero tengo disponible?", {"resumen"}),
+    ("¿Cuál es mi saldo actual?", {"resumen"}),
+    ("¿Cuánto gané este mes con mi salario?", {"ingresos"}),
+    ("¿Cuánto he recibido en bonos?", {"extras"}),
+    ("¿Qué alertas tengo activas?", {"alertas"}),
+    ("¿Debería preocuparme por algún riesgo?", {"alertas"}),
+    ("¿Cuánto me falta para mi meta del fondo de emergencia?", {"ahorros"}),
+    ("¿Cuál fue mi gasto más grande?", {"gastos"}),
+    ("¿Cuántos miembros tiene mi organización?", {"organizacion"}),
+    ("¿Me alcanza para comprar un auto?", {"resumen", "gastos"}),
+    ("Dame un resumen de mis finanzas", None),
+    ("¿Qué me recomiendas?", None),
+]
+
+
+async def bench_intencion():
+    """Tamaño del prompt y cobertura de secciones con selección por intención sobre test_data.json."""
+    from app.data_handler import DataHandler
+    from app.prompt_builder import PromptBuilder
+
+    print("\n🧭 Selección de secciones por intención (test_data.json)")
+    data = DataHandler().parse_financial_data(load_test_data())
+    builder = PromptBuilder(section_selection=True)
+    full_tokens = PromptBuilder.estimate_tokens(PromptBuilder.build_financial_context(data))
+
+    total_selected = 0
+    covered = 0
+    for question, required in INTENT_EVAL_SET:
+        sections = builder.sections_for_question(question)
+        included = set(sections) if sections is not None else set(PromptBuilder.SECTIONS)
+        tokens = PromptBuilder.estimate_tokens(builder.build_question_context(data, question))
+        total_selected += tokens
+        ok = (required or set(PromptBuilder.SECTIONS)) <= included
+        covered += ok
+        label = "completo" if sections is None else ", ".join(sections)
+        print(f"   {'✅' if ok else '❌'} {tokens:>4} tokens  {question}  [{label}]")
+
+    average = total_selected / len(INTENT_EVAL_SET)
+    print(f"   Contexto completo: {full_tokens} tokens; promedio con selección: {average:.0f} tokens "
+          f"(-{(1 - average / full_tokens):.0%})")
+    print(f"   Cobertura: {covered}/{len(INTENT_EVAL_SET)} preguntas con todas las secciones necesarias")
+
+
+BENCHMARKS = {
+    "concurrencia": bench_concurrencia,
+    "pool": bench_pool,
+    "cache_dashboard": bench_cache_dashboard,
+    "streaming": bench_streaming,
+    "cache_respuestas": bench_cache_respuestas,
+    "cache_semantica": bench_cache_semantica,
+    "validacion": bench_validacion,
+    "ingesta": bench_ingesta,
+    "presupuesto": bench_presupuesto,
+    "intencion": bench_intencion,
+    "cache_contexto": bench_cache_contexto,
+    "cache_contexto_gemini": bench_cache_contexto_gemini,
+    "sesiones": bench_sesiones,
+    "lote": bench_lote,
+    "reportes": bench_reportes,
+    "gobernador": bench_gobernador,
+    "resiliencia": bench_resiliencia,
+    "enrutador": bench_enrutador,
+    "respuestas_locales": bench_respuestas_locales,
+    "analitica": bench_analitica,
+    "organizacion": bench_organizacion,
+    "dashboard_streaming": bench_dashboard_streaming,
+    "fetch_parcial": bench_fetch_parcial,
+    "warmup": bench_warmup,
+    "swr": bench_swr,
+}
+
+
+def main():
+    """Ejecuta los benchmarks seleccionados"""
+    names = sys.argv[1:] or list(BENCHMARKS)
+    print("=" * 60)
+    print("📊 BENCHMARKS DEL CHATBOT FINANCIERO")
+    print("=" * 60)
+
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ Benchmark desconocido: {name}. Disponibles: {', '.join(BENCHMARKS)}")
+            continue
+        asyncio.run(BENCHMARKS[name]())
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
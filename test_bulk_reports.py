@@ -0,0 +1,83 @@
+"""
+Pruebas de la reanudación de los reportes masivos (app.bulk_reports).
+Simulan interrupciones dejando la salida y el checkpoint como quedarían en
+disco y comprueban que, al reanudar, cada usuario aparece exactamente una vez.
+"""
+
+import asyncio
+import json
+
+from app.bulk_reports import BulkReportJob, Checkpoint
+from app.data_handler import DataHandler
+from app.prompt_builder import PromptBuilder
+
+
+def load_test_data():
+    """Carga los datos de prueba desde test_data.json"""
+    with open("test_data.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeGeminiClient:
+    """Cliente de Gemini que responde al instante."""
+
+    async def generate_response_async(self, prompt, **kwargs):
+        return "Reporte de prueba"
+
+
+def record_line(index):
+    """Línea de salida de un usuario ya procesado."""
+    return json.dumps({"index": index, "success": True}).encode("utf-8") + b"\n"
+
+
+def resume(tmp_path, total):
+    """Reanuda el trabajo sobre `total` registros; devuelve los índices procesados de nuevo."""
+    financial_data = DataHandler().parse_financial_data(load_test_data())
+    loaded = []
+
+    async def load(raw):
+        loaded.append(raw)
+        return financial_data
+
+    job = BulkReportJob(FakeGeminiClient(), PromptBuilder(), str(tmp_path / "out.jsonl"), concurrency=2)
+    asyncio.run(job.run(((index, index) for index in range(total)), load))
+    return sorted(loaded)
+
+
+def output_indices(tmp_path):
+    """Índices de la salida; falla si alguna línea no es un JSON completo."""
+    with open(tmp_path / "out.jsonl", "rb") as f:
+        return sorted(json.loads(line)["index"] for line in f)
+
+
+def test_resume_after_torn_final_line(tmp_path):
+    """La línea final a medias se descarta y su registro se procesa de nuevo."""
+    head = record_line(0) + record_line(1)
+    (tmp_path / "out.jsonl").write_bytes(head + record_line(2) + b'{"index": 3, "succ')
+    Checkpoint(watermark=2, output_offset=len(head)).save(str(tmp_path / "out.jsonl.checkpoint.json"))
+
+    assert resume(tmp_path, 5) == [3, 4]
+    assert output_indices(tmp_path) == [0, 1, 2, 3, 4]
+
+
+def test_resume_with_out_of_order_entries(tmp_path):
+    """Los registros terminados fuera de orden (guardados o solo en la salida) no se repiten."""
+    saved = record_line(0) + record_line(3)
+    (tmp_path / "out.jsonl").write_bytes(saved + record_line(5) + record_line(2))
+    Checkpoint(watermark=1, done_above={3}, output_offset=len(saved)).save(
+        str(tmp_path / "out.jsonl.checkpoint.json")
+    )
+
+    assert resume(tmp_path, 7) == [1, 4, 6]
+    assert output_indices(tmp_path) == [0, 1, 2, 3, 4, 5, 6]
+    checkpoint = Checkpoint.load(str(tmp_path / "out.jsonl.checkpoint.json"))
+    assert (checkpoint.watermark, checkpoint.done_above) == (7, set())
+
+
+def test_resume_with_output_shorter_than_checkpoint(tmp_path):
+    """Si la salida se recortó, el checkpoint se reconstruye a partir de ella."""
+    (tmp_path / "out.jsonl").write_bytes(record_line(0) + record_line(2))
+    Checkpoint(watermark=4, output_offset=1000).save(str(tmp_path / "out.jsonl.checkpoint.json"))
+
+    assert resume(tmp_path, 4) == [1, 3]
+    assert output_indices(tmp_path) == [0, 1, 2, 3]
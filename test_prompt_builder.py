@@ -0,0 +1,70 @@
+"""
+Pruebas de la caché de secciones del contexto financiero.
+Un snapshot nuevo del dashboard con un solo gasto más debe reutilizar todas las
+secciones que no cambiaron, tanto con límites fijos como con presupuesto.
+"""
+
+import json
+
+from app.data_handler import DataHandler
+from app.prompt_builder import PromptBuilder
+
+
+def load_test_data():
+    """Carga los datos de prueba desde test_data.json"""
+    with open("test_data.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def snapshots():
+    """Dos snapshots parseados por separado; el segundo tiene un gasto más."""
+    handler = DataHandler()
+    payload = load_test_data()
+    gastos = payload["data"]["detalle"]["gastos"]["transacciones"]
+    gastos.extend(
+        {"monto": 100.0 + i, "descripcion": f"Gasto {i}", "categoria": "Comida", "fecha": f"2025-10-{i + 1:02d}"}
+        for i in range(20)
+    )
+    first = handler.parse_financial_data(payload)
+    gastos.append({"monto": 250.0, "descripcion": "Gasto nuevo", "categoria": "Comida", "fecha": "2025-10-25"})
+    return first, handler.parse_financial_data(payload)
+
+
+def test_new_gasto_only_rerenders_changed_sections(monkeypatch):
+    """Con límites fijos solo se renderizan de nuevo gastos y análisis."""
+    builder = PromptBuilder(cache_entries=100)
+    rendered = []
+    for name in PromptBuilder.SECTIONS:
+        render = getattr(PromptBuilder, f"_render_{name}")
+        monkeypatch.setattr(
+            builder, f"_render_{name}",
+            lambda data, pick, name=name, render=render: rendered.append(name) or render(data, pick)
+        )
+
+    first, updated = snapshots()
+    builder.build_context(first)
+    rendered.clear()
+    context = builder.build_context(updated)
+
+    assert sorted(rendered) == ["analisis", "gastos"]
+    assert context == PromptBuilder.build_financial_context(updated)
+
+
+def test_new_gasto_only_rescores_gastos(monkeypatch):
+    """Con presupuesto solo se vuelven a puntuar las listas de gastos."""
+    builder = PromptBuilder(token_budget=800, cache_entries=100)
+    scored = []
+    score_items = PromptBuilder._score_items
+    monkeypatch.setattr(
+        builder, "_score_items",
+        lambda key, *args: scored.append(key) or score_items(key, *args)
+    )
+
+    first, updated = snapshots()
+    builder.build_context(first)
+    scored.clear()
+    context = builder.build_context(updated)
+
+    assert set(scored) <= {"gastos", "gastos.categorias"}
+    assert "gastos" in scored
+    assert context == PromptBuilder.build_budgeted_context(updated, 800)
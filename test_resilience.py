@@ -0,0 +1,180 @@
+"""
+Pruebas de reintentos, plazos y peticiones de cobertura (app.resilience) con
+un cliente de Gemini simulado: no se llama a la API real.
+"""
+
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import httpx
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from app import main  # noqa: E402  (necesita GEMINI_API_KEY al importarse)
+from app.gemini_client import GeminiClient  # noqa: E402
+from app.governor import GeminiGovernor  # noqa: E402
+from app.resilience import Hedger, RetryPolicy  # noqa: E402
+
+
+def load_test_data():
+    """Carga los datos de prueba desde test_data.json"""
+    with open("test_data.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeAPIError(Exception):
+    """Error del SDK con código HTTP."""
+
+    def __init__(self, code):
+        super().__init__(f"{code} error simulado")
+        self.code = code
+
+
+class FakeModels:
+    """`client.aio.models` simulado: cada llamada ejecuta el siguiente comportamiento de la lista."""
+
+    def __init__(self, *behaviours):
+        self.behaviours = list(behaviours)
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config):
+        behaviour = self.behaviours[min(self.calls, len(self.behaviours) - 1)]
+        self.calls += 1
+        return await behaviour()
+
+
+def fake_client(*behaviours):
+    return SimpleNamespace(aio=SimpleNamespace(models=FakeModels(*behaviours)))
+
+
+def answer(text="Respuesta simulada.", delay=0.0):
+    async def behaviour():
+        await asyncio.sleep(delay)
+        return SimpleNamespace(text=text, usage_metadata=None, candidates=None)
+    return behaviour
+
+
+def fail(code):
+    async def behaviour():
+        raise FakeAPIError(code)
+    return behaviour
+
+
+def make_client(client, retry_policy, hedger=None):
+    return GeminiClient(
+        client=client,
+        governor=GeminiGovernor(max_concurrency=4),
+        retry_policy=retry_policy,
+        hedger=hedger
+    )
+
+
+def test_429_is_retried_until_the_deadline():
+    """Un 429 se reintenta con backoff y se abandona al agotarse el plazo."""
+    client = fake_client(fail(429))
+    policy = RetryPolicy(max_retries=100, base_delay=0.02, max_delay=0.05)
+    gemini = make_client(client, policy)
+
+    async def run():
+        start = time.monotonic()
+        result = await gemini.generate_response_async("Hola", deadline=start + 0.3)
+        return result, time.monotonic() - start
+
+    result, elapsed = asyncio.run(run())
+
+    assert result is None
+    assert client.aio.models.calls > 1
+    assert policy.retries == client.aio.models.calls - 1
+    assert policy.gave_up == 1
+    assert elapsed < 0.35
+
+
+def test_429_then_success_returns_the_answer():
+    """Tras un 429 transitorio el reintento devuelve la respuesta."""
+    client = fake_client(fail(429), answer("Listo."))
+    policy = RetryPolicy(max_retries=2, base_delay=0.01)
+
+    result = asyncio.run(make_client(client, policy).generate_response_async("Hola"))
+
+    assert result == "Listo."
+    assert client.aio.models.calls == 2
+    assert policy.retries == 1
+
+
+def test_400_is_not_retried():
+    """Un error del cliente (400) no se reintenta."""
+    client = fake_client(fail(400), answer())
+    policy = RetryPolicy(max_retries=5, base_delay=0.01)
+
+    result = asyncio.run(make_client(client, policy).generate_response_async("Hola"))
+
+    assert result is None
+    assert client.aio.models.calls == 1
+    assert policy.retries == 0
+    assert policy.gave_up == 0
+
+
+def test_hedge_fires_at_percentile_and_cancels_the_loser():
+    """Un intento más lento que el percentil se cubre y el perdedor se cancela."""
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return SimpleNamespace(text="Lenta.", usage_metadata=None, candidates=None)
+
+    hedger = Hedger(percentile=95, min_samples=10)
+    for _ in range(10):
+        hedger.observe(0.02)
+    client = fake_client(slow, answer("Cobertura."))
+    gemini = make_client(client, RetryPolicy(max_retries=0), hedger)
+
+    async def run():
+        start = time.monotonic()
+        result = await gemini.generate_response_async("Hola")
+        elapsed = time.monotonic() - start
+        await asyncio.sleep(0)  # Deja que la cancelación llegue al intento perdedor
+        return result, elapsed
+
+    result, elapsed = asyncio.run(run())
+
+    assert result == "Cobertura."
+    assert elapsed < 1
+    assert hedger.hedged == 1
+    assert hedger.hedge_wins == 1
+    assert cancelled == [True]
+
+
+def test_request_timeout_header_maps_to_504(monkeypatch):
+    """Si Gemini no responde dentro de X-Request-Timeout, /api/chat devuelve 504."""
+    async def hang():
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(main.gemini_client, "client", fake_client(hang))
+    monkeypatch.setattr(main.gemini_client, "response_cache", None)
+    monkeypatch.setattr(main.gemini_client, "context_cache", None)
+    monkeypatch.setattr(main, "semantic_cache", None)
+    monkeypatch.setattr(main, "local_answers", None)
+    monkeypatch.setattr(main, "model_router", None)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.monotonic()
+            response = await client.post(
+                "/api/chat",
+                json={"question": "¿Cómo puedo ahorrar más dinero?", "financial_data": load_test_data()},
+                headers={"X-Request-Timeout": "0.2"}
+            )
+            return response, time.monotonic() - start
+
+    response, elapsed = asyncio.run(run())
+
+    assert response.status_code == 504
+    assert elapsed < 1
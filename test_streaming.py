@@ -0,0 +1,68 @@
+"""
+Prueba del endpoint SSE /api/chat/stream sin servidor ni Gemini.
+Sustituye `stream_response` por un backend falso y comprueba que el primer
+evento `chunk` sale hacia el cliente antes de que el backend termine de generar.
+"""
+
+import asyncio
+import json
+import os
+
+import httpx
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from app import main  # noqa: E402  (necesita GEMINI_API_KEY al importarse)
+
+
+def load_test_data():
+    """Carga los datos de prueba desde test_data.json"""
+    with open("test_data.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_stream_first_chunk_before_backend_finishes(monkeypatch):
+    """El primer `chunk` se envía mientras el backend sigue generando."""
+    timeline = []
+    first_chunk_sent = asyncio.Event()
+
+    async def fake_stream_response(prompt, **kwargs):
+        yield {"type": "chunk", "text": "Hola"}
+        # Si el endpoint acumulara la respuesta, el primer chunk no saldría hasta terminar
+        try:
+            await asyncio.wait_for(first_chunk_sent.wait(), timeout=2)
+        except asyncio.TimeoutError:
+            pass
+        yield {"type": "chunk", "text": ", ahorra más."}
+        timeline.append("backend_done")
+        yield {"type": "done", "usage": {"output_tokens": 4}}
+
+    async def app_with_probe(scope, receive, send):
+        # ASGITransport junta el body antes de devolverlo: se registra cuándo envía cada parte la app
+        async def probe(message):
+            if message["type"] == "http.response.body" and b"event: chunk" in message.get("body", b""):
+                if not first_chunk_sent.is_set():
+                    timeline.append("first_chunk")
+                    first_chunk_sent.set()
+            await send(message)
+        await main.app(scope, receive, probe)
+
+    monkeypatch.setattr(main.gemini_client, "stream_response", fake_stream_response)
+    monkeypatch.setattr(main, "semantic_cache", None)
+    monkeypatch.setattr(main, "local_answers", None)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app_with_probe)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/chat/stream", json={
+                "question": "¿Cómo puedo ahorrar más dinero?",
+                "financial_data": load_test_data()
+            })
+
+    response = asyncio.run(run())
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert timeline == ["first_chunk", "backend_done"]
+    events = [block.split("\n", 1)[0] for block in response.text.strip().split("\n\n")]
+    assert events == ["event: chunk", "event: chunk", "event: done"]